@@ -6,7 +6,7 @@
 # IMPORTS
 # ============================================================================
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 import requests
@@ -143,14 +143,27 @@ class Report(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     submitted_at = models.DateTimeField(blank=True, null=True)
     
+    # Table version at the last save (login/versions.py), for batched status polling
+    version = models.BigIntegerField(default=0, editable=False)
+    
     # File attachment
     attachment = models.FileField(upload_to='report_attachments/', blank=True, null=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the admin listing, ordered by status then newest
+            models.Index(fields=['status', '-created_at', '-id'], name='analyst_report_status_keyset'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.get_status_display()}"
+    
+    def save(self, *args, **kwargs):
+        # The version stamped in pre_save (login.versions.next_version) must
+        # commit together with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
 class ReportComment(models.Model):
@@ -1,3 +1,99 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.db.models import Model
 from django.test import TestCase
+from django.urls import reverse
+
+from login.benchmarks import BenchmarkTestCase, seed_analyst_reports, seed_buoys, use_temporary_tile_cache
+from login.models import UserProfile
+from login.versions import read_versions
+
+from .models import Report
+
+
+def setUpModule():
+    use_temporary_tile_cache()
+
+
+class AnalystViewBenchmarks(BenchmarkTestCase):
+    scan_tables = ('analyst_buoyreading', 'analyst_report')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.analyst = User.objects.create_user('bench-analyst', password='pw')
+        UserProfile.objects.create(user=cls.analyst, user_type='analyst')
+        others = [User.objects.create_user(f'analyst{i}', password='pw') for i in range(10)]
+        admins = [User.objects.create_user(f'admin{i}', password='pw') for i in range(5)]
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, user_type='analyst') for user in others]
+            + [UserProfile(user=user, user_type='admin') for user in admins]
+        )
+        seed_buoys(30)
+        seed_analyst_reports([cls.analyst] + others, admins, 2000)
+
+    def setUp(self):
+        self.client.force_login(self.analyst)
+        self.client.get(reverse('analyst:analytics'))
+
+    def test_get_buoy_data(self):
+        with self.benchmark('analyst get_buoy_data', 5):
+            response = self.client.get(reverse('analyst:get_buoy_data'))
+        buoys = response.json()['buoys']
+        self.assertEqual(len(buoys), 30)
+        self.assertTrue(all(len(buoy['chart_data']) == 48 for buoy in buoys))
+
+    def test_dashboard(self):
+        with self.benchmark('analyst dashboard', 5):
+            response = self.client.get(reverse('analyst:dashboard'))
+        self.assertEqual(response.context['total_reports'], len(response.context['reports']))
+
+    def test_admin_users_api(self):
+        with self.benchmark('analyst get_admin_users_api', 3):
+            response = self.client.get(reverse('analyst:api_admin_users'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_report_statuses_api(self):
+        reports = list(Report.objects.filter(created_by=self.analyst).order_by('pk')[:100])
+        params = {'ids': ','.join(str(report.pk) for report in reports) + ',999999'}
+        with self.benchmark('analyst get_report_statuses_api (100 ids)', 4):
+            response = self.client.get(reverse('analyst:api_report_statuses'), params)
+        data = response.json()
+        self.assertEqual((len(data['reports']), data['removed']), (100, [999999]))
+
+        reports[0].status = 'approved'
+        reports[0].save()
+        with self.benchmark('analyst get_report_statuses_api (since)', 4):
+            response = self.client.get(reverse('analyst:api_report_statuses'), {**params, 'since': data['version']})
+        changed = response.json()['reports']
+        self.assertEqual([(report['id'], report['status']) for report in changed], [(reports[0].pk, 'approved')])
+
+
+class ReportVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.analyst = User.objects.create_user('version-analyst', password='pw')
+        UserProfile.objects.create(user=cls.analyst, user_type='analyst')
+        cls.report = Report.objects.create(title='Swell', report_type='event', created_by=cls.analyst)
+
+    def test_failed_save_leaves_the_version_alone(self):
+        before = read_versions(Report)[0]
+        self.report.status = 'submitted'
+        with mock.patch.object(Model, '_do_update', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.report.save()
+        self.assertEqual(read_versions(Report)[0], before)
+
+        self.report.save()
+        self.assertEqual((self.report.version, read_versions(Report)[0]), (before + 1, before + 1))
+
+    def test_batches_resume_from_the_table_version(self):
+        self.client.force_login(self.analyst)
+        url = reverse('analyst:api_report_statuses')
+        data = self.client.get(url, {'ids': '999999'}).json()
+        self.assertEqual((data['version'], data['removed']), (read_versions(Report)[0], [999999]))
 
-# Create your tests here.
+        self.report.status = 'submitted'
+        self.report.save()
+        changed = self.client.get(url, {'ids': self.report.pk, 'since': data['version']}).json()['reports']
+        self.assertEqual([report['status'] for report in changed], ['submitted'])
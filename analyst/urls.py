@@ -38,5 +38,6 @@ urlpatterns = [
     # ========================================================================
     path('api/admin-users/', views.get_admin_users_api, name='api_admin_users'),
     path('api/report-status/<int:report_id>/', views.get_report_status_api, name='api_report_status'),
+    path('api/report-statuses/', views.get_report_statuses_api, name='api_report_statuses'),
     path('api/validate-admin/<int:user_id>/', views.validate_admin_api, name='api_validate_admin'),
 ]
\ No newline at end of file
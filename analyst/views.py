@@ -9,8 +9,13 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.db.models import Count, Prefetch, Q
 from django.core.exceptions import PermissionDenied
 from login.models import UserProfile
+from login.roles import get_user_role
+from login.events import report_status_event
+from login.utils import get_hazard_setting
+from login.versions import versioned
 from .models import DartBuoy, update_india_buoys, BuoyReading, Report, ReportComment
 import json
 import random
@@ -24,14 +29,13 @@ from datetime import datetime, timedelta
 def analyst_required(view_func):
     """Decorator to ensure user has analyst privileges"""
     def wrapper(request, *args, **kwargs):
-        try:
-            user_type = request.user.userprofile.user_type
-            # Allow both analysts and admins to access analyst dashboard
-            if user_type not in ['analyst', 'admin']:
-                return redirect('login')
-        except UserProfile.DoesNotExist:
+        user_type = get_user_role(request.user)
+        if user_type is None:
             messages.error(request, "User profile not found.")
             return redirect('login')
+        # Allow both analysts and admins to access analyst dashboard
+        if user_type not in ['analyst', 'admin']:
+            return redirect('login')
         return view_func(request, *args, **kwargs)
     return login_required(wrapper)
 
@@ -46,8 +50,19 @@ def get_dashboard_context(user):
             'active_stations': 89,
             'alert_rate': "97.3%"
         },
+        # Report cards are polled in batches of at most this many ids
+        'report_status_batch_size': get_hazard_setting('REPORT_STATUS_MAX_IDS', 200),
     }
 
+def get_report_counts(reports):
+    """Total and per-status report counts in a single query"""
+    return reports.aggregate(
+        total_reports=Count('id'),
+        draft_reports=Count('id', filter=Q(status='draft')),
+        submitted_reports=Count('id', filter=Q(status='submitted')),
+        approved_reports=Count('id', filter=Q(status='approved')),
+    )
+
 def get_admin_users():
     """Get all admin users for dropdowns and validation"""
     admin_profiles = UserProfile.objects.filter(user_type='admin').select_related('user')
@@ -64,16 +79,13 @@ def dashboard_home(request):
     
     buoys = DartBuoy.objects.all()
     admin_list = get_admin_users()
-    reports = Report.objects.filter(created_by=request.user)
+    reports = Report.objects.filter(created_by=request.user).select_related('submitted_to')
     
     context = {
         'buoys': buoys,
         'admin_list': admin_list,
         'reports': reports,
-        'total_reports': reports.count(),
-        'draft_reports': reports.filter(status='draft').count(),
-        'submitted_reports': reports.filter(status='submitted').count(),
-        'approved_reports': reports.filter(status='approved').count(),
+        **get_report_counts(reports),
         **get_dashboard_context(request.user)
     }
     return render(request, 'analyst/index.html', context)
@@ -81,16 +93,14 @@ def dashboard_home(request):
 @analyst_required
 def dashboard(request):
     """Alternative dashboard view"""
-    reports = Report.objects.filter(created_by=request.user)
+    reports = Report.objects.filter(created_by=request.user).select_related('submitted_to')
     admin_list = get_admin_users()
     
     context = {
         'reports': reports,
         'admin_list': admin_list,
-        'total_reports': reports.count(),
-        'draft_reports': reports.filter(status='draft').count(),
-        'submitted_reports': reports.filter(status='submitted').count(),
-        'approved_reports': reports.filter(status='approved').count(),
+        'report_status_batch_size': get_hazard_setting('REPORT_STATUS_MAX_IDS', 200),
+        **get_report_counts(reports),
     }
     return render(request, 'analyst/index.html', context)
 
@@ -245,29 +255,21 @@ def edit_report(request, report_id):
 @analyst_required
 def my_reports(request):
     """View all reports created by current user"""
-    reports = Report.objects.filter(created_by=request.user).order_by('-created_at')
+    reports = Report.objects.filter(created_by=request.user).select_related('submitted_to').order_by('-created_at')
     admin_list = get_admin_users()
     
     context = {
         'reports': reports,
         'admin_list': admin_list,
-        'total_reports': reports.count(),
-        'draft_reports': reports.filter(status='draft').count(),
-        'submitted_reports': reports.filter(status='submitted').count(),
-        'approved_reports': reports.filter(status='approved').count(),
+        **get_report_counts(reports),
     }
     return render(request, 'analyst/my_reports.html', context)
 
 @analyst_required
 def update_report_status(request, report_id):
     """Update report status (admin-only function)"""
-    try:
-        user_profile = UserProfile.objects.get(user=request.user)
-        if user_profile.user_type != 'admin':
-            messages.error(request, 'Permission denied. Admin privileges required.')
-            return redirect('analyst:report_detail', report_id=report_id)
-    except UserProfile.DoesNotExist:
-        messages.error(request, 'User profile not found.')
+    if get_user_role(request.user) != 'admin':
+        messages.error(request, 'Permission denied. Admin privileges required.')
         return redirect('analyst:report_detail', report_id=report_id)
     
     report = get_object_or_404(Report, id=report_id)
@@ -307,16 +309,13 @@ def statistics(request):
 
 @analyst_required
 def reports(request):
-    reports = Report.objects.filter(created_by=request.user)
+    reports = Report.objects.filter(created_by=request.user).select_related('submitted_to')
     admin_list = get_admin_users()
     
     context = {
         'reports': reports,
         'admin_list': admin_list,
-        'total_reports': reports.count(),
-        'draft_reports': reports.filter(status='draft').count(),
-        'submitted_reports': reports.filter(status='submitted').count(),
-        'approved_reports': reports.filter(status='approved').count(),
+        **get_report_counts(reports),
         **get_dashboard_context(request.user)
     }
     return render(request, 'analyst/index.html', context)
@@ -331,6 +330,7 @@ def data_management(request):
 # ============================================================================
 
 @analyst_required
+@versioned(Report)
 def get_report_status(request, report_id):
     """Get current report status (AJAX endpoint)"""
     report = get_object_or_404(Report, id=report_id, created_by=request.user)
@@ -349,6 +349,34 @@ def get_report_status_api(request, report_id):
     """Alternative API endpoint for report status"""
     return get_report_status(request, report_id)
 
+@analyst_required
+@versioned(Report)
+def get_report_statuses_api(request):
+    """Statuses of many reports (?ids=1,2,3); with ?since=, only those changed after that version"""
+    try:
+        ids = {int(value) for value in request.GET.get('ids', '').split(',') if value}
+        since = int(request.GET['since']) if request.GET.get('since') else None
+    except ValueError:
+        return JsonResponse({'error': 'ids and since must be integers'}, status=400)
+    max_ids = get_hazard_setting('REPORT_STATUS_MAX_IDS', 200)
+    if len(ids) > max_ids:
+        return JsonResponse({'error': f'At most {max_ids} ids per request'}, status=400)
+    
+    # Read (for the ETag) before the rows: every version up to it has committed,
+    # so a client polling in several batches can resume from the lowest one
+    version = request.table_versions[Report]
+    # Every requested row comes back (so removals show up), but only the
+    # changed ones are sent; one query whatever the number of ids
+    reports = list(
+        Report.objects.filter(pk__in=ids, created_by=request.user).select_related('submitted_to')
+        .only('id', 'status', 'submitted_at', 'version', 'submitted_to__first_name', 'submitted_to__last_name')
+    )
+    return JsonResponse({
+        'version': max(version, since or 0),
+        'reports': [report_status_event(report) for report in reports if since is None or report.version > since],
+        'removed': sorted(ids - {report.pk for report in reports}),
+    })
+
 @analyst_required
 def get_admin_users_api(request):
     """API endpoint to get admin users (AJAX)"""
@@ -389,15 +417,18 @@ def validate_admin_api(request, user_id):
 # ============================================================================
 
 @analyst_required
+@versioned(DartBuoy, BuoyReading, rolling=True)
 def get_buoy_data(request):
     """API endpoint to get live buoy data for charts"""
     try:
+        # One query for all buoys' last 24 hours instead of one per buoy
+        recent = BuoyReading.objects.filter(timestamp__gte=timezone.now() - timedelta(hours=24)).order_by('timestamp')
+        buoys = DartBuoy.objects.prefetch_related(Prefetch('readings', queryset=recent, to_attr='recent_readings'))
+        
         buoys_data = []
-        for buoy in DartBuoy.objects.all():
-            readings = buoy.get_historical_data(hours=24)
-            
+        for buoy in buoys:
             chart_data = []
-            for reading in readings:
+            for reading in buoy.recent_readings:
                 chart_data.append({
                     'timestamp': reading.timestamp.isoformat(),
                     'wave_height': reading.wave_height,
@@ -2,6 +2,11 @@
 ASGI config for incois project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; the WebSocket live feed (visualizer/live.py) is served
+here directly, so run an ASGI server such as ``uvicorn incois.asgi:application``
+or gunicorn with ``-k uvicorn.workers.UvicornWorker``. Under ASGI the
+Server-Sent Events stream (login.events.event_stream) is an async iterator,
+so open streams wait on the event loop instead of holding a worker.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +18,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'incois.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Needs the app registry, which get_asgi_application() has just populated
+from visualizer.live import LIVE_FEED_PATH, live_feed  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] != 'websocket':
+        await django_application(scope, receive, send)
+    elif scope['path'] == LIVE_FEED_PATH:
+        await live_feed(scope, receive, send)
+    else:
+        # Reject the handshake of any other WebSocket path
+        await receive()
+        await send({'type': 'websocket.close'})
@@ -50,6 +50,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'login.roles.UserRoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -103,7 +104,15 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+# ProfileBackend loads UserProfile with the session's user, so role checks
+# need no extra query (login/roles.py). ModelBackend stays listed so sessions
+# signed in before it was added keep working until they expire.
+AUTHENTICATION_BACKENDS = [
+    'login.roles.ProfileBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB; larger multipart files spool to disk
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000
 
@@ -140,6 +149,8 @@ USE_TZ = True
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, 'uploads_in_progress')
+TILE_CACHE_DIR = os.path.join(BASE_DIR, 'tile_cache')
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -166,6 +177,108 @@ OCEAN_HAZARD_SETTINGS = {
     'MAP_DEFAULT_CENTER_LAT': 20.5937,  # India center
     'MAP_DEFAULT_CENTER_LNG': 78.9629,
     'MAP_DEFAULT_ZOOM': 5,
+    # Background reverse geocoding (python manage.py geocode_reports --loop)
+    'GEOCODE_BATCH_SIZE': 50,
+    'GEOCODE_MAX_ATTEMPTS': 5,
+    'GEOCODE_RETRY_BACKOFF_SECONDS': 60,
+    'GEOCODE_LEASE_SECONDS': 600,
+    'NOMINATIM_MIN_INTERVAL_SECONDS': 1.0,
+    # Offline gazetteer (python manage.py import_gazetteer <file>)
+    'GAZETTEER_MAX_DISTANCE_KM': 25,
+    'GAZETTEER_CELL_DEGREES': 0.25,
+    'GAZETTEER_RELOAD_SECONDS': 600,
+    # Report region (trend rollup dimension): nearest gazetteer region within this range
+    'REGION_MAX_DISTANCE_KM': 150,
+    # Geocode cache (python manage.py geocode_cache --prune)
+    'GEOCODE_CACHE_PRECISION_DEGREES': 0.003,  # ~330 m cells
+    'GEOCODE_CACHE_TTL_SECONDS': 30 * 24 * 3600,
+    'GEOCODE_CACHE_MAX_MEMORY_ENTRIES': 10000,
+    'GEOCODE_CACHE_MAX_DB_ENTRIES': 200000,
+    # Hit / miss tallies are added to the shared counters this often
+    'GEOCODE_CACHE_STATS_FLUSH_SECONDS': 60,
+    # Resumable uploads (api/uploads/); prune with python manage.py prune_uploads
+    'MEDIA_UPLOAD_CHUNK_MAX_BYTES': 8 * 1024 * 1024,
+    'MEDIA_UPLOAD_EXPIRY_HOURS': 24,
+    # Running digests kept per worker for in-progress uploads
+    'MEDIA_UPLOAD_HASHER_CACHE_SIZE': 256,
+    # Media renditions (python manage.py process_media --loop)
+    'MEDIA_THUMBNAIL_SIZE': 320,
+    'MEDIA_PREVIEW_SIZE': 1280,
+    'MEDIA_WEB_VIDEO_HEIGHT': 720,
+    'MEDIA_PROCESSING_BATCH_SIZE': 20,
+    'MEDIA_PROCESSING_MAX_ATTEMPTS': 3,
+    'MEDIA_PROCESSING_LEASE_SECONDS': 3600,  # outlasts the ffmpeg runs of one video
+    'MEDIA_FFMPEG_TIMEOUT_SECONDS': 600,
+    'FFMPEG_BINARY': 'ffmpeg',
+    # Bulk NDJSON ingest (api/reports/bulk/)
+    'BULK_INGEST_BATCH_SIZE': 200,
+    'BULK_INGEST_MAX_RECORDS': 5000,
+    # Delta sync (api/sync/reports/); prune with python manage.py prune_tombstones
+    'SYNC_PAGE_SIZE': 200,
+    'SYNC_MAX_PAGE_SIZE': 1000,
+    'SYNC_SAFETY_LAG_SECONDS': 2,
+    'SYNC_TOMBSTONE_RETENTION_DAYS': 30,
+    # Changelog feed (login/changelog.py, /api/changes/); entries newer than
+    # the lag are held back, older than the retention are pruned
+    'CHANGELOG_PAGE_SIZE': 500,
+    'CHANGELOG_MAX_PAGE_SIZE': 5000,
+    'CHANGELOG_SAFETY_LAG_SECONDS': 2,
+    'CHANGELOG_RETENTION_DAYS': 30,
+    # Urgent alert outbox (python manage.py dispatch_notifications --loop)
+    'NOTIFICATION_BATCH_SIZE': 100,
+    'NOTIFICATION_MAX_ATTEMPTS': 5,
+    'NOTIFICATION_RETRY_BACKOFF_SECONDS': 60,
+    'NOTIFICATION_MAX_PER_SECOND': 5,  # 0 disables the limit
+    'NOTIFICATION_LEASE_SECONDS': 600,
+    # bbox= / near= map queries; backfill with python manage.py backfill_geohashes
+    'SPATIAL_MAX_COVER_CELLS': 24,
+    'SPATIAL_DEFAULT_RADIUS_KM': 10,
+    'SPATIAL_MAX_RADIUS_KM': 500,
+    # Map clustering (map_data_api?zoom=)
+    'CLUSTER_RADIUS_PX': 60,
+    'CLUSTER_MIN_ZOOM': 0,
+    'CLUSTER_MAX_ZOOM': 16,
+    'CLUSTER_REFRESH_SECONDS': 5,
+    # GeoJSON tiles (/tiles/<layer>/<z>/<x>/<y>.geojson), cached in TILE_CACHE_DIR
+    'TILE_MAX_ZOOM': 18,
+    'TILE_CACHE_SECONDS': 3600,
+    'TILE_BROWSER_MAX_AGE_SECONDS': 60,
+    # Dashboard heatmap grids (south, west, north, east), cell size in degrees
+    'HEATMAP_BOUNDS': (-15.0, 30.0, 35.0, 120.0),
+    'HEATMAP_CELL_DEGREES': 0.25,
+    'HEATMAP_WINDOW_HOURS': 720,
+    'HEATMAP_REFRESH_SECONDS': 10,
+    'HEATMAP_DASHBOARD_MARKERS': 500,
+    # Keyset pagination: counts are exact up to the cap, estimated beyond it
+    'PAGINATION_COUNT_CAP': 1000,
+    'MAP_DATA_PAGE_SIZE': 500,
+    'MAP_DATA_MAX_PAGE_SIZE': 2000,
+    # Dashboard counters (login/counters.py); per-day buckets kept this long
+    'COUNTER_DAY_RETENTION_DAYS': 7,
+    # Conditional GETs over a rolling time window (login/versions.py) are
+    # recomputed at least this often even without writes
+    'ROLLING_ETAG_SECONDS': 300,
+    # Trend rollups (login/rollups.py); daily rows are kept forever
+    'ROLLUP_HOURLY_RETENTION_DAYS': 90,
+    'TRENDS_MAX_BUCKETS': 2000,
+    # Status event stream (login/events.py). LocalBroker only reaches streams
+    # served by the same process; use login.events.PostgresBroker (LISTEN /
+    # NOTIFY) when running several workers on PostgreSQL
+    'EVENT_BROKER': 'login.events.LocalBroker',
+    'EVENT_HISTORY_SIZE': 500,
+    'EVENT_LISTENER_RETRY_SECONDS': 5,
+    'SSE_QUEUE_SIZE': 100,
+    'SSE_HEARTBEAT_SECONDS': 15,
+    'SSE_MAX_STREAM_SECONDS': 300,
+    'SSE_RETRY_MS': 3000,
+    'SSE_MAX_REPORTS': 200,
+    # Batched analyst report status polling (/ana/api/report-statuses/)
+    'REPORT_STATUS_MAX_IDS': 200,
+    # WebSocket live feed (visualizer/live.py, served by incois/asgi.py); it
+    # shares EVENT_BROKER, so several ASGI workers need PostgresBroker too
+    'LIVE_FEED_QUEUE_SIZE': 500,
+    'LIVE_FEED_HEARTBEAT_SECONDS': 25,
+    'LIVE_FEED_MAX_BULK_EVENTS': 200,
 }
 
 # Django Rest Framework Settings (if using DRF)
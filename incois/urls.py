@@ -17,11 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
+from visualizer.views import map_tile
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('login.urls')),
     path('visual/', include('visualizer.urls')),
+    path('tiles/<slug:layer>/<int:z>/<int:x>/<int:y>.geojson', map_tile, name='map_tile'),
+    path('tiles/<slug:layer>/<int:z>/<int:x>/<int:y>', map_tile),
     path('ana/', include('analyst.urls')),
     path('', include('ocean_monitor.urls')),
     path('social_media/', include('scraper.urls'))
@@ -1,7 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile, HazardReport, HazardMedia, HazardHotspot, ReportFeedback
+from django.utils import timezone
+from django.utils.html import format_html
+from visualizer.live import publish_hazard_report_updates
+from visualizer.tiles import invalidate_queryset
+from .changelog import record_updates
+from .events import publish_hazard_report_statuses
+from .rollups import update_rolled_up
+from .models import (
+    UserProfile, HazardReport, HazardMedia, HazardHotspot, ReportFeedback, GazetteerPlace, GeocodeCacheEntry, MediaUpload, MediaBlob, HazardReportTombstone,
+    AlertSubscription, NotificationOutbox, NotificationDelivery, Counter, HazardReportRollup, ChangeLogEntry,
+)
 
 # Inline admin for UserProfile
 class UserProfileInline(admin.StackedInline):
@@ -44,7 +54,7 @@ class HazardReportAdmin(admin.ModelAdmin):
     ]
     list_filter = [
         'hazard_type', 'severity', 'status', 'urgent', 
-        'created_at', 'verified_at'
+        'geocode_status', 'created_at', 'verified_at'
     ]
     search_fields = [
         'report_id', 'description', 'location_name', 
@@ -58,7 +68,7 @@ class HazardReportAdmin(admin.ModelAdmin):
             'fields': ('report_id', 'reporter', 'hazard_type', 'severity', 'urgent')
         }),
         ('Location Details', {
-            'fields': ('latitude', 'longitude', 'location_name')
+            'fields': ('latitude', 'longitude', 'location_name', 'geocode_status')
         }),
         ('Description & Contact', {
             'fields': ('description', 'contact_number')
@@ -77,27 +87,51 @@ class HazardReportAdmin(admin.ModelAdmin):
     actions = ['mark_as_verified', 'mark_as_pending', 'mark_as_investigating']
     
     def mark_as_verified(self, request, queryset):
-        updated = queryset.update(status='verified', verified_by=request.user)
+        invalidate_queryset('reports', queryset)
+        previous_statuses = dict(queryset.values_list('pk', 'status'))
+        updated = update_rolled_up(queryset, status='verified', verified_by=request.user, updated_at=timezone.now())
+        publish_hazard_report_statuses(previous_statuses)
+        publish_hazard_report_updates(previous_statuses)
+        record_updates(HazardReport, previous_statuses)
         self.message_user(request, f'{updated} reports marked as verified.')
     mark_as_verified.short_description = "Mark selected reports as verified"
     
     def mark_as_pending(self, request, queryset):
-        updated = queryset.update(status='pending')
+        invalidate_queryset('reports', queryset)
+        previous_statuses = dict(queryset.values_list('pk', 'status'))
+        updated = update_rolled_up(queryset, status='pending', updated_at=timezone.now())
+        publish_hazard_report_statuses(previous_statuses)
+        publish_hazard_report_updates(previous_statuses)
+        record_updates(HazardReport, previous_statuses)
         self.message_user(request, f'{updated} reports marked as pending.')
     mark_as_pending.short_description = "Mark selected reports as pending"
     
     def mark_as_investigating(self, request, queryset):
-        updated = queryset.update(status='investigating')
+        invalidate_queryset('reports', queryset)
+        previous_statuses = dict(queryset.values_list('pk', 'status'))
+        updated = update_rolled_up(queryset, status='investigating', updated_at=timezone.now())
+        publish_hazard_report_statuses(previous_statuses)
+        publish_hazard_report_updates(previous_statuses)
+        record_updates(HazardReport, previous_statuses)
         self.message_user(request, f'{updated} reports marked as under investigation.')
     mark_as_investigating.short_description = "Mark selected reports as investigating"
 
 # Register HazardMedia
 @admin.register(HazardMedia)
 class HazardMediaAdmin(admin.ModelAdmin):
-    list_display = ['report', 'media_type', 'file_name', 'file_size_display', 'uploaded_at']
-    list_filter = ['media_type', 'uploaded_at']
-    search_fields = ['report__report_id', 'description']
-    readonly_fields = ['file_size', 'uploaded_at']
+    list_display = ['thumbnail_preview', 'report', 'media_type', 'file_name', 'file_size_display', 'processing_status', 'uploaded_at']
+    list_filter = ['media_type', 'processing_status', 'uploaded_at']
+    search_fields = ['report__report_id', 'description', 'content_hash']
+    readonly_fields = ['file_size', 'content_hash', 'thumbnail', 'preview', 'poster', 'web_video',
+                       'processing_status', 'processing_attempts', 'processing_claimed_at', 'uploaded_at']
+    list_select_related = ['report']
+    
+    def thumbnail_preview(self, obj):
+        # Only the small rendition is embedded; the original stays behind the link
+        if not obj.thumbnail:
+            return '-'
+        return format_html('<img src="{}" style="max-height:48px;max-width:64px;" loading="lazy">', obj.thumbnail.url)
+    thumbnail_preview.short_description = 'Preview'
     
     def file_name(self, obj):
         return obj.file.name.split('/')[-1] if obj.file else 'No file'
@@ -107,6 +141,21 @@ class HazardMediaAdmin(admin.ModelAdmin):
         return obj.get_file_size_display() if obj.file_size else 'Unknown'
     file_size_display.short_description = 'File Size'
 
+# Register MediaUpload
+@admin.register(MediaUpload)
+class MediaUploadAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'report', 'uploader', 'status', 'received_bytes', 'total_size', 'updated_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['file_name', 'report__report_id', 'uploader__username']
+    readonly_fields = ['upload_id', 'sha256', 'created_at', 'updated_at']
+
+# Register MediaBlob
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'name', 'size', 'ref_count', 'created_at']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'name', 'size', 'ref_count', 'created_at']
+
 # Register HazardHotspot
 @admin.register(HazardHotspot)
 class HazardHotspotAdmin(admin.ModelAdmin):
@@ -124,6 +173,80 @@ class HazardHotspotAdmin(admin.ModelAdmin):
         })
     )
 
+# Register GazetteerPlace
+@admin.register(GazetteerPlace)
+class GazetteerPlaceAdmin(admin.ModelAdmin):
+    list_display = ['name', 'region', 'latitude', 'longitude', 'population', 'source']
+    list_filter = ['source', 'region']
+    search_fields = ['name', 'region']
+    readonly_fields = ['created_at']
+
+# Register GeocodeCacheEntry
+@admin.register(GeocodeCacheEntry)
+class GeocodeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['cell_key', 'location_name', 'created_at', 'last_used_at']
+    search_fields = ['location_name', 'cell_key']
+    readonly_fields = ['cell_key', 'created_at', 'last_used_at']
+
+# Register HazardReportTombstone
+@admin.register(HazardReportTombstone)
+class HazardReportTombstoneAdmin(admin.ModelAdmin):
+    list_display = ['report_id', 'reporter_id', 'deleted_at']
+    search_fields = ['report_id']
+    readonly_fields = ['report_id', 'reporter_id', 'deleted_at']
+
+# Register AlertSubscription
+@admin.register(AlertSubscription)
+class AlertSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ['email', 'user', 'hazard_types', 'min_severity', 'is_active', 'created_at']
+    list_filter = ['is_active', 'min_severity']
+    search_fields = ['email', 'user__username']
+
+# Register NotificationOutbox
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['event_type', 'report', 'status', 'created_at', 'fanned_out_at']
+    list_filter = ['event_type', 'status']
+    search_fields = ['report__report_id']
+    readonly_fields = ['payload', 'created_at', 'fanned_out_at']
+
+# Register NotificationDelivery
+@admin.register(NotificationDelivery)
+class NotificationDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['event', 'subscription', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['subscription__email', 'event__report__report_id']
+    list_select_related = ['event', 'subscription']
+
+# Register Counter
+@admin.register(Counter)
+class CounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value', 'updated_at']
+    search_fields = ['name']
+    readonly_fields = ['updated_at']
+
+# Register HazardReportRollup
+@admin.register(HazardReportRollup)
+class HazardReportRollupAdmin(admin.ModelAdmin):
+    list_display = ['granularity', 'bucket', 'hazard_type', 'severity', 'status', 'region', 'count']
+    list_filter = ['granularity', 'hazard_type', 'severity', 'status']
+    search_fields = ['region']
+    date_hierarchy = 'bucket'
+
+# Register ChangeLogEntry (append-only: written by login/changelog.py)
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'action', 'model', 'object_id', 'changed_at']
+    list_filter = ['action', 'model']
+    search_fields = ['object_id']
+    readonly_fields = ['model', 'object_id', 'action', 'data', 'changed_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Register ReportFeedback
 @admin.register(ReportFeedback)
 class ReportFeedbackAdmin(admin.ModelAdmin):
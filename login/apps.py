@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class LoginConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'login'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .counters import seed_counters
+        from .search import create_search_tables
+        post_migrate.connect(create_search_tables, sender=self)
+        post_migrate.connect(seed_counters, sender=self)
@@ -0,0 +1,269 @@
+# ============================================================================
+# login/benchmarks.py - Query budget / query plan benchmarks for the test suite
+# ============================================================================
+
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+# Alias Django gives a table in FROM / JOIN clauses, e.g. "login_hazardreport" U0
+TABLE_ALIAS_RE = re.compile(r'"(\w+)" (?:AS )?"?(\w+)"?')
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+class QueryProfile:
+    """Queries, SQL time and wall time of the code run inside ``with QueryProfile():``"""
+
+    def __init__(self, using=connection):
+        self._capture = CaptureQueriesContext(using)
+        self.wall_seconds = 0.0
+
+    def __enter__(self):
+        self._capture.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall_seconds = time.perf_counter() - self._started
+        self._capture.__exit__(*exc_info)
+
+    @property
+    def queries(self):
+        return [query['sql'] for query in self._capture.captured_queries]
+
+    @property
+    def count(self):
+        return len(self._capture.captured_queries)
+
+    @property
+    def sql_seconds(self):
+        return sum(float(query['time']) for query in self._capture.captured_queries)
+
+
+def _sqlite_scans(sql, tables):
+    aliases = {alias: table for table, alias in TABLE_ALIAS_RE.findall(sql)}
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        plan = cursor.fetchall()
+    scans = set()
+    for row in plan:
+        # "SCAN t" reads every row; "SCAN t USING INDEX i" walks an index in order
+        match = re.fullmatch(r'SCAN (\w+)', row[-1])
+        if match and aliases.get(match[1], match[1]) in tables:
+            scans.add(aliases.get(match[1], match[1]))
+    return scans
+
+
+def _postgresql_scans(sql, tables):
+    def walk(node):
+        if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in tables:
+            yield node['Relation Name']
+        for child in node.get('Plans', ()):
+            yield from walk(child)
+
+    with connection.cursor() as cursor:
+        # Seeded tables are small enough that the planner may prefer a seq
+        # scan anyway; this only reports queries no index can serve
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+        cursor.execute('SET LOCAL enable_seqscan = on')
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return set(walk(plan[0]['Plan']))
+
+
+def full_scans(queries, tables):
+    """{sql: {table, ...}} for SELECTs whose plan reads all of one of ``tables``"""
+    explain = {'sqlite': _sqlite_scans, 'postgresql': _postgresql_scans}.get(connection.vendor)
+    if explain is None:
+        return {}
+    found = {}
+    for sql in queries:
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        scans = explain(sql, set(tables))
+        if scans:
+            found[sql] = scans
+    return found
+
+# ============================================================================
+# TEST CASE
+# ============================================================================
+
+class BenchmarkTestCase(TestCase):
+    """TestCase whose ``benchmark()`` blocks must stay within a query budget.
+
+    Subclasses seed realistic volumes in setUpTestData and list the large
+    tables in ``scan_tables``; a benchmarked block fails when it runs more
+    queries than declared or when a SELECT on one of those tables cannot use
+    an index. Results are printed after the class runs and appended as JSON
+    lines to the file named by the BENCHMARK_REPORT environment variable.
+    """
+
+    scan_tables = ('login_hazardreport',)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.benchmark_results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._report(cls.benchmark_results)
+        super().tearDownClass()
+
+    @contextmanager
+    def benchmark(self, name, max_queries, allow_scans=()):
+        with QueryProfile() as profile:
+            yield profile
+        scans = full_scans(profile.queries, set(self.scan_tables) - set(allow_scans))
+        self.benchmark_results.append({
+            'name': name,
+            'queries': profile.count,
+            'budget': max_queries,
+            'sql_ms': round(profile.sql_seconds * 1000, 2),
+            'wall_ms': round(profile.wall_seconds * 1000, 2),
+            'full_scans': sorted({table for tables in scans.values() for table in tables}),
+        })
+        self.assertLessEqual(
+            profile.count, max_queries,
+            f"{name} ran {profile.count} queries (budget {max_queries}):\n" + '\n'.join(profile.queries),
+        )
+        self.assertFalse(scans, f"{name} runs full table scans:\n" + '\n'.join(
+            f"{', '.join(sorted(tables))}: {sql}" for sql, tables in scans.items()
+        ))
+
+    @staticmethod
+    def _report(results):
+        if not results:
+            return
+        for result in results:
+            sys.stderr.write(
+                f"\n  {result['name']:<40} {result['queries']:>3}/{result['budget']:<3} queries"
+                f" {result['sql_ms']:>9.2f} ms SQL {result['wall_ms']:>9.2f} ms wall"
+            )
+        sys.stderr.write('\n')
+        path = os.environ.get('BENCHMARK_REPORT')
+        if path:
+            with open(path, 'a') as report:
+                for result in results:
+                    report.write(json.dumps(result) + '\n')
+
+def use_temporary_tile_cache():
+    """Call from setUpModule: map tiles go to a temp dir, removed after the module"""
+    directory = tempfile.mkdtemp()
+    override = override_settings(TILE_CACHE_DIR=directory)
+    override.enable()
+    unittest.addModuleCleanup(shutil.rmtree, directory, ignore_errors=True)
+    unittest.addModuleCleanup(override.disable)
+
+# ============================================================================
+# SEED DATA
+# ============================================================================
+
+# Roughly the Indian coastline, where reports cluster
+SEED_BOUNDS = (8.0, 68.0, 23.0, 90.0)
+
+
+def seed_hazard_reports(reporters, count, days=60, media_every=10, seed=0):
+    """Bulk insert ``count`` reports spread over the last ``days`` days.
+
+    Goes through the bulk ingest signal, so counters, rollups and the
+    search index see them like any other bulk upload.
+    """
+    from .models import HazardMedia, HazardReport
+    from .report_ids import report_id_allocator
+    from .signals import hazard_reports_bulk_created
+    from .spatial import encode_geohash
+
+    rng = random.Random(seed)
+    south, west, north, east = SEED_BOUNDS
+    hazard_types = [value for value, _ in HazardReport.HAZARD_TYPES]
+    severities = [value for value, _ in HazardReport.SEVERITY_LEVELS]
+    statuses = [value for value, _ in HazardReport.STATUS_CHOICES]
+    now = timezone.now()
+
+    reports = []
+    for report_id in report_id_allocator.allocate_many(count):
+        latitude = round(rng.uniform(south, north), 6)
+        longitude = round(rng.uniform(west, east), 6)
+        reports.append(HazardReport(
+            reporter=rng.choice(reporters), report_id=report_id,
+            hazard_type=rng.choice(hazard_types), severity=rng.choice(severities), status=rng.choice(statuses),
+            description=f"Seeded {report_id} observation of the sea state near the coast",
+            latitude=latitude, longitude=longitude, geohash=encode_geohash(latitude, longitude),
+            urgent=rng.random() < 0.05,
+        ))
+    # Rows and their counters commit together, as in bulk ingest
+    with transaction.atomic():
+        reports = HazardReport.objects.bulk_create(reports, batch_size=500)
+
+        # auto_now_add stamps every row with now; spread them out afterwards
+        for report in reports:
+            report.created_at = report.updated_at = now - timedelta(seconds=rng.uniform(0, days * 86400))
+        HazardReport.objects.bulk_update(reports, ['created_at', 'updated_at'], batch_size=500)
+        hazard_reports_bulk_created.send(sender=HazardReport, reports=reports)
+
+    if media_every:
+        HazardMedia.objects.bulk_create([
+            HazardMedia(report=report, file=f'hazard_reports/{report.report_id}/photo.jpg', media_type='image')
+            for report in reports[::media_every]
+        ], batch_size=500)
+    return reports
+
+
+def seed_buoys(count, hours=48, interval_minutes=30, seed=0):
+    """``count`` buoys with a reading every ``interval_minutes`` over ``hours``"""
+    from analyst.models import BuoyReading, DartBuoy
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    buoys = DartBuoy.objects.bulk_create([
+        DartBuoy(
+            buoy_id=f'B{index:05d}', name=f'Seed buoy {index}', status='active', last_report_time=now,
+            latitude=rng.uniform(-10, 20), longitude=rng.uniform(60, 95), wave_height=rng.uniform(0.5, 4),
+        )
+        for index in range(count)
+    ])
+    steps = hours * 60 // interval_minutes
+    BuoyReading.objects.bulk_create([
+        BuoyReading(
+            buoy=buoy, timestamp=now - timedelta(minutes=interval_minutes * step),
+            wave_height=rng.uniform(0.5, 4), water_temperature=rng.uniform(24, 31),
+            wind_speed=rng.uniform(0, 20), pressure=rng.uniform(995, 1020),
+        )
+        for buoy in buoys for step in range(steps)
+    ], batch_size=1000)
+    return buoys
+
+
+def seed_analyst_reports(authors, assignees, count, seed=0):
+    from analyst.models import Report
+
+    rng = random.Random(seed)
+    statuses = [value for value, _ in Report.STATUS_CHOICES]
+    report_types = [value for value, _ in Report.REPORT_TYPES]
+    return Report.objects.bulk_create([
+        Report(
+            title=f'Seeded analysis {index}', description='Summary of observed coastal conditions',
+            report_type=rng.choice(report_types), status=rng.choice(statuses),
+            created_by=rng.choice(authors), submitted_to=rng.choice(assignees),
+        )
+        for index in range(count)
+    ], batch_size=500)
@@ -0,0 +1,174 @@
+# ============================================================================
+# login/bulk_ingest.py - Batched NDJSON ingest of HazardReport records
+# ============================================================================
+
+import json
+
+from django.db import IntegrityError, transaction
+
+from .forms import HazardReportForm
+from .gazetteer import lookup_region
+from .geocoding import provisional_location_name
+from .notifications import enqueue_urgent_events
+from .report_ids import report_id_allocator
+from .spatial import encode_geohash
+from .signals import hazard_reports_bulk_created
+from .utils import get_hazard_setting
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+
+def iter_ndjson(stream):
+    """Yield (line_number, record, error) for each non-blank line of ``stream``"""
+    for line_number, raw in enumerate(stream, start=1):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def _validate(reporter, line_number, record):
+    """Run HazardReportForm validation; returns (instance, result)"""
+    key = record.get('idempotency_key')
+    result = {'line': line_number, 'idempotency_key': key}
+    if key is not None and (not isinstance(key, str) or not 0 < len(key) <= IDEMPOTENCY_KEY_MAX_LENGTH):
+        result.update(status='invalid', errors={'idempotency_key': [
+            f"Must be a string of 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters"
+        ]})
+        return None, result
+
+    data = dict(record)
+    for field in ('latitude', 'longitude'):
+        # JSON numbers arrive as floats; drop binary noise beyond the column's 10 places
+        if isinstance(data.get(field), float):
+            data[field] = round(data[field], 10)
+    form = HazardReportForm(data=data)
+    if not form.is_valid():
+        result.update(status='invalid', errors={field: list(errors) for field, errors in form.errors.items()})
+        return None, result
+
+    report = form.save(commit=False)
+    report.reporter = reporter
+    report.idempotency_key = key
+    report.report_id = report_id_allocator.allocate()
+    report.location_name = provisional_location_name(report.latitude, report.longitude)
+    report.geohash = encode_geohash(report.latitude, report.longitude)
+    report.region = lookup_region(report.latitude, report.longitude)
+    report.geocode_status = 'pending'
+    return report, result
+
+
+def _insert_batch(reporter, pending):
+    """bulk_create the batch; on a key race fall back to row-by-row inserts.
+
+    The bulk signal is sent inside the insert's transaction, so the rows
+    and their counters, rollups and index entries commit together. Rows
+    saved one at a time send post_save instead.
+    """
+    from .models import HazardReport
+
+    reports = [report for report, _ in pending]
+    try:
+        with transaction.atomic():
+            HazardReport.objects.bulk_create(reports)
+            enqueue_urgent_events(reports)
+            hazard_reports_bulk_created.send(sender=HazardReport, reports=reports)
+        created = reports
+    except IntegrityError:
+        # A concurrent retry inserted one of these keys after we looked them up
+        created = []
+        for report, result in pending:
+            report.pk = None
+            try:
+                with transaction.atomic():
+                    report.save()
+                    enqueue_urgent_events([report])
+                created.append(report)
+            except IntegrityError:
+                # Without a key the failure cannot be a duplicate of an earlier submission
+                if not report.idempotency_key:
+                    raise
+                existing = HazardReport.objects.filter(
+                    reporter=reporter, idempotency_key=report.idempotency_key
+                ).values_list('report_id', flat=True).first()
+                if existing is None:
+                    raise
+                report.report_id = existing
+                result['status'] = 'duplicate'
+
+    for report, result in pending:
+        result['report_id'] = report.report_id
+        result.setdefault('status', 'created')
+    return created
+
+
+def _flush(reporter, batch, results):
+    """Validate one batch, skip known keys with a single lookup, insert the rest"""
+    from .models import HazardReport
+
+    validated = [_validate(reporter, line_number, record) for line_number, record in batch]
+    keys = {report.idempotency_key for report, _ in validated if report is not None and report.idempotency_key}
+    existing = dict(
+        HazardReport.objects.filter(reporter=reporter, idempotency_key__in=keys)
+        .values_list('idempotency_key', 'report_id')
+    ) if keys else {}
+
+    pending = []
+    for report, result in validated:
+        results.append(result)
+        if report is None:
+            continue
+        key = report.idempotency_key
+        if key and key in existing:
+            result.update(status='duplicate', report_id=existing[key])
+            continue
+        if key:
+            # Later copies of a key within the same request map to the first one
+            existing[key] = report.report_id
+        pending.append((report, result))
+
+    return _insert_batch(reporter, pending) if pending else []
+
+
+def ingest_reports(reporter, stream, batch_size=None, max_records=None):
+    """Ingest NDJSON hazard reports from ``stream`` for ``reporter``.
+
+    Records are validated and inserted batch by batch so memory stays bounded
+    by the batch size however long the upload is. Returns per-record results
+    in input order plus the list of created reports.
+    """
+    batch_size = batch_size or get_hazard_setting('BULK_INGEST_BATCH_SIZE', 200)
+    max_records = max_records or get_hazard_setting('BULK_INGEST_MAX_RECORDS', 5000)
+
+    results = []
+    created = []
+    batch = []
+    seen = 0
+    for line_number, record, error in iter_ndjson(stream):
+        seen += 1
+        if seen > max_records:
+            # Earlier batches are already stored; the client resends the rest
+            results.append({'line': line_number, 'status': 'invalid', 'errors': {
+                '__all__': [f"Record limit of {max_records} per request reached; this and later lines were not read"]
+            }})
+            break
+        if error:
+            results.append({'line': line_number, 'status': 'invalid', 'errors': {'__all__': [error]}})
+            continue
+        batch.append((line_number, record))
+        if len(batch) >= batch_size:
+            created.extend(_flush(reporter, batch, results))
+            batch = []
+    if batch:
+        created.extend(_flush(reporter, batch, results))
+
+    results.sort(key=lambda result: result['line'])
+    return results, created
@@ -0,0 +1,128 @@
+# ============================================================================
+# login/changelog.py - Append-only change feed of the tracked tables
+# ============================================================================
+
+from datetime import timedelta
+
+from django.core import serializers
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .counters import apply_deltas, read_counters
+from .utils import get_hazard_setting
+
+# Highest sequence deleted by prune_changelog(); older cursors must resync
+PRUNED_THROUGH = 'changelog:pruned_through'
+
+
+class ChangelogPruned(Exception):
+    """Raised when a cursor points at entries that have already been pruned"""
+
+
+def tracked_models():
+    """Models whose inserts, updates and deletes are logged"""
+    from analyst.models import BuoyReading, Report
+    from ocean_monitor.models import OceanHazard
+    from scraper.models import SocialMediaPost
+
+    from .models import HazardReport
+
+    return (HazardReport, Report, BuoyReading, OceanHazard, SocialMediaPost)
+
+# ============================================================================
+# RECORDING
+# ============================================================================
+
+def snapshot(instance):
+    """Field values of ``instance`` as the serializers dump them; deferred fields are left out"""
+    deferred = instance.get_deferred_fields()
+    fields = [field.name for field in instance._meta.concrete_fields if field.attname not in deferred]
+    return serializers.serialize('python', [instance], fields=fields)[0]['fields']
+
+
+def record_changes(action, instances):
+    """Log ``action`` for each instance once the writer's transaction commits.
+
+    Entries get their sequence numbers right after the commit rather than
+    inside a possibly long transaction, and a rolled-back change is never
+    logged.
+    """
+    from .models import ChangeLogEntry
+
+    entries = [
+        ChangeLogEntry(
+            model=instance._meta.label_lower, object_id=str(instance.pk), action=action,
+            data=None if action == 'delete' else snapshot(instance),
+        )
+        for instance in instances
+    ]
+    if entries:
+        transaction.on_commit(lambda: _write(entries))
+
+
+def _write(entries):
+    from .models import ChangeLogEntry
+
+    now = timezone.now()
+    for entry in entries:
+        entry.changed_at = now
+    ChangeLogEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+def record_updates(model, pks):
+    """Log rows changed with queryset.update() / bulk_update(), which send no signals"""
+    record_changes('update', model.objects.filter(pk__in=list(pks)))
+
+# ============================================================================
+# READING
+# ============================================================================
+
+def changes_after(since, limit, models=None):
+    """Return (entries, next_since, has_more) for the entries after sequence ``since``.
+
+    Entries stamped within CHANGELOG_SAFETY_LAG_SECONDS are held back, and
+    the page stops at the first of them: a concurrent writer may still be
+    committing a lower sequence number, which a cursor that moved past it
+    would never see. Raises ChangelogPruned if ``since`` is behind the
+    retention window.
+    """
+    from .models import ChangeLogEntry
+
+    if since < read_counters([PRUNED_THROUGH])[PRUNED_THROUGH]:
+        raise ChangelogPruned(since)
+
+    entries = ChangeLogEntry.objects.filter(pk__gt=since)
+    if models:
+        entries = entries.filter(model__in=models)
+    entries = list(entries.order_by('pk')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    horizon = timezone.now() - timedelta(seconds=get_hazard_setting('CHANGELOG_SAFETY_LAG_SECONDS', 2))
+    for index, entry in enumerate(entries):
+        if entry.changed_at > horizon:
+            # Not ready yet, so poll again later rather than right away
+            entries, has_more = entries[:index], False
+            break
+    return entries, entries[-1].pk if entries else since, has_more
+
+
+def latest_sequence():
+    from .models import ChangeLogEntry
+
+    return ChangeLogEntry.objects.aggregate(latest=Max('pk'))['latest'] or 0
+
+
+def prune_changelog():
+    """Delete entries older than CHANGELOG_RETENTION_DAYS; returns how many"""
+    from .models import ChangeLogEntry
+
+    cutoff = timezone.now() - timedelta(days=get_hazard_setting('CHANGELOG_RETENTION_DAYS', 30))
+    with transaction.atomic():
+        last = ChangeLogEntry.objects.filter(changed_at__lt=cutoff).aggregate(last=Max('pk'))['last']
+        if last is None:
+            return 0
+        removed, _ = ChangeLogEntry.objects.filter(pk__lte=last).delete()
+        apply_deltas({PRUNED_THROUGH: last - read_counters([PRUNED_THROUGH])[PRUNED_THROUGH]})
+    return removed
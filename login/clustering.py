@@ -0,0 +1,234 @@
+# ============================================================================
+# login/clustering.py - Zoom-aware hierarchical point clustering for maps
+# ============================================================================
+
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .utils import get_hazard_setting
+
+TILE_SIZE = 256
+MAX_MERCATOR_LAT = 85.05112878
+
+# ============================================================================
+# PROJECTION
+# ============================================================================
+
+def world_pixel(latitude, longitude, zoom):
+    """Web Mercator pixel coordinates of a point at ``zoom``"""
+    latitude = max(min(latitude, MAX_MERCATOR_LAT), -MAX_MERCATOR_LAT)
+    scale = TILE_SIZE * 2 ** zoom
+    x = (longitude + 180.0) / 360.0 * scale
+    sin_lat = math.sin(math.radians(latitude))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    return x, y
+
+# ============================================================================
+# CLUSTER INDEX
+# ============================================================================
+
+class Cluster:
+    __slots__ = ('count', 'lat_sum', 'lng_sum', 'severity', 'urgent', 'id_xor')
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lng_sum = 0.0
+        self.severity = {}
+        self.urgent = 0
+        # XOR of member IDs: once a single member is left, this *is* its ID,
+        # without keeping per-cell member lists at every zoom level
+        self.id_xor = 0
+
+    @property
+    def report_id(self):
+        return self.id_xor.to_bytes((self.id_xor.bit_length() + 7) // 8, 'big').decode()
+
+    def add(self, point, sign):
+        report_id, latitude, longitude, severity, urgent = point
+        self.count += sign
+        self.lat_sum += sign * latitude
+        self.lng_sum += sign * longitude
+        self.severity[severity] = self.severity.get(severity, 0) + sign
+        if not self.severity[severity]:
+            del self.severity[severity]
+        self.urgent += sign * int(urgent)
+        self.id_xor ^= int.from_bytes(report_id.encode(), 'big')
+
+
+class ClusterIndex:
+    """Per-zoom grid of cluster aggregates, in the style of supercluster.
+
+    A cell is ``radius`` screen pixels wide at its zoom, so every cell at zoom
+    z splits into at most four cells at z + 1 and the levels form a tree.
+    Each point is added to (or removed from) one cell per zoom, which keeps
+    incremental updates O(zoom levels) rather than a full rebuild.
+    """
+
+    def __init__(self, min_zoom=0, max_zoom=16, radius=60):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.radius = radius
+        self.levels = {zoom: {} for zoom in range(min_zoom, max_zoom + 1)}
+        self.points = {}
+
+    def _cell(self, latitude, longitude, zoom):
+        x, y = world_pixel(latitude, longitude, zoom)
+        return int(x // self.radius), int(y // self.radius)
+
+    def _apply(self, point, sign):
+        _, latitude, longitude, _, _ = point
+        for zoom, cells in self.levels.items():
+            key = self._cell(latitude, longitude, zoom)
+            cluster = cells.get(key)
+            if cluster is None:
+                cluster = cells[key] = Cluster()
+            cluster.add(point, sign)
+            if cluster.count <= 0:
+                del cells[key]
+
+    def upsert(self, report_id, latitude, longitude, severity, urgent):
+        self.remove(report_id)
+        point = (report_id, float(latitude), float(longitude), severity, bool(urgent))
+        self.points[report_id] = point
+        self._apply(point, 1)
+
+    def remove(self, report_id):
+        point = self.points.pop(report_id, None)
+        if point is not None:
+            self._apply(point, -1)
+
+    def expansion_zoom(self, zoom, key):
+        """First zoom at which the cluster in ``key`` splits into several"""
+        x, y = key
+        for next_zoom in range(zoom + 1, self.max_zoom + 1):
+            cells = self.levels[next_zoom]
+            x, y = x * 2, y * 2
+            children = [(x + dx, y + dy) for dx in (0, 1) for dy in (0, 1) if (x + dx, y + dy) in cells]
+            if len(children) != 1:
+                return next_zoom
+            x, y = children[0]
+        return self.max_zoom
+
+    def clusters(self, zoom, bbox=None):
+        """Clusters at ``zoom`` whose cell touches bbox (south, west, north, east)"""
+        zoom = max(self.min_zoom, min(self.max_zoom, zoom))
+        cells = self.levels[zoom]
+        if bbox is None:
+            keys = cells.keys()
+        else:
+            south, west, north, east = bbox
+            min_x, min_y = self._cell(north, west, zoom)
+            max_x, max_y = self._cell(south, east, zoom)
+            span = (max_x - min_x + 1) * (max_y - min_y + 1)
+            if span < len(cells):
+                keys = [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1) if (x, y) in cells]
+            else:
+                keys = [key for key in cells if min_x <= key[0] <= max_x and min_y <= key[1] <= max_y]
+
+        results = []
+        for key in keys:
+            results.append(self.serialize(cells[key], zoom, key))
+        return results
+
+    def serialize(self, cluster, zoom, key):
+        data = {
+            'lat': round(cluster.lat_sum / cluster.count, 6),
+            'lng': round(cluster.lng_sum / cluster.count, 6),
+            'count': cluster.count,
+            'severity': dict(cluster.severity),
+            'urgent': cluster.urgent,
+        }
+        if cluster.count == 1:
+            data['id'] = cluster.report_id
+        else:
+            data['expansion_zoom'] = self.expansion_zoom(zoom, key)
+        return data
+
+
+def cluster_points(points, zoom, bbox=None, radius=None):
+    """One-off clustering of (report_id, lat, lng, severity, urgent) tuples at a single zoom"""
+    radius = radius or get_hazard_setting('CLUSTER_RADIUS_PX', 60)
+    max_zoom = get_hazard_setting('CLUSTER_MAX_ZOOM', 16)
+    zoom = max(0, min(zoom, max_zoom))
+    index = ClusterIndex(min_zoom=zoom, max_zoom=min(zoom + 4, max_zoom), radius=radius)
+    for point in points:
+        index.upsert(*point)
+    return index.clusters(zoom, bbox)
+
+# ============================================================================
+# SHARED INCREMENTAL INDEXES
+# ============================================================================
+
+class LiveClusterIndex:
+    """ClusterIndex kept in step with HazardReport through a change watermark.
+
+    ``verified_only`` selects the public map (verified reports) versus the
+    admin/analyst map (every report). Each refresh only reads reports whose
+    updated_at moved past the watermark and tombstones of deleted reports.
+    """
+
+    def __init__(self, verified_only):
+        self.verified_only = verified_only
+        self._lock = threading.Lock()
+        self._index = None
+        self._watermark = None
+        self._checked_at = 0.0
+
+    def _new_index(self):
+        return ClusterIndex(
+            min_zoom=get_hazard_setting('CLUSTER_MIN_ZOOM', 0),
+            max_zoom=get_hazard_setting('CLUSTER_MAX_ZOOM', 16),
+            radius=get_hazard_setting('CLUSTER_RADIUS_PX', 60),
+        )
+
+    def _load(self, index, reports):
+        for report_id, latitude, longitude, severity, urgent, status in reports:
+            if self.verified_only and status != 'verified':
+                index.remove(report_id)
+            else:
+                index.upsert(report_id, latitude, longitude, severity, urgent)
+
+    def refresh(self):
+        from .models import HazardReport, HazardReportTombstone
+
+        fields = ('report_id', 'latitude', 'longitude', 'severity', 'urgent', 'status')
+        # Re-read a short overlap so rows committed late with an earlier
+        # updated_at are not missed; upserts make the overlap harmless
+        overlap = timedelta(seconds=get_hazard_setting('SYNC_SAFETY_LAG_SECONDS', 2))
+        started = timezone.now()
+        if self._index is None:
+            index = self._new_index()
+            reports = HazardReport.objects.all()
+            if self.verified_only:
+                reports = reports.filter(status='verified')
+            self._load(index, reports.values_list(*fields).iterator(chunk_size=2000))
+            self._index = index
+        else:
+            since = self._watermark - overlap
+            changed = HazardReport.objects.filter(updated_at__gte=since).values_list(*fields)
+            self._load(self._index, changed)
+            for report_id in HazardReportTombstone.objects.filter(deleted_at__gte=since).values_list('report_id', flat=True):
+                self._index.remove(report_id)
+        self._watermark = started
+
+    def get(self):
+        """Return the index, refreshing it at most every CLUSTER_REFRESH_SECONDS"""
+        with self._lock:
+            interval = get_hazard_setting('CLUSTER_REFRESH_SECONDS', 5)
+            if self._index is None or time.monotonic() - self._checked_at >= interval:
+                self.refresh()
+                self._checked_at = time.monotonic()
+            return self._index
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+
+public_clusters = LiveClusterIndex(verified_only=True)
+all_clusters = LiveClusterIndex(verified_only=False)
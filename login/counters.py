@@ -0,0 +1,245 @@
+# ============================================================================
+# login/counters.py - Incrementally maintained dashboard counters
+# ============================================================================
+
+from collections import Counter as Tally
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .utils import get_hazard_setting
+
+# ============================================================================
+# COUNTER NAMES
+# ============================================================================
+
+def day_key(moment):
+    return timezone.localdate(moment).isoformat()
+
+
+def month_key(moment):
+    return timezone.localdate(moment).strftime('%Y-%m')
+
+
+def hazard_report_counters(state):
+    """Counters one HazardReport contributes 1 to, from (reporter_id, status, severity, urgent, created_at)"""
+    reporter_id, status, severity, urgent, created_at = state
+    names = [
+        'reports:total',
+        f'reports:status:{status}',
+        f'reports:severity:{severity}',
+        f'reports:day:{day_key(created_at)}',
+        f'reporter:{reporter_id}:total',
+        f'reporter:{reporter_id}:status:{status}',
+        f'reporter:{reporter_id}:month:{month_key(created_at)}',
+    ]
+    if status == 'pending' and severity == 'critical':
+        names.append('reports:critical_pending')
+    if status == 'pending' and urgent:
+        names.append('reports:urgent_pending')
+    return names
+
+
+def user_profile_counters(state):
+    user_type, = state
+    return [f'profiles:{user_type}']
+
+
+def analyst_report_counters(state):
+    status, submitted_to_id = state
+    names = ['analyst_reports:total', f'analyst_reports:status:{status}']
+    if submitted_to_id:
+        names += [f'analyst_reports:assigned:{submitted_to_id}', f'analyst_reports:assigned:{submitted_to_id}:status:{status}']
+    return names
+
+
+def user_counters(state):
+    return ['users:total']
+
+
+def _tracked():
+    from analyst.models import Report
+    from django.contrib.auth.models import User
+    from .models import HazardReport, UserProfile
+
+    # model -> (fields whose values decide the counters, counter names for those values)
+    return {
+        HazardReport: (('reporter_id', 'status', 'severity', 'urgent', 'created_at'), hazard_report_counters),
+        UserProfile: (('user_type',), user_profile_counters),
+        Report: (('status', 'submitted_to_id'), analyst_report_counters),
+        User: ((), user_counters),
+    }
+
+# ============================================================================
+# INCREMENTAL UPDATES (driven by the receivers in login/signals.py)
+# ============================================================================
+
+# Loaded with a tracked field deferred: its changes are left to reconciliation
+UNTRACKED = 'untracked'
+
+
+def counter_state(instance):
+    fields, _ = _tracked()[type(instance)]
+    if any(field not in instance.__dict__ for field in fields):
+        return UNTRACKED
+    return tuple(instance.__dict__[field] for field in fields)
+
+
+def apply_deltas(deltas):
+    """Add each delta to its counter in one UPDATE, inside the caller's transaction"""
+    from .models import Counter
+
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        Counter.objects.bulk_create([Counter(name=name) for name in deltas], ignore_conflicts=True)
+        Counter.objects.filter(name__in=deltas).update(
+            value=F('value') + Case(*[When(name=name, then=Value(delta)) for name, delta in deltas.items()]),
+            updated_at=timezone.now(),
+        )
+
+
+def state_changed(instance, old_state, removed=False):
+    """Move an instance's contribution from its loaded state to its saved one (or drop it)"""
+    if old_state == UNTRACKED:
+        return UNTRACKED
+    _, counters_for = _tracked()[type(instance)]
+    deltas = Tally()
+    if old_state is not None:
+        deltas.subtract(counters_for(old_state))
+    new_state = None if removed else counter_state(instance)
+    if new_state is not None:
+        deltas.update(counters_for(new_state))
+    apply_deltas(deltas)
+    return new_state
+
+
+def objects_created(objects):
+    """Count rows inserted with bulk_create(), which sends no post_save"""
+    deltas = Tally()
+    for obj in objects:
+        _, counters_for = _tracked()[type(obj)]
+        deltas.update(counters_for(counter_state(obj)))
+    apply_deltas(deltas)
+
+
+def update_counted(queryset, **changes):
+    """queryset.update(**changes) that keeps the counters in step; returns the row count"""
+    from .versions import version_name
+
+    fields, counters_for = _tracked()[queryset.model]
+    with transaction.atomic():
+        rows = list(queryset.select_for_update().values_list(*fields))
+        updated = queryset.update(**changes)
+        deltas = Tally({version_name(queryset.model): 1})
+        for row in rows:
+            deltas.subtract(counters_for(row))
+            new = dict(zip(fields, row))
+            new.update({field: value for field, value in changes.items() if field in new})
+            deltas.update(counters_for(tuple(new.values())))
+        apply_deltas(deltas)
+    return updated
+
+# ============================================================================
+# READING
+# ============================================================================
+
+def read_counters(names):
+    """{name: value} for the given counters in a single query; missing ones are 0"""
+    from .models import Counter
+
+    values = dict(Counter.objects.filter(name__in=names).values_list('name', 'value'))
+    return {name: values.get(name, 0) for name in names}
+
+# ============================================================================
+# RECONCILIATION
+# ============================================================================
+
+def _recount():
+    """Every counter recomputed from the source tables with GROUP BY queries"""
+    from analyst.models import Report
+    from django.contrib.auth.models import User
+    from .models import HazardReport, UserProfile
+
+    totals = Tally({'users:total': User.objects.count()})
+    for row in UserProfile.objects.values('user_type').annotate(n=Count('pk')):
+        totals[f"profiles:{row['user_type']}"] += row['n']
+
+    reports = HazardReport.objects.order_by()
+    totals['reports:total'] = reports.count()
+    for field in ('status', 'severity'):
+        for row in reports.values(field).annotate(n=Count('pk')):
+            totals[f"reports:{field}:{row[field]}"] += row['n']
+    pending = reports.filter(status='pending')
+    totals['reports:critical_pending'] = pending.filter(severity='critical').count()
+    totals['reports:urgent_pending'] = pending.filter(urgent=True).count()
+
+    # Day buckets are rebuilt for the retention window, month buckets for this month
+    since = timezone.localdate() - timedelta(days=get_hazard_setting('COUNTER_DAY_RETENTION_DAYS', 7))
+    days = reports.filter(created_at__date__gte=since).annotate(day=TruncDate('created_at'))
+    for row in days.values('day').annotate(n=Count('pk')):
+        totals[f"reports:day:{row['day'].isoformat()}"] += row['n']
+    for row in reports.values('reporter_id', 'status').annotate(n=Count('pk')):
+        totals[f"reporter:{row['reporter_id']}:total"] += row['n']
+        totals[f"reporter:{row['reporter_id']}:status:{row['status']}"] += row['n']
+    month = month_key(timezone.now())
+    for row in reports.filter(created_at__date__gte=timezone.localdate().replace(day=1)).values('reporter_id').annotate(n=Count('pk')):
+        totals[f"reporter:{row['reporter_id']}:month:{month}"] += row['n']
+
+    analyst_reports = Report.objects.order_by()
+    totals['analyst_reports:total'] = analyst_reports.count()
+    for row in analyst_reports.values('status', 'submitted_to_id').annotate(n=Count('pk')):
+        totals[f"analyst_reports:status:{row['status']}"] += row['n']
+        if row['submitted_to_id']:
+            totals[f"analyst_reports:assigned:{row['submitted_to_id']}"] += row['n']
+            totals[f"analyst_reports:assigned:{row['submitted_to_id']}:status:{row['status']}"] += row['n']
+    return totals, since, month
+
+
+def reconcile_counters():
+    """Overwrite drifted counters with recomputed values; returns {name: (stored, actual)} of fixes.
+
+    Run periodically (reconcile_counters command). Day and month buckets
+    outside the retention window are deleted rather than recomputed.
+    """
+    from .models import Counter
+
+    with transaction.atomic():
+        # Lock first: a delta committed between the recount and the lock
+        # would otherwise be overwritten by the older total
+        stored = {counter.name: counter for counter in Counter.objects.select_for_update()}
+        totals, since, month = _recount()
+        fixes = {}
+        stale = []
+        for name, counter in stored.items():
+            if name.startswith(('version:', 'changelog:', 'geocode_cache:')):
+                # Table versions (login/versions.py), the changelog prune mark
+                # (login/changelog.py) and geocode cache lookup tallies
+                # (login/geocode_cache.py) have no source table to recount
+                continue
+            elif name.startswith('reports:day:') and name.rsplit(':', 1)[1] < since.isoformat():
+                stale.append(counter.pk)
+            elif ':month:' in name and name.rsplit(':', 1)[1] < month:
+                stale.append(counter.pk)
+            elif counter.value != totals.get(name, 0):
+                fixes[name] = (counter.value, totals.get(name, 0))
+                counter.value = totals.get(name, 0)
+        Counter.objects.filter(pk__in=stale).delete()
+        Counter.objects.bulk_update([stored[name] for name in fixes], ['value'])
+        missing = [Counter(name=name, value=value) for name, value in totals.items() if name not in stored and value]
+        Counter.objects.bulk_create(missing, ignore_conflicts=True)
+        fixes.update({counter.name: (0, counter.value) for counter in missing})
+    return fixes
+
+
+def seed_counters(**kwargs):
+    """post_migrate: count an existing database's rows the first time counters are deployed"""
+    from .models import Counter
+
+    # users:total is created with the first user and never removed
+    if not Counter.objects.filter(name='users:total').exists():
+        reconcile_counters()
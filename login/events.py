@@ -0,0 +1,338 @@
+# ============================================================================
+# login/events.py - Pub/sub behind the Server-Sent Events stream and live feed
+# ============================================================================
+
+import asyncio
+import itertools
+import json
+import logging
+import queue
+import select
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.db import connection, connections, transaction
+from django.utils.module_loading import import_string
+
+from .utils import get_hazard_setting
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CHANNELS AND PAYLOADS
+# ============================================================================
+
+def report_channels(report):
+    """Channels an analyst Report's events go to: the report itself and its author's feed"""
+    return [f'report:{report.pk}', f'report-author:{report.created_by_id}']
+
+
+def hazard_report_channels(report):
+    return [f'hazard-report:{report.report_id}', f'hazard-reporter:{report.reporter_id}']
+
+
+def report_status_event(report):
+    # Same fields as analyst.views.get_report_status
+    submitted_to = report.submitted_to
+    return {
+        'type': 'report',
+        'id': report.pk,
+        'status': report.status,
+        'status_display': report.get_status_display(),
+        'submitted_to': submitted_to.get_full_name() if submitted_to else None,
+        'submitted_at': report.submitted_at.isoformat() if report.submitted_at else None,
+    }
+
+
+def hazard_report_status_event(report):
+    return {
+        'type': 'hazard_report',
+        'id': report.report_id,
+        'status': report.status,
+        'status_display': report.get_status_display(),
+        'verified_at': report.verified_at.isoformat() if report.verified_at else None,
+    }
+
+# ============================================================================
+# BROKERS
+# ============================================================================
+
+class Subscription:
+    """A bounded queue of (event_id, channels, data) for one stream"""
+
+    def __init__(self, channels, size):
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(maxsize=size)
+        # Set when events were dropped; the stream then asks the client to resync
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    """Subscription read from an event loop (the WebSocket feed); put() may run on any thread"""
+
+    def __init__(self, channels, size, loop):
+        super().__init__(channels, size)
+        self.queue = asyncio.Queue(maxsize=size)
+        self.loop = loop
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The loop closed before the feed unsubscribed
+            pass
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """In-process fan-out to the subscriptions of this worker.
+
+    Keeps the last EVENT_HISTORY_SIZE events so a client reconnecting with
+    Last-Event-ID gets what it missed. Event IDs carry a per-process token:
+    an ID from another worker (or a restarted one) cannot be replayed, and
+    the stream tells that client to resync instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._token = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+        self._history = deque(maxlen=get_hazard_setting('EVENT_HISTORY_SIZE', 500))
+
+    def publish(self, channels, data, history=True):
+        """Send ``data`` to every subscriber of any of ``channels``; ``history=False`` skips the replay history"""
+        self.deliver(channels, data, history)
+
+    def deliver(self, channels, data, history=True):
+        with self._lock:
+            event = (f'{self._token}-{next(self._sequence)}', frozenset(channels), data)
+            if history:
+                self._history.append(event)
+            targets = {sub for channel in channels for sub in self._subscriptions.get(channel, ())}
+        for subscription in targets:
+            subscription.put(event)
+
+    def subscribe(self, channels, last_event_id=None, subscription=None):
+        """Subscription to ``channels``, or register a ready-made one; returns (subscription, replayable)"""
+        if subscription is None:
+            subscription = Subscription(channels, get_hazard_setting('SSE_QUEUE_SIZE', 100))
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+            replayable = self._replay(subscription, last_event_id)
+        return subscription, replayable
+
+    def _replay(self, subscription, last_event_id):
+        if not last_event_id:
+            return True
+        ids = [event[0] for event in self._history]
+        if last_event_id not in ids:
+            return False
+        for event in list(self._history)[ids.index(last_event_id) + 1:]:
+            if event[1] & subscription.channels:
+                subscription.put(event)
+        return True
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+
+class PostgresBroker(LocalBroker):
+    """Cross-worker fan-out over PostgreSQL LISTEN / NOTIFY.
+
+    Every process publishes with pg_notify() and runs one listener thread
+    (started with its first subscription) that hands each notification to
+    its local subscribers, including events this process published itself.
+    """
+
+    NOTIFY_CHANNEL = 'incois_events'
+
+    def __init__(self, using='default'):
+        super().__init__()
+        self.using = using
+        self._listener = None
+
+    def publish(self, channels, data, history=True):
+        payload = json.dumps({'channels': list(channels), 'data': data, 'history': history})
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.NOTIFY_CHANNEL, payload])
+
+    def subscribe(self, channels, last_event_id=None, subscription=None):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+        return super().subscribe(channels, last_event_id, subscription)
+
+    def _listen(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        while True:
+            listener = None
+            try:
+                listener = psycopg2.connect(**connections[self.using].get_connection_params())
+                listener.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.NOTIFY_CHANNEL}')
+                while True:
+                    if select.select([listener], [], [], 30) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        message = json.loads(listener.notifies.pop(0).payload)
+                        self.deliver(message['channels'], message['data'], message.get('history', True))
+            except Exception:
+                logger.exception("Event listener lost its connection; reconnecting")
+                time.sleep(get_hazard_setting('EVENT_LISTENER_RETRY_SECONDS', 5))
+            finally:
+                if listener is not None:
+                    listener.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide broker named by the EVENT_BROKER setting"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(get_hazard_setting('EVENT_BROKER', 'login.events.LocalBroker'))()
+        return _broker
+
+
+def publish_on_commit(channels, data, history=True):
+    """Publish once the writer's transaction commits, so nobody hears of a rolled-back change"""
+    transaction.on_commit(lambda: get_broker().publish(channels, data, history))
+
+
+def publish_hazard_report_statuses(pks):
+    """Announce the current status of HazardReports changed with queryset.update()"""
+    from .models import HazardReport
+
+    for report in HazardReport.objects.filter(pk__in=pks):
+        publish_on_commit(hazard_report_channels(report), hazard_report_status_event(report))
+
+# ============================================================================
+# SERVER-SENT EVENTS
+# ============================================================================
+
+def _format(event_id=None, event=None, data=None, retry=None, comment=None):
+    lines = []
+    if comment is not None:
+        lines.append(f': {comment}')
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    if data is not None:
+        lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _opening_frames(replayable):
+    frames = [_format(retry=get_hazard_setting('SSE_RETRY_MS', 3000), comment='connected')]
+    if not replayable:
+        frames.append(_format(event='resync', data={}))
+    return frames
+
+
+def _event_frames(subscription, event):
+    """Frames for one wait on the subscription: the event, or a keepalive when it timed out"""
+    frames = []
+    if subscription.overflowed:
+        subscription.overflowed = False
+        frames.append(_format(event='resync', data={}))
+    if event is None:
+        frames.append(_format(comment='keepalive'))
+    else:
+        event_id, _, data = event
+        frames.append(_format(event_id=event_id, event='status', data=data))
+    return frames
+
+
+def event_stream(channels, last_event_id=None, asynchronous=False):
+    """Iterator of SSE frames for a StreamingHttpResponse.
+
+    Sends a comment every SSE_HEARTBEAT_SECONDS so proxies keep the
+    connection open, and ends after SSE_MAX_STREAM_SECONDS; EventSource then
+    reconnects with Last-Event-ID, which also frees sync workers regularly.
+
+    Under ASGI pass ``asynchronous=True``: Django reads a sync iterator there
+    to the end before sending any of it, so the frames would only arrive
+    when the stream closes. The async iterator waits on the event loop
+    instead of holding a thread.
+    """
+    broker = get_broker()
+    # The stream never queries; don't hold a database connection for its lifetime
+    if not connection.in_atomic_block:
+        connection.close()
+    heartbeat = get_hazard_setting('SSE_HEARTBEAT_SECONDS', 15)
+    max_seconds = get_hazard_setting('SSE_MAX_STREAM_SECONDS', 300)
+
+    if asynchronous:
+        async def async_frames():
+            # Subscribed on first read, from the loop that will wait on the queue
+            subscription, replayable = broker.subscribe(channels, last_event_id, AsyncSubscription(
+                channels, get_hazard_setting('SSE_QUEUE_SIZE', 100), asyncio.get_running_loop()
+            ))
+            deadline = time.monotonic() + max_seconds
+            try:
+                for frame in _opening_frames(replayable):
+                    yield frame
+                while time.monotonic() < deadline:
+                    for frame in _event_frames(subscription, await subscription.get(timeout=heartbeat)):
+                        yield frame
+            finally:
+                broker.unsubscribe(subscription)
+
+        return async_frames()
+
+    subscription, replayable = broker.subscribe(channels, last_event_id)
+
+    def frames():
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield from _opening_frames(replayable)
+            while time.monotonic() < deadline:
+                yield from _event_frames(subscription, subscription.get(timeout=heartbeat))
+        finally:
+            broker.unsubscribe(subscription)
+
+    return frames()
@@ -0,0 +1,162 @@
+# ============================================================================
+# login/gazetteer.py - Offline reverse geocoding over a coastal gazetteer
+# ============================================================================
+
+import math
+import threading
+import time
+from collections import defaultdict
+
+from scraper.query_related import locations, location_coordinates
+from .utils import get_hazard_setting
+
+KM_PER_DEGREE = 111.32
+
+# ============================================================================
+# GRID INDEX
+# ============================================================================
+
+class GridIndex:
+    """Uniform lat/lng grid of places supporting nearest-place lookups"""
+
+    def __init__(self, cell_degrees):
+        self.cell_degrees = cell_degrees
+        self.cells = defaultdict(list)
+        self.size = 0
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+
+    def add(self, name, region, latitude, longitude):
+        self.cells[self._cell(latitude, longitude)].append((latitude, longitude, name, region))
+        self.size += 1
+
+    def nearest(self, latitude, longitude, max_km):
+        """Return (name, region, distance_km) of the closest place within max_km"""
+        cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+        lat_span = math.ceil(max_km / (KM_PER_DEGREE * self.cell_degrees))
+        lng_span = math.ceil(max_km / (KM_PER_DEGREE * cos_lat * self.cell_degrees))
+        row, col = self._cell(latitude, longitude)
+
+        best = None
+        best_dist_sq = (max_km / KM_PER_DEGREE) ** 2
+        for i in range(row - lat_span, row + lat_span + 1):
+            for j in range(col - lng_span, col + lng_span + 1):
+                for place_lat, place_lng, name, region in self.cells.get((i, j), ()):
+                    # Equirectangular approximation, accurate enough at gazetteer scale
+                    d_lat = place_lat - latitude
+                    d_lng = (place_lng - longitude) * cos_lat
+                    dist_sq = d_lat * d_lat + d_lng * d_lng
+                    if dist_sq <= best_dist_sq:
+                        best, best_dist_sq = (name, region), dist_sq
+
+        if best is None:
+            return None
+        return best[0], best[1], math.sqrt(best_dist_sq) * KM_PER_DEGREE
+
+# ============================================================================
+# SHARED INDEX
+# ============================================================================
+
+_index = None
+_index_loaded_at = 0.0
+_index_lock = threading.Lock()
+
+def seed_places():
+    """Coastal towns tracked by the social media scraper"""
+    for name in locations:
+        if name in location_coordinates:
+            latitude, longitude, region = location_coordinates[name]
+            yield name, region, latitude, longitude
+
+def build_index():
+    """Build a grid index from the seed towns and imported GazetteerPlace rows"""
+    from .models import GazetteerPlace
+
+    index = GridIndex(get_hazard_setting('GAZETTEER_CELL_DEGREES', 0.25))
+    for name, region, latitude, longitude in seed_places():
+        index.add(name, region, latitude, longitude)
+    for name, region, latitude, longitude in GazetteerPlace.objects.values_list(
+        'name', 'region', 'latitude', 'longitude'
+    ).iterator(chunk_size=5000):
+        index.add(name, region, latitude, longitude)
+    return index
+
+def get_index():
+    """Return the process-wide index, rebuilding it once it goes stale"""
+    global _index, _index_loaded_at
+    max_age = get_hazard_setting('GAZETTEER_RELOAD_SECONDS', 600)
+    if _index is None or time.monotonic() - _index_loaded_at > max_age:
+        with _index_lock:
+            if _index is None or time.monotonic() - _index_loaded_at > max_age:
+                _index = build_index()
+                _index_loaded_at = time.monotonic()
+    return _index
+
+def invalidate_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+# ============================================================================
+# LOOKUPS AND IMPORTS
+# ============================================================================
+
+def format_place(name, region, distance_km):
+    place = f"{name}, {region}" if region else name
+    if distance_km < 2:
+        return place
+    return f"{distance_km:.0f} km from {place}"
+
+def lookup_location_name(latitude, longitude, max_km=None):
+    """Resolve coordinates to a nearby gazetteer place name, or None"""
+    max_km = max_km or get_hazard_setting('GAZETTEER_MAX_DISTANCE_KM', 25)
+    match = get_index().nearest(float(latitude), float(longitude), max_km)
+    if match is None:
+        return None
+    return format_place(*match)[:255]
+
+def lookup_region(latitude, longitude, max_km=None):
+    """Region (state) of the nearest gazetteer place, or '' when none is close enough"""
+    max_km = max_km or get_hazard_setting('REGION_MAX_DISTANCE_KM', 150)
+    match = get_index().nearest(float(latitude), float(longitude), max_km)
+    return (match[1] or '')[:100] if match else ''
+
+def _upsert_places(places):
+    from .models import GazetteerPlace
+
+    GazetteerPlace.objects.bulk_create(
+        places, update_conflicts=True,
+        unique_fields=['name', 'latitude', 'longitude'], update_fields=['region', 'population', 'source'],
+    )
+
+def import_places(rows, source='', batch_size=1000):
+    """Bulk import (name, region, latitude, longitude, population) tuples.
+
+    Places already present with the same name and coordinates get the new
+    region and population, so re-running an import is safe. Returns the
+    number of rows submitted.
+    """
+    from .models import GazetteerPlace
+
+    batch = []
+    total = 0
+    for name, region, latitude, longitude, population in rows:
+        batch.append(GazetteerPlace(
+            name=name[:200],
+            region=(region or '')[:100],
+            latitude=float(latitude),
+            longitude=float(longitude),
+            population=population,
+            source=source,
+        ))
+        if len(batch) >= batch_size:
+            _upsert_places(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        _upsert_places(batch)
+        total += len(batch)
+
+    invalidate_index()
+    return total
@@ -0,0 +1,150 @@
+# ============================================================================
+# login/geocode_cache.py - Two-level cache of resolved location names
+# ============================================================================
+
+import math
+import threading
+import time
+from collections import Counter as Tally, OrderedDict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .counters import apply_deltas, read_counters
+from .utils import get_hazard_setting
+
+# Only refresh last_used_at in the database once per interval to keep hits cheap
+LAST_USED_WRITE_INTERVAL = timedelta(hours=1)
+
+# Lookup outcomes, summed over every process in Counter rows
+STAT_NAMES = ('hits', 'db_hits', 'misses', 'evictions')
+
+
+class GeocodeCache:
+    """Location names keyed on grid-quantized coordinates.
+
+    Lookups go to an in-process LRU first and fall back to GeocodeCacheEntry
+    rows, so every worker shares names resolved by any other worker. Entries
+    older than the TTL are ignored and pruned; the memory tier evicts its
+    least recently used entry once full.
+
+    Hits and misses are tallied in memory and added to the shared
+    geocode_cache:* counters at most every GEOCODE_CACHE_STATS_FLUSH_SECONDS,
+    so a memory hit stays free of database writes.
+    """
+
+    def __init__(self, precision, ttl_seconds, max_memory_entries):
+        self.precision = precision
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending_stats = Tally()
+        self._flushed_at = time.monotonic()
+
+    def cell_key(self, latitude, longitude):
+        row = math.floor(float(latitude) / self.precision)
+        col = math.floor(float(longitude) / self.precision)
+        return f"{self.precision}:{row}:{col}"
+
+    def get(self, latitude, longitude):
+        location_name = self._lookup(latitude, longitude)
+        self.flush_stats(force=False)
+        return location_name
+
+    def _lookup(self, latitude, longitude):
+        from .models import GeocodeCacheEntry
+
+        key = self.cell_key(latitude, longitude)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._count('hits')
+                    return entry[0]
+                del self._entries[key]
+
+        cutoff = timezone.now() - timedelta(seconds=self.ttl_seconds)
+        row = GeocodeCacheEntry.objects.filter(cell_key=key, created_at__gte=cutoff).first()
+        if row is None:
+            with self._lock:
+                self._count('misses')
+            return None
+
+        if timezone.now() - row.last_used_at > LAST_USED_WRITE_INTERVAL:
+            GeocodeCacheEntry.objects.filter(pk=row.pk).update(last_used_at=timezone.now())
+        with self._lock:
+            self._count('db_hits')
+            self._remember(key, row.location_name, row.created_at.timestamp())
+        return row.location_name
+
+    def set(self, latitude, longitude, location_name):
+        from .models import GeocodeCacheEntry
+
+        key = self.cell_key(latitude, longitude)
+        now = timezone.now()
+        GeocodeCacheEntry.objects.update_or_create(
+            cell_key=key,
+            defaults={'location_name': location_name, 'created_at': now, 'last_used_at': now},
+        )
+        with self._lock:
+            self._remember(key, location_name, now.timestamp())
+
+    def _remember(self, key, location_name, stored_at):
+        self._entries[key] = (location_name, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_memory_entries:
+            self._entries.popitem(last=False)
+            self._count('evictions')
+
+    def _count(self, outcome):
+        """Tally one outcome; called with the lock held"""
+        self._pending_stats[outcome] += 1
+
+    def flush_stats(self, force=True):
+        """Add this process's tallies to the shared counters; unless ``force``, only once the interval is up"""
+        with self._lock:
+            interval = get_hazard_setting('GEOCODE_CACHE_STATS_FLUSH_SECONDS', 60)
+            if not force and time.monotonic() - self._flushed_at < interval:
+                return
+            pending, self._pending_stats = self._pending_stats, Tally()
+            self._flushed_at = time.monotonic()
+        apply_deltas({f'geocode_cache:{outcome}': count for outcome, count in pending.items()})
+
+    def stats(self):
+        """Lookup outcomes across all processes (as last flushed) and this process's memory size"""
+        counts = read_counters([f'geocode_cache:{outcome}' for outcome in STAT_NAMES])
+        stats = {outcome: counts[f'geocode_cache:{outcome}'] for outcome in STAT_NAMES}
+        lookups = stats['hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['db_hits']) / lookups, 3) if lookups else 0.0
+        with self._lock:
+            stats['memory_entries'] = len(self._entries)
+        return stats
+
+    def prune(self, max_db_entries):
+        """Drop expired rows, then the least recently used rows beyond max_db_entries"""
+        from .models import GeocodeCacheEntry
+
+        cutoff = timezone.now() - timedelta(seconds=self.ttl_seconds)
+        expired, _ = GeocodeCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+
+        overflow = 0
+        stale_ids = list(
+            GeocodeCacheEntry.objects.order_by('-last_used_at').values_list('pk', flat=True)[max_db_entries:]
+        )
+        if stale_ids:
+            overflow, _ = GeocodeCacheEntry.objects.filter(pk__in=stale_ids).delete()
+        return expired, overflow
+
+    def clear_memory(self):
+        with self._lock:
+            self._entries.clear()
+
+
+geocode_cache = GeocodeCache(
+    precision=get_hazard_setting('GEOCODE_CACHE_PRECISION_DEGREES', 0.003),
+    ttl_seconds=get_hazard_setting('GEOCODE_CACHE_TTL_SECONDS', 30 * 24 * 3600),
+    max_memory_entries=get_hazard_setting('GEOCODE_CACHE_MAX_MEMORY_ENTRIES', 10000),
+)
@@ -0,0 +1,179 @@
+# ============================================================================
+# login/geocoding.py - Reverse geocoding for hazard report locations
+# ============================================================================
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import requests
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from visualizer.tiles import invalidate_on_commit
+
+from .changelog import record_changes
+from .gazetteer import lookup_location_name
+from .geocode_cache import geocode_cache
+from .search import index_objects
+from .utils import get_hazard_setting
+from .versions import bump_versions
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+NOMINATIM_USER_AGENT = 'OceanHazardSystem/1.0'
+
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
+
+class RateLimiter:
+    """Spaces calls at least ``min_interval`` seconds apart across threads"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_call = 0.0
+
+    def wait(self):
+        with self._lock:
+            delay = self._last_call + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._last_call = time.monotonic()
+
+
+# Nominatim's usage policy allows at most one request per second
+nominatim_limiter = RateLimiter(get_hazard_setting('NOMINATIM_MIN_INTERVAL_SECONDS', 1.0))
+
+# ============================================================================
+# LOOKUPS
+# ============================================================================
+
+def coordinate_label(latitude, longitude):
+    return f"Lat: {float(latitude):.4f}, Lng: {float(longitude):.4f}"
+
+def provisional_location_name(latitude, longitude):
+    """Name stored until Nominatim resolves the place: the nearest gazetteer
+    town when there is one, otherwise a coordinate label"""
+    return lookup_location_name(latitude, longitude) or coordinate_label(latitude, longitude)
+
+def reverse_geocode(latitude, longitude, timeout=5):
+    """Look up a place name on Nominatim, returning None when the lookup fails"""
+    params = {
+        'lat': latitude,
+        'lon': longitude,
+        'format': 'json',
+        'addressdetails': 1
+    }
+    headers = {
+        'User-Agent': NOMINATIM_USER_AGENT
+    }
+
+    nominatim_limiter.wait()
+    try:
+        response = requests.get(NOMINATIM_REVERSE_URL, params=params, headers=headers, timeout=timeout)
+        if response.status_code != 200:
+            logger.warning(f"Nominatim returned {response.status_code} for {latitude}, {longitude}")
+            return None
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        logger.warning(f"Geocoding error for {latitude}, {longitude}: {e}")
+        return None
+
+    display_name = data.get('display_name')
+    return display_name[:255] if display_name else None
+
+def cached_reverse_geocode(latitude, longitude):
+    """Nominatim lookup that reuses names already resolved for the same grid cell"""
+    location_name = geocode_cache.get(latitude, longitude)
+    if location_name is None:
+        location_name = reverse_geocode(latitude, longitude)
+        if location_name:
+            geocode_cache.set(latitude, longitude, location_name)
+    return location_name
+
+# ============================================================================
+# BACKGROUND GEOCODING PIPELINE
+# ============================================================================
+
+def _retry_delay(attempts):
+    """Exponential backoff between attempts, capped at six hours"""
+    base = get_hazard_setting('GEOCODE_RETRY_BACKOFF_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 6 * 3600))
+
+def _claim_pending_reports(batch_size):
+    """Lease a batch of due reports so concurrent workers skip them; a crashed worker's lease simply expires"""
+    from .models import HazardReport
+
+    now = timezone.now()
+    lease = timedelta(seconds=get_hazard_setting('GEOCODE_LEASE_SECONDS', 600))
+    with transaction.atomic():
+        due = list(
+            HazardReport.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(geocode_status='pending', geocode_retry_at__isnull=True)
+                | Q(geocode_status__in=['pending', 'geocoding'], geocode_retry_at__lte=now)
+            )
+            .order_by('created_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        HazardReport.objects.filter(pk__in=due).update(geocode_status='geocoding', geocode_retry_at=now + lease)
+    return list(HazardReport.objects.filter(pk__in=due).order_by('created_at'))
+
+def geocode_pending_reports(batch_size=None, max_attempts=None):
+    """Resolve location names for one batch of reports saved with a provisional name.
+
+    The batch is claimed before any lookup, so several workers can run side
+    by side. Reports in the batch that fall in the same geocode cache cell
+    are resolved with a single lookup, and cells resolved earlier skip
+    Nominatim entirely. Failed lookups are retried with exponential backoff
+    until ``max_attempts`` is reached, after which the provisional name is kept.
+    """
+    from .models import HazardReport
+
+    batch_size = batch_size or get_hazard_setting('GEOCODE_BATCH_SIZE', 50)
+    max_attempts = max_attempts or get_hazard_setting('GEOCODE_MAX_ATTEMPTS', 5)
+
+    reports = _claim_pending_reports(batch_size)
+
+    groups = defaultdict(list)
+    for report in reports:
+        groups[geocode_cache.cell_key(report.latitude, report.longitude)].append(report)
+
+    stats = {'processed': len(reports), 'lookups': len(groups), 'resolved': 0, 'retrying': 0, 'failed': 0}
+    for group in groups.values():
+        location_name = cached_reverse_geocode(group[0].latitude, group[0].longitude)
+        for report in group:
+            if location_name:
+                report.location_name = location_name
+                report.geocode_status = 'resolved'
+                report.geocode_retry_at = None
+                stats['resolved'] += 1
+            else:
+                report.geocode_attempts += 1
+                if report.geocode_attempts >= max_attempts:
+                    report.geocode_status = 'failed'
+                    report.geocode_retry_at = None
+                    stats['failed'] += 1
+                else:
+                    report.geocode_status = 'pending'
+                    report.geocode_retry_at = timezone.now() + _retry_delay(report.geocode_attempts)
+                    stats['retrying'] += 1
+            report.updated_at = timezone.now()
+
+    if reports:
+        HazardReport.objects.bulk_update(
+            reports,
+            ['location_name', 'geocode_status', 'geocode_attempts', 'geocode_retry_at', 'updated_at']
+        )
+        # bulk_update() skips post_save, so refresh the search index, tiles and table version here
+        index_objects(reports)
+        invalidate_on_commit('reports', [(report.latitude, report.longitude) for report in reports])
+        bump_versions(HazardReport)
+        record_changes('update', reports)
+    return stats
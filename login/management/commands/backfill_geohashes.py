@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from login.changelog import record_updates
+from login.models import HazardReport
+from login.spatial import encode_geohash
+from login.versions import bump_versions
+
+
+class Command(BaseCommand):
+    help = "Fill the geohash column for hazard reports saved before it existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Reports to update per query")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        while True:
+            batch = list(HazardReport.objects.filter(geohash='').only('pk', 'latitude', 'longitude')[:batch_size])
+            if not batch:
+                break
+            for report in batch:
+                report.geohash = encode_geohash(report.latitude, report.longitude)
+            # bulk_update leaves updated_at alone, so delta sync clients are not disturbed
+            HazardReport.objects.bulk_update(batch, ['geohash'])
+            record_updates(HazardReport, [report.pk for report in batch])
+            updated += len(batch)
+        if updated:
+            # Bounding box filters read the geohash, so cached map responses are stale
+            bump_versions(HazardReport)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {updated} report(s)"))
@@ -0,0 +1,48 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from login.changelog import record_updates
+from login.gazetteer import lookup_region
+from login.models import HazardReport
+from login.rollups import backfill_rollups, prune_hourly_rollups, reports_created_between
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly / daily hazard report rollups from the reports table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="First local date to rebuild (YYYY-MM-DD); default is all history")
+        parser.add_argument('--until', help="Local date to stop before (YYYY-MM-DD)")
+        parser.add_argument('--skip-regions', action='store_true', help="Do not fill blank regions of the rebuilt reports first")
+        parser.add_argument('--prune', action='store_true', help="Also drop hourly rows past their retention")
+
+    def _date(self, value):
+        try:
+            return date.fromisoformat(value) if value else None
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}")
+
+    def handle(self, *args, **options):
+        since, until = self._date(options['since']), self._date(options['until'])
+
+        # One transaction: no report is seen with a filled region while its
+        # rollup rows are still keyed by the blank one
+        with transaction.atomic():
+            if not options['skip_regions']:
+                filled = []
+                # Only reports whose rollups are rebuilt below may change region
+                blank = reports_created_between(since, until).filter(region='').only('pk', 'latitude', 'longitude')
+                for report in blank.iterator(chunk_size=1000):
+                    report.region = lookup_region(report.latitude, report.longitude)
+                    if report.region:
+                        filled.append(report)
+                # bulk_update leaves updated_at alone, so delta sync clients are not disturbed
+                HazardReport.objects.bulk_update(filled, ['region'], batch_size=1000)
+                record_updates(HazardReport, [report.pk for report in filled])
+                self.stdout.write(f"Filled the region of {len(filled)} report(s)")
+
+            written = backfill_rollups(since, until)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup row(s)"))
+
+        if options['prune']:
+            self.stdout.write(f"Pruned {prune_hourly_rollups()} hourly row(s)")
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from login.notifications import dispatch_notifications
+
+
+class Command(BaseCommand):
+    help = "Fan out urgent report events to alert subscribers and send the emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="Events and deliveries to claim per pass")
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when there is nothing to send")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = dispatch_notifications(batch_size=options['batch_size'])
+            busy = stats['events'] or stats['sent'] or stats['retrying'] or stats['failed']
+            if busy:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Fanned out {stats['events']} event(s); sent {stats['sent']}, "
+                    f"retrying {stats['retrying']}, failed {stats['failed']}"
+                ))
+
+            if not options['loop']:
+                break
+            if not busy:
+                time.sleep(options['interval'])
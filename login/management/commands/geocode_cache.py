@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from login.geocode_cache import geocode_cache
+from login.utils import get_hazard_setting
+
+
+class Command(BaseCommand):
+    help = "Prune expired and least recently used geocode cache entries and report the hit rate"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-entries', type=int, default=None, help="Rows to keep after pruning")
+
+    def handle(self, *args, **options):
+        max_entries = options['max_entries'] or get_hazard_setting('GEOCODE_CACHE_MAX_DB_ENTRIES', 200000)
+        expired, overflow = geocode_cache.prune(max_entries)
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {expired} expired and {overflow} least recently used cache entries"
+        ))
+        stats = geocode_cache.stats()
+        self.stdout.write(
+            f"Lookups: {stats['hits']} memory hits, {stats['db_hits']} database hits, "
+            f"{stats['misses']} misses (hit rate {stats['hit_rate']:.1%}); {stats['evictions']} evictions"
+        )
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from login.geocoding import geocode_pending_reports
+
+
+class Command(BaseCommand):
+    help = "Resolve provisional location names on submitted hazard reports"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="Reports to claim per batch")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for newly submitted reports")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = geocode_pending_reports(batch_size=options['batch_size'])
+            if stats['processed']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Geocoded {stats['processed']} report(s) with {stats['lookups']} lookup(s): "
+                    f"{stats['resolved']} resolved, {stats['retrying']} retrying, {stats['failed']} failed"
+                ))
+
+            if not options['loop']:
+                break
+            if not stats['processed']:
+                time.sleep(options['interval'])
@@ -0,0 +1,69 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from login.gazetteer import import_places
+
+
+class Command(BaseCommand):
+    help = "Bulk import places into the offline reverse-geocoding gazetteer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV with name,latitude,longitude[,region,population] columns or a GeoNames dump")
+        parser.add_argument('--format', choices=['csv', 'geonames'], default='csv')
+        parser.add_argument('--source', default='', help="Label stored with each imported place")
+        parser.add_argument('--min-population', type=int, default=0, help="GeoNames only: skip smaller places")
+        parser.add_argument(
+            '--admin1-codes', default=None,
+            help="GeoNames only: admin1CodesASCII.txt, to store state names as regions (left blank without it)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as handle:
+                if options['format'] == 'geonames':
+                    admin1_names = self.read_admin1_codes(options['admin1_codes']) if options['admin1_codes'] else {}
+                    rows = self.read_geonames(handle, options['min_population'], admin1_names)
+                else:
+                    rows = self.read_csv(handle)
+                total = import_places(rows, source=options['source'] or options['format'])
+        except OSError as e:
+            raise CommandError(f"Could not read {e.filename or options['path']}: {e.strerror or e}")
+        except (KeyError, ValueError) as e:
+            raise CommandError(f"Malformed gazetteer row: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} place(s); places already in the gazetteer were updated"))
+
+    @staticmethod
+    def read_csv(handle):
+        for row in csv.DictReader(handle):
+            population = row.get('population')
+            yield (
+                row['name'],
+                row.get('region', ''),
+                row['latitude'],
+                row['longitude'],
+                int(population) if population else None,
+            )
+
+    @staticmethod
+    def read_admin1_codes(path):
+        """Map GeoNames "<country>.<admin1>" codes such as IN.13 to state names"""
+        with open(path, newline='', encoding='utf-8') as handle:
+            return {
+                fields[0]: fields[1]
+                for fields in (line.rstrip('\n').split('\t') for line in handle)
+                if len(fields) >= 2
+            }
+
+    @staticmethod
+    def read_geonames(handle, min_population, admin1_names):
+        """Parse the tab-separated GeoNames format, keeping populated places"""
+        for line in handle:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 15 or fields[6] != 'P':
+                continue
+            population = int(fields[14] or 0)
+            if population < min_population:
+                continue
+            # Column 10 is the numeric admin1 code; only its name is useful as a region
+            region = admin1_names.get(f"{fields[8]}.{fields[10]}", '')
+            yield fields[1], region, fields[4], fields[5], population or None
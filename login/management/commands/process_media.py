@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from login.media_processing import process_pending_media
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnails, previews, poster frames and web video for uploaded hazard media"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help="Media files to claim per batch")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for newly uploaded media")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **options):
+        warned = False
+        while True:
+            stats = process_pending_media(batch_size=options['batch_size'])
+            if stats['skipped_types'] and not warned:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipping {', '.join(stats['skipped_types'])} media: install Pillow / ffmpeg to process them"
+                ))
+                warned = True
+            if stats['processed']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Processed {stats['processed']} media file(s): "
+                    f"{stats['done']} done, {stats['retrying']} retrying, {stats['failed']} failed"
+                ))
+
+            if not options['loop']:
+                break
+            if not stats['processed']:
+                time.sleep(options['interval'])
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from login.changelog import prune_changelog
+
+
+class Command(BaseCommand):
+    help = "Delete changelog entries older than CHANGELOG_RETENTION_DAYS"
+
+    def handle(self, *args, **options):
+        removed = prune_changelog()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} changelog entries"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from login.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS"
+
+    def handle(self, *args, **options):
+        removed = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} tombstone(s)"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from login.uploads import prune_stale_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete resumable media uploads that were abandoned before completion"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-hours', type=int, default=None)
+
+    def handle(self, *args, **options):
+        removed = prune_stale_uploads(options['max_age_hours'])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} abandoned upload(s)"))
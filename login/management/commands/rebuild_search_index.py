@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from analyst.models import Report
+from login.models import HazardReport
+from login.search import backend_supported, create_search_tables, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for hazard and analyst reports"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="Rows to index per batch")
+
+    def handle(self, *args, **options):
+        if not backend_supported():
+            self.stdout.write(self.style.WARNING("This database has no full-text index; searches use icontains"))
+            return
+        create_search_tables()
+        for model in (HazardReport, Report):
+            indexed = rebuild_index(model, chunk_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} {model._meta.verbose_name_plural}"))
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from login.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard counters from the source tables and fix any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep reconciling every --interval seconds")
+        parser.add_argument('--interval', type=float, default=3600.0, help="Seconds between passes with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            fixes = reconcile_counters()
+            for name, (stored, actual) in sorted(fixes.items()):
+                self.stdout.write(f"{name}: {stored} -> {actual}")
+            self.stdout.write(self.style.SUCCESS(f"Reconciled counters; {len(fixes)} corrected"))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,246 @@
+# ============================================================================
+# login/media_processing.py - Thumbnails, previews and web video for HazardMedia
+# ============================================================================
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .storage import content_hash_from_name, media_storage
+from .utils import get_hazard_setting
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; images stay pending until it is installed
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+JPEG_QUALITY = 80
+
+
+class MediaProcessingError(Exception):
+    """Raised when a rendition cannot be produced from the original file"""
+
+
+def ffmpeg_binary():
+    return shutil.which(get_hazard_setting('FFMPEG_BINARY', 'ffmpeg'))
+
+# ============================================================================
+# IMAGE RENDITIONS
+# ============================================================================
+
+def _jpeg(image, max_side):
+    copy = image.copy()
+    copy.thumbnail((max_side, max_side), Image.LANCZOS)
+    if copy.mode not in ('RGB', 'L'):
+        copy = copy.convert('RGB')
+    buffer = BytesIO()
+    copy.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return ContentFile(buffer.getvalue())
+
+def image_renditions(handle):
+    """Return (thumbnail, preview) JPEG files for an open image file"""
+    thumbnail_side = get_hazard_setting('MEDIA_THUMBNAIL_SIZE', 320)
+    preview_side = get_hazard_setting('MEDIA_PREVIEW_SIZE', 1280)
+    try:
+        with Image.open(handle) as image:
+            # Lets the JPEG decoder downscale while decoding instead of
+            # materialising the full-resolution bitmap first
+            image.draft('RGB', (preview_side, preview_side))
+            image = ImageOps.exif_transpose(image)
+            return _jpeg(image, thumbnail_side), _jpeg(image, preview_side)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise MediaProcessingError(f"Unreadable image: {e}")
+
+# ============================================================================
+# VIDEO RENDITIONS
+# ============================================================================
+
+def _run_ffmpeg(arguments):
+    command = [ffmpeg_binary(), '-v', 'error', '-y'] + arguments
+    try:
+        subprocess.run(
+            command, check=True, capture_output=True,
+            timeout=get_hazard_setting('MEDIA_FFMPEG_TIMEOUT_SECONDS', 600),
+        )
+    except subprocess.CalledProcessError as e:
+        raise MediaProcessingError(e.stderr.decode(errors='replace').strip()[-500:])
+    except subprocess.TimeoutExpired:
+        raise MediaProcessingError("ffmpeg timed out")
+
+def extract_poster(source_path, work_dir):
+    """Grab a frame one second in (or the first frame of very short clips)"""
+    poster_path = os.path.join(work_dir, 'poster.jpg')
+    for seek in ('1', '0'):
+        try:
+            _run_ffmpeg(['-ss', seek, '-i', source_path, '-frames:v', '1', '-q:v', '3', poster_path])
+        except MediaProcessingError:
+            continue
+        if os.path.exists(poster_path) and os.path.getsize(poster_path):
+            return poster_path
+    raise MediaProcessingError("Could not extract a poster frame")
+
+def transcode_web_video(source_path, work_dir):
+    """Re-encode to H.264/AAC no taller than MEDIA_WEB_VIDEO_HEIGHT, streamable from the first byte"""
+    height = get_hazard_setting('MEDIA_WEB_VIDEO_HEIGHT', 720)
+    output_path = os.path.join(work_dir, 'web.mp4')
+    _run_ffmpeg([
+        '-i', source_path,
+        '-vf', f"scale=-2:'min({height},ih)'",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '28',
+        '-c:a', 'aac', '-b:a', '96k',
+        '-movflags', '+faststart',
+        output_path,
+    ])
+    return output_path
+
+# ============================================================================
+# PROCESSING QUEUE
+# ============================================================================
+
+def _reuse_sibling_renditions(media):
+    """Share renditions already generated for another upload of the same content"""
+    from .models import HazardMedia
+
+    if not media.content_hash:
+        return {}
+    sibling = (
+        HazardMedia.objects.filter(content_hash=media.content_hash, processing_status='done')
+        .exclude(pk=media.pk).first()
+    )
+    if sibling is None:
+        return {}
+
+    names = {}
+    for field in HazardMedia.RENDITION_FIELDS:
+        sibling_name = getattr(sibling, field).name
+        if not sibling_name:
+            continue
+        name = media_storage.reference_existing(content_hash_from_name(sibling_name))
+        if name is None:
+            # The sibling's files went missing; release what we took and regenerate
+            for taken in names.values():
+                media_storage.delete(taken)
+            return {}
+        names[field] = name
+    return names
+
+def _generate_renditions(media):
+    stem = os.path.splitext(os.path.basename(media.file.name))[0][:40]
+    names = {}
+
+    def store(field, name, content):
+        field_file = getattr(media, field)
+        field_file.save(name, content, save=False)
+        names[field] = field_file.name
+
+    if media.media_type == 'image':
+        with media.file.open('rb') as handle:
+            thumbnail, preview = image_renditions(handle)
+        store('thumbnail', f"{stem}_thumb.jpg", thumbnail)
+        store('preview', f"{stem}_preview.jpg", preview)
+        return names
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        poster_path = extract_poster(media.file.path, work_dir)
+        with open(poster_path, 'rb') as handle:
+            store('poster', f"{stem}_poster.jpg", ContentFile(handle.read()))
+            if Image is not None:
+                handle.seek(0)
+                thumbnail, _ = image_renditions(handle)
+                store('thumbnail', f"{stem}_thumb.jpg", thumbnail)
+        web_path = transcode_web_video(media.file.path, work_dir)
+        with open(web_path, 'rb') as handle:
+            store('web_video', f"{stem}_web.mp4", ContentFile(handle.read()))
+    return names
+
+def process_media(media):
+    """Produce (or reuse) every rendition for one claimed HazardMedia row"""
+    from .models import HazardMedia
+
+    names = _reuse_sibling_renditions(media)
+    if not names:
+        try:
+            names = _generate_renditions(media)
+        except Exception:
+            # Release anything stored before the failure so no blob leaks
+            for field in HazardMedia.RENDITION_FIELDS:
+                field_file = getattr(media, field)
+                if field_file.name:
+                    media_storage.delete(field_file.name)
+                    setattr(media, field, '')
+            raise
+
+    # update() rather than save() so the original file is not reopened
+    HazardMedia.objects.filter(pk=media.pk).update(processing_status='done', processing_claimed_at=None, **names)
+    return names
+
+def _claim_next_media(pending):
+    """Lease the oldest due row of ``pending``; a crashed worker's lease simply expires.
+
+    One row at a time, so a batch of slow videos never outlives its leases.
+    """
+    from .models import HazardMedia
+
+    now = timezone.now()
+    lease = timedelta(seconds=get_hazard_setting('MEDIA_PROCESSING_LEASE_SECONDS', 3600))
+    with transaction.atomic():
+        due = list(
+            pending.select_for_update(skip_locked=True)
+            .filter(Q(processing_status='pending') | Q(processing_status='processing', processing_claimed_at__lte=now - lease))
+            .order_by('uploaded_at')
+            .values_list('pk', flat=True)[:1]
+        )
+        if not due:
+            return None
+        HazardMedia.objects.filter(pk__in=due).update(
+            processing_status='processing', processing_claimed_at=now, processing_attempts=F('processing_attempts') + 1,
+        )
+    return HazardMedia.objects.select_related('report').get(pk=due[0])
+
+def process_pending_media(batch_size=None, max_attempts=None):
+    """Claim a batch of unprocessed media and write their renditions"""
+    from .models import HazardMedia
+
+    batch_size = batch_size or get_hazard_setting('MEDIA_PROCESSING_BATCH_SIZE', 20)
+    max_attempts = max_attempts or get_hazard_setting('MEDIA_PROCESSING_MAX_ATTEMPTS', 3)
+    stats = {'processed': 0, 'done': 0, 'retrying': 0, 'failed': 0, 'skipped_types': []}
+
+    pending = HazardMedia.objects.all()
+    if Image is None:
+        pending = pending.exclude(media_type='image')
+        stats['skipped_types'].append('image')
+    if ffmpeg_binary() is None:
+        # Videos wait for ffmpeg rather than being marked done without renditions
+        pending = pending.exclude(media_type='video')
+        stats['skipped_types'].append('video')
+
+    handled = []
+    while len(handled) < batch_size:
+        # A failure goes back to pending; it waits for the next run, not this one
+        media = _claim_next_media(pending.exclude(pk__in=handled))
+        if media is None:
+            break
+        handled.append(media.pk)
+        stats['processed'] += 1
+
+        try:
+            process_media(media)
+            stats['done'] += 1
+        except Exception as e:
+            logger.warning("Rendition failed for media %s: %s", media.pk, e)
+            status = 'failed' if media.processing_attempts >= max_attempts else 'pending'
+            HazardMedia.objects.filter(pk=media.pk).update(processing_status=status, processing_claimed_at=None)
+            stats['failed' if status == 'failed' else 'retrying'] += 1
+
+    return stats
@@ -1,7 +1,16 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 import os
+import uuid
+
+from .gazetteer import lookup_region
+from .report_ids import report_id_allocator
+from .spatial import encode_geohash
+from .storage import media_storage, content_hash_from_name
+
+REPORT_ID_MAX_ATTEMPTS = 3
 
 
 class UserProfile(models.Model):
@@ -51,15 +60,30 @@ class HazardReport(models.Model):
         ('rejected', 'Rejected'),
         ('investigating', 'Under Investigation'),
     ]
-    
+
+    GEOCODE_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('geocoding', 'Geocoding'),
+        ('resolved', 'Resolved'),
+        ('failed', 'Failed'),
+    ]
+
     reporter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='hazard_reports')
-    report_id = models.CharField(max_length=20, unique=True, blank=True)
+    report_id = models.CharField(max_length=32, unique=True, blank=True)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
     hazard_type = models.CharField(max_length=20, choices=HAZARD_TYPES)
     severity = models.CharField(max_length=10, choices=SEVERITY_LEVELS)
     description = models.TextField()
     latitude = models.DecimalField(max_digits=15, decimal_places=10)
     longitude = models.DecimalField(max_digits=15, decimal_places=10)
     location_name = models.CharField(max_length=255, blank=True, null=True)
+    # Maintained on save; bbox / near queries range-scan it (login/spatial.py)
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True)
+    # State of the nearest gazetteer place, for trend rollups (login/rollups.py)
+    region = models.CharField(max_length=100, blank=True, default='')
+    geocode_status = models.CharField(max_length=10, choices=GEOCODE_STATUS_CHOICES, default='resolved')
+    geocode_attempts = models.PositiveSmallIntegerField(default=0)
+    geocode_retry_at = models.DateTimeField(null=True, blank=True)
     contact_number = models.CharField(max_length=15, blank=True, null=True)
     urgent = models.BooleanField(default=False)
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending')
@@ -76,14 +100,33 @@ class HazardReport(models.Model):
     verified_at = models.DateTimeField(null=True, blank=True)
     
     def save(self, *args, **kwargs):
-        if not self.report_id:
-            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-            self.report_id = f"HR{timestamp}"
-        
         if self.status == 'verified' and not self.verified_at:
             self.verified_at = timezone.now()
-            
-        super().save(*args, **kwargs)
+        
+        if self.latitude is not None and self.longitude is not None:
+            geohash = encode_geohash(self.latitude, self.longitude)
+            if geohash != self.geohash or not self.region:
+                self.region = lookup_region(self.latitude, self.longitude)
+            self.geohash = geohash
+        
+        if self.report_id:
+            super().save(*args, **kwargs)
+            return
+        
+        # Allocated IDs are unique per process; the retry only covers two
+        # processes that happened to pick the same random node
+        for attempt in range(REPORT_ID_MAX_ATTEMPTS):
+            self.report_id = report_id_allocator.allocate()
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                clashed = HazardReport.objects.filter(report_id=self.report_id).exists()
+                if not clashed or attempt == REPORT_ID_MAX_ATTEMPTS - 1:
+                    self.report_id = ''
+                    raise
+                report_id_allocator.rotate_node()
     
     def get_severity_color(self):
         colors = {
@@ -110,20 +153,78 @@ class HazardReport(models.Model):
         ordering = ['-created_at']
         verbose_name = "Hazard Report"
         verbose_name_plural = "Hazard Reports"
+        indexes = [
+            models.Index(fields=['geocode_status', 'geocode_retry_at']),
+            # Delta sync (login/sync.py) walks reports in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id']),
+            models.Index(fields=['reporter', 'updated_at', 'id']),
+            # Keyset pagination (login/pagination.py) seeks on (created_at, id)
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['reporter', 'created_at', 'id']),
+        ]
+        constraints = [
+            # Lets offline clients retry a bulk upload without creating duplicates
+            models.UniqueConstraint(fields=['reporter', 'idempotency_key'], name='unique_report_idempotency_key'),
+        ]
+
+
+class HazardReportTombstone(models.Model):
+    """Marks a deleted HazardReport so syncing clients can drop their copy"""
+
+    report_id = models.CharField(max_length=32)
+    # Plain column, not a FK: tombstones are written while a deleted user's
+    # reports cascade, after the deletion has already been collected
+    reporter_id = models.IntegerField(null=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.report_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['-deleted_at']
+        verbose_name = "Hazard Report Tombstone"
+        verbose_name_plural = "Hazard Report Tombstones"
+        indexes = [
+            models.Index(fields=['deleted_at', 'id']),
+            models.Index(fields=['reporter_id', 'deleted_at', 'id']),
+        ]
 
 
 def hazard_media_upload_path(instance, filename):
+    # media_storage files content by SHA-256; only the extension of this name is kept
     return f'hazard_reports/{instance.report.report_id}/{filename}'
 
 
+def hazard_media_rendition_path(instance, filename):
+    return f'hazard_reports/{instance.report.report_id}/renditions/{filename}'
+
+
 class HazardMedia(models.Model):
     MEDIA_TYPES = [
         ('image', 'Image'),
         ('video', 'Video'),
     ]
+
+    PROCESSING_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Derived files written by login/media_processing.py
+    RENDITION_FIELDS = ['thumbnail', 'preview', 'poster', 'web_video']
     
     report = models.ForeignKey(HazardReport, on_delete=models.CASCADE, related_name='media_files')
-    file = models.FileField(upload_to=hazard_media_upload_path)
+    file = models.FileField(upload_to=hazard_media_upload_path, storage=media_storage)
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    thumbnail = models.FileField(upload_to=hazard_media_rendition_path, storage=media_storage, blank=True)
+    preview = models.FileField(upload_to=hazard_media_rendition_path, storage=media_storage, blank=True)
+    poster = models.FileField(upload_to=hazard_media_rendition_path, storage=media_storage, blank=True)
+    web_video = models.FileField(upload_to=hazard_media_rendition_path, storage=media_storage, blank=True)
+    processing_status = models.CharField(max_length=10, choices=PROCESSING_STATUS_CHOICES, default='pending', db_index=True)
+    processing_attempts = models.PositiveSmallIntegerField(default=0)
+    processing_claimed_at = models.DateTimeField(null=True, blank=True)
     media_type = models.CharField(max_length=10, choices=MEDIA_TYPES)
     description = models.CharField(max_length=255, blank=True, null=True)
     file_size = models.BigIntegerField(null=True, blank=True)
@@ -139,6 +240,11 @@ class HazardMedia(models.Model):
             
             if hasattr(self.file.file, 'size'):
                 self.file_size = self.file.file.size
+            
+            # Commit the file first so its content-addressed name is known
+            if not self.file._committed:
+                self.file.save(self.file.name, self.file.file, save=False)
+            self.content_hash = content_hash_from_name(self.file.name)
         
         super().save(*args, **kwargs)
     
@@ -152,6 +258,37 @@ class HazardMedia(models.Model):
                 return f"{size:.1f} {unit}"
             size /= 1024.0
         return f"{size:.1f} TB"
+
+    @property
+    def thumbnail_url(self):
+        """Small image for lists; falls back to the original until processing finishes"""
+        if self.thumbnail:
+            return self.thumbnail.url
+        return self.file.url if self.media_type == 'image' and self.file else ''
+
+    @property
+    def display_url(self):
+        """Screen-sized image (or poster frame for videos) for detail pages"""
+        for rendition in (self.preview, self.poster):
+            if rendition:
+                return rendition.url
+        return self.file.url if self.media_type == 'image' and self.file else ''
+
+    @property
+    def playback_url(self):
+        """Web-sized video when available, otherwise the original upload"""
+        if self.web_video:
+            return self.web_video.url
+        return self.file.url if self.file else ''
+
+    def rendition_urls(self):
+        return {
+            'original': self.file.url if self.file else '',
+            'thumbnail': self.thumbnail_url,
+            'display': self.display_url,
+            'playback': self.playback_url if self.media_type == 'video' else '',
+            'processing_status': self.processing_status,
+        }
     
     def __str__(self):
         return f"{self.report.report_id} - {self.media_type}"
@@ -162,6 +299,211 @@ class HazardMedia(models.Model):
         verbose_name_plural = "Hazard Media Files"
 
 
+class MediaBlob(models.Model):
+    """One stored copy of a media file, shared by every HazardMedia with the same content"""
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} references)"
+
+    class Meta:
+        verbose_name = "Media Blob"
+        verbose_name_plural = "Media Blobs"
+
+
+class MediaUpload(models.Model):
+    """Resumable chunked upload that becomes a HazardMedia once complete"""
+
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    uploader = models.ForeignKey(User, on_delete=models.CASCADE, related_name='media_uploads')
+    report = models.ForeignKey(HazardReport, on_delete=models.CASCADE, related_name='media_uploads')
+    file_name = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    expected_sha256 = models.CharField(max_length=64, blank=True, default='')
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    media = models.OneToOneField(HazardMedia, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.received_bytes}/{self.total_size})"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Media Upload"
+        verbose_name_plural = "Media Uploads"
+
+
+class AlertSubscription(models.Model):
+    """Someone who wants urgent hazard alerts, optionally filtered by type and severity"""
+
+    SEVERITY_CHOICES = HazardReport.SEVERITY_LEVELS
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='alert_subscriptions')
+    email = models.EmailField()
+    hazard_types = models.CharField(
+        max_length=255, blank=True, default='',
+        help_text="Comma-separated hazard types; leave blank for all",
+    )
+    min_severity = models.CharField(max_length=10, choices=SEVERITY_CHOICES, default='low')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.email} ({self.hazard_types or 'all hazards'}, {self.min_severity}+)"
+
+    class Meta:
+        ordering = ['email']
+        verbose_name = "Alert Subscription"
+        verbose_name_plural = "Alert Subscriptions"
+
+
+class NotificationOutbox(models.Model):
+    """Event written in the same transaction as the report; fanned out by dispatch_notifications"""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+    ]
+
+    event_type = models.CharField(max_length=30, default='urgent_report')
+    report = models.ForeignKey(HazardReport, on_delete=models.SET_NULL, null=True, blank=True, related_name='notification_events')
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    fanned_out_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.event_type} {self.payload.get('report_id', '')} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Notification Outbox Event"
+        verbose_name_plural = "Notification Outbox"
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+
+class NotificationDelivery(models.Model):
+    """One event to one subscriber, retried with backoff until sent or out of attempts"""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    event = models.ForeignKey(NotificationOutbox, on_delete=models.CASCADE, related_name='deliveries')
+    subscription = models.ForeignKey(AlertSubscription, on_delete=models.CASCADE, related_name='deliveries')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.CharField(max_length=255, blank=True, default='')
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.event_id} -> {self.subscription.email} ({self.status})"
+
+    class Meta:
+        verbose_name = "Notification Delivery"
+        verbose_name_plural = "Notification Deliveries"
+        unique_together = ['event', 'subscription']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+
+class Counter(models.Model):
+    """Named running total kept up to date by login/counters.py (see reconcile_counters)"""
+
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Counter"
+        verbose_name_plural = "Counters"
+
+
+class HazardReportRollup(models.Model):
+    """Report count per time bucket x hazard type x severity x status x region (login/rollups.py)"""
+
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    ]
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    hazard_type = models.CharField(max_length=20, choices=HazardReport.HAZARD_TYPES)
+    severity = models.CharField(max_length=10, choices=HazardReport.SEVERITY_LEVELS)
+    status = models.CharField(max_length=15, choices=HazardReport.STATUS_CHOICES)
+    region = models.CharField(max_length=100, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} {self.hazard_type}/{self.severity}/{self.status}: {self.count}"
+
+    class Meta:
+        ordering = ['granularity', 'bucket']
+        verbose_name = "Hazard Report Rollup"
+        verbose_name_plural = "Hazard Report Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket', 'hazard_type', 'severity', 'status', 'region'],
+                name='unique_hazard_report_rollup',
+            ),
+        ]
+
+
+
+class ChangeLogEntry(models.Model):
+    """One insert / update / delete of a tracked row; the id is the change sequence (login/changelog.py)"""
+
+    ACTION_CHOICES = [
+        ('insert', 'Insert'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+
+    model = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=64)
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    # Field values after the change; null for deletes
+    data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.model} {self.object_id}"
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Change Log Entry"
+        verbose_name_plural = "Change Log"
+        indexes = [
+            models.Index(fields=['model', 'id']),
+            models.Index(fields=['changed_at']),
+        ]
+
 class HazardHotspot(models.Model):
     name = models.CharField(max_length=100)
     latitude = models.DecimalField(max_digits=10, decimal_places=7)
@@ -180,6 +522,44 @@ class HazardHotspot(models.Model):
         verbose_name_plural = "Hazard Hotspots"
 
 
+class GazetteerPlace(models.Model):
+    """Named place used by the offline reverse geocoder (login/gazetteer.py)"""
+
+    name = models.CharField(max_length=200)
+    region = models.CharField(max_length=100, blank=True, default='')
+    country = models.CharField(max_length=100, blank=True, default='India')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    population = models.BigIntegerField(null=True, blank=True)
+    source = models.CharField(max_length=50, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name}, {self.region}" if self.region else self.name
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = "Gazetteer Place"
+        verbose_name_plural = "Gazetteer Places"
+        unique_together = ['name', 'latitude', 'longitude']
+
+
+class GeocodeCacheEntry(models.Model):
+    """Resolved location name for one grid cell (see login/geocode_cache.py)"""
+
+    cell_key = models.CharField(max_length=64, unique=True)
+    location_name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(default=timezone.now)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.cell_key} - {self.location_name}"
+
+    class Meta:
+        verbose_name = "Geocode Cache Entry"
+        verbose_name_plural = "Geocode Cache Entries"
+
+
 class ReportFeedback(models.Model):
     FEEDBACK_TYPES = [
         ('helpful', 'Helpful'),
@@ -0,0 +1,194 @@
+# ============================================================================
+# login/notifications.py - Transactional outbox and alert fan-out
+# ============================================================================
+
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .geocoding import RateLimiter
+from .utils import get_hazard_setting
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_RANK = {'low': 0, 'moderate': 1, 'high': 2, 'critical': 3}
+
+_email_limiter = None
+
+def get_email_limiter():
+    """Keeps us under the mail provider's sending limits across dispatcher passes; 0 means no limit"""
+    global _email_limiter
+    if _email_limiter is None:
+        max_per_second = get_hazard_setting('NOTIFICATION_MAX_PER_SECOND', 5)
+        _email_limiter = RateLimiter(1.0 / max_per_second if max_per_second > 0 else 0)
+    return _email_limiter
+
+# ============================================================================
+# ENQUEUE (runs inside the request transaction)
+# ============================================================================
+
+def urgent_event_payload(report):
+    return {
+        'report_id': report.report_id,
+        'hazard_type': report.hazard_type,
+        'hazard_label': report.get_hazard_type_display(),
+        'severity': report.severity,
+        'location_name': report.location_name or '',
+        'latitude': float(report.latitude),
+        'longitude': float(report.longitude),
+        'description': report.description[:1000],
+        'created_at': report.created_at.isoformat() if report.created_at else timezone.now().isoformat(),
+    }
+
+def enqueue_urgent_events(reports):
+    """Record one outbox event per urgent report; call within the saving transaction"""
+    from .models import NotificationOutbox
+
+    if not get_hazard_setting('ENABLE_URGENT_NOTIFICATIONS', True):
+        return []
+    events = [
+        NotificationOutbox(event_type='urgent_report', report=report, payload=urgent_event_payload(report))
+        for report in reports if report.urgent
+    ]
+    return NotificationOutbox.objects.bulk_create(events) if events else []
+
+# ============================================================================
+# FAN-OUT
+# ============================================================================
+
+def _matches(subscription, payload):
+    hazard_types = [value.strip() for value in subscription['hazard_types'].split(',') if value.strip()]
+    if hazard_types and payload['hazard_type'] not in hazard_types:
+        return False
+    return SEVERITY_RANK.get(payload['severity'], 0) >= SEVERITY_RANK.get(subscription['min_severity'], 0)
+
+def fan_out_events(batch_size=None):
+    """Turn pending outbox events into one delivery row per matching subscriber"""
+    from .models import AlertSubscription, NotificationDelivery, NotificationOutbox
+
+    batch_size = batch_size or get_hazard_setting('NOTIFICATION_BATCH_SIZE', 100)
+    with transaction.atomic():
+        events = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending').order_by('created_at')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        subscriptions = list(
+            AlertSubscription.objects.filter(is_active=True).values('id', 'hazard_types', 'min_severity')
+        )
+        deliveries = [
+            NotificationDelivery(event=event, subscription_id=subscription['id'])
+            for event in events
+            for subscription in subscriptions
+            if _matches(subscription, event.payload)
+        ]
+        NotificationDelivery.objects.bulk_create(deliveries, batch_size=1000, ignore_conflicts=True)
+        NotificationOutbox.objects.filter(pk__in=[event.pk for event in events]).update(
+            status='done', fanned_out_at=timezone.now()
+        )
+    return len(events)
+
+# ============================================================================
+# DELIVERY
+# ============================================================================
+
+def build_message(delivery, connection):
+    payload = delivery.event.payload
+    place = payload['location_name'] or f"{payload['latitude']:.4f}, {payload['longitude']:.4f}"
+    subject = f"{settings.EMAIL_SUBJECT_PREFIX}URGENT: {payload['hazard_label']} reported near {place}"
+    body = (
+        f"An urgent {payload['severity']} severity {payload['hazard_label'].lower()} report was submitted.\n\n"
+        f"Report: {payload['report_id']}\n"
+        f"Location: {place} ({payload['latitude']:.5f}, {payload['longitude']:.5f})\n"
+        f"Reported at: {payload['created_at']}\n\n"
+        f"{payload['description']}\n"
+    )
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [delivery.subscription.email], connection=connection)
+
+def _claim_deliveries(batch_size):
+    """Lease a batch of due deliveries; a crashed worker's lease simply expires"""
+    from .models import NotificationDelivery
+
+    now = timezone.now()
+    lease = timedelta(seconds=get_hazard_setting('NOTIFICATION_LEASE_SECONDS', 600))
+    with transaction.atomic():
+        due = list(
+            NotificationDelivery.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending') | Q(status='sending'), next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        NotificationDelivery.objects.filter(pk__in=due).update(status='sending', next_attempt_at=now + lease)
+    return list(NotificationDelivery.objects.filter(pk__in=due).select_related('event', 'subscription'))
+
+def send_pending_deliveries(batch_size=None, max_attempts=None):
+    """Send due deliveries over one reused SMTP connection, rate limited"""
+    from .models import NotificationDelivery
+
+    batch_size = batch_size or get_hazard_setting('NOTIFICATION_BATCH_SIZE', 100)
+    max_attempts = max_attempts or get_hazard_setting('NOTIFICATION_MAX_ATTEMPTS', 5)
+    backoff = get_hazard_setting('NOTIFICATION_RETRY_BACKOFF_SECONDS', 60)
+    stats = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+    deliveries = _claim_deliveries(batch_size)
+    if not deliveries:
+        return stats
+
+    email_limiter = get_email_limiter()
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for delivery in deliveries:
+            email_limiter.wait()
+            delivery.attempts += 1
+            try:
+                connection.send_messages([build_message(delivery, connection)])
+            except (smtplib.SMTPException, OSError) as e:
+                if isinstance(e, smtplib.SMTPServerDisconnected):
+                    connection.close()
+                    connection.open()
+                delivery.last_error = str(e)[:255]
+                if delivery.attempts >= max_attempts:
+                    delivery.status = 'failed'
+                    stats['failed'] += 1
+                else:
+                    delivery.status = 'pending'
+                    delivery.next_attempt_at = timezone.now() + timedelta(
+                        seconds=backoff * 2 ** (delivery.attempts - 1)
+                    )
+                    stats['retrying'] += 1
+            else:
+                delivery.status = 'sent'
+                delivery.sent_at = timezone.now()
+                delivery.last_error = ''
+                stats['sent'] += 1
+    except (smtplib.SMTPException, OSError) as e:
+        # The server is unreachable: hand the untouched rest back for a later pass
+        logger.warning("SMTP connection failed: %s", e)
+        for delivery in deliveries:
+            if delivery.status == 'sending':
+                delivery.status = 'pending'
+                delivery.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+                stats['retrying'] += 1
+    finally:
+        connection.close()
+        NotificationDelivery.objects.bulk_update(
+            deliveries, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+    return stats
+
+def dispatch_notifications(batch_size=None):
+    """One dispatcher pass: fan out new events, then send due deliveries"""
+    fanned_out = fan_out_events(batch_size)
+    stats = {'events': fanned_out, 'sent': 0, 'retrying': 0, 'failed': 0}
+    if get_hazard_setting('ENABLE_EMAIL_NOTIFICATIONS', True):
+        stats.update(send_pending_deliveries(batch_size))
+    return stats
@@ -0,0 +1,184 @@
+# ============================================================================
+# login/pagination.py - Keyset (cursor) pagination for report listings
+# ============================================================================
+
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .utils import get_hazard_setting
+
+LAST_PAGE = 'last'
+
+
+class InvalidPageCursor(ValueError):
+    pass
+
+
+def _cursor_value(value):
+    # Full microsecond precision; DjangoJSONEncoder would round to milliseconds
+    # and make the seek skip rows in the boundary row's millisecond
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot put {type(value).__name__} in a page cursor")
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, with cursors to its neighbours"""
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1], 'next')
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0], 'prev')
+        return None
+
+
+class KeysetPaginator:
+    """Seeks past the last row seen instead of OFFSET-scanning to it.
+
+    ``ordering`` must end in a unique field so every row has a distinct key;
+    each page is then one index range scan of ``per_page + 1`` rows no matter
+    how deep it is, and rows inserted meanwhile never shift page boundaries.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+
+    # Cursors --------------------------------------------------------------
+
+    def encode_cursor(self, obj, direction):
+        values = [getattr(obj, 'pk' if name == 'id' else name) for name in self.fields]
+        raw = json.dumps([direction, values], default=_cursor_value, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                raise ValueError
+            values = [self._to_python(name, value) for name, value in zip(self.fields, values)]
+        except (ValueError, TypeError, binascii.Error, ValidationError, UnicodeDecodeError):
+            raise InvalidPageCursor("Invalid or expired page cursor")
+        return direction, values
+
+    def _to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # An annotation such as search_rank; JSON already kept its type
+            if name not in self.queryset.query.annotations:
+                raise ValueError(name)
+            return value
+        return field.to_python(value)
+
+    def _seek(self, values, backwards):
+        """Rows strictly after ``values`` in the ordering (before, if backwards)"""
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-') != backwards
+            step = Q(**{f"{self.fields[position]}__{'lt' if descending else 'gt'}": values[position]})
+            for earlier in range(position):
+                step &= Q(**{self.fields[earlier]: values[earlier]})
+            condition |= step
+        return condition
+
+    # Pages ----------------------------------------------------------------
+
+    def page(self, cursor=None):
+        """Page after/before ``cursor``; None is the first page, LAST_PAGE the last"""
+        size = self.per_page
+        if not cursor:
+            rows = list(self.queryset[:size + 1])
+            return KeysetPage(rows[:size], self, False, len(rows) > size)
+
+        reversed_qs = self.queryset.reverse()
+        if cursor == LAST_PAGE:
+            rows = list(reversed_qs[:size + 1])
+            return KeysetPage(rows[:size][::-1], self, len(rows) > size, False)
+
+        direction, values = self.decode_cursor(cursor)
+        if direction == 'next':
+            rows = list(self.queryset.filter(self._seek(values, backwards=False))[:size + 1])
+            return KeysetPage(rows[:size], self, True, len(rows) > size)
+        rows = list(reversed_qs.filter(self._seek(values, backwards=True))[:size + 1])
+        return KeysetPage(rows[:size][::-1], self, len(rows) > size, True)
+
+    def get_page(self, cursor=None):
+        """Like page(), but falls back to the first page on a bad cursor"""
+        try:
+            return self.page(cursor)
+        except InvalidPageCursor:
+            return self.page()
+
+    # Totals ---------------------------------------------------------------
+
+    @cached_property
+    def _total(self):
+        cap = get_hazard_setting('PAGINATION_COUNT_CAP', 1000)
+        counted = self.queryset.order_by().values('pk')[:cap + 1].count()
+        if counted <= cap:
+            return counted, False
+        estimate = self._planner_estimate()
+        return max(estimate or 0, cap), True
+
+    def _planner_estimate(self):
+        """Row estimate from the PostgreSQL planner, without scanning"""
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = self.queryset.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @property
+    def count(self):
+        """Exact up to PAGINATION_COUNT_CAP rows, an estimate beyond it"""
+        return self._total[0]
+
+    @property
+    def count_is_estimate(self):
+        return self._total[1]
@@ -0,0 +1,86 @@
+# ============================================================================
+# login/report_ids.py - Collision-free report ID allocation
+# ============================================================================
+
+import os
+import secrets
+import threading
+import time
+
+from django.utils import timezone
+
+from .utils import get_hazard_setting
+
+BASE36 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+NODE_WIDTH = 3
+COUNTER_WIDTH = 4
+COUNTER_LIMIT = 36 ** COUNTER_WIDTH  # ~1.6M IDs per node per second
+
+
+def to_base36(value, width):
+    digits = []
+    for _ in range(width):
+        value, remainder = divmod(value, 36)
+        digits.append(BASE36[remainder])
+    return ''.join(reversed(digits))
+
+
+class ReportIdAllocator:
+    """Issues IDs like HR20250101120000-K3F0001 without touching the database.
+
+    The second-resolution timestamp keeps IDs readable and sortable, the node
+    part separates processes, and the counter separates IDs issued by one
+    process within the same second. Fixed-width base36 fields keep string
+    order equal to allocation order within a process.
+    """
+
+    def __init__(self, prefix='HR', node=None):
+        self.prefix = prefix
+        self._fixed_node = node
+        self.reset()
+
+    def reset(self):
+        """Pick a fresh node; called again in every forked worker"""
+        # A new lock too: the parent may have forked while another thread held it
+        self._lock = threading.Lock()
+        configured = self._fixed_node or get_hazard_setting('REPORT_ID_NODE', None)
+        if configured:
+            self.node = str(configured).upper()[:NODE_WIDTH].rjust(NODE_WIDTH, '0')
+        else:
+            self.node = self._random_node()
+        self._second = ''
+        self._counter = 0
+
+    @staticmethod
+    def _random_node():
+        return to_base36(secrets.randbelow(36 ** NODE_WIDTH), NODE_WIDTH)
+
+    def rotate_node(self):
+        """Switch to another random node after an ID turned out to be taken"""
+        with self._lock:
+            self.node = self._random_node()
+
+    def allocate(self):
+        with self._lock:
+            while True:
+                second = timezone.now().strftime('%Y%m%d%H%M%S')
+                if second != self._second:
+                    self._second = second
+                    self._counter = 0
+                if self._counter < COUNTER_LIMIT:
+                    break
+                # Counter exhausted for this second; wait for the clock to move on
+                time.sleep(0.001)
+            counter = self._counter
+            self._counter += 1
+            return f"{self.prefix}{second}-{self.node}{to_base36(counter, COUNTER_WIDTH)}"
+
+    def allocate_many(self, count):
+        return [self.allocate() for _ in range(count)]
+
+
+report_id_allocator = ReportIdAllocator()
+
+# Workers forked from a preloaded master would otherwise share one node
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=report_id_allocator.reset)
@@ -0,0 +1,62 @@
+# ============================================================================
+# login/roles.py - Per-request user role resolution
+# ============================================================================
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+_MISSING = object()
+
+
+class ProfileBackend(ModelBackend):
+    """ModelBackend that loads the UserProfile in the same query as the session's user.
+
+    Every authenticated request reads the user row anyway, so the role comes
+    with it for free and is always as current as the database.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('userprofile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def get_user_role(user):
+    """Return the user's UserProfile.user_type, or None without a profile.
+
+    Users loaded by ProfileBackend already carry their profile; others cost
+    one query, after which the role is memoised on the user object for the
+    rest of the request.
+    """
+    from .models import UserProfile
+
+    if user is None or not user.is_authenticated:
+        return None
+    role = getattr(user, '_hazard_role', _MISSING)
+    if role is not _MISSING:
+        return role
+
+    try:
+        role = user.userprofile.user_type
+    except UserProfile.DoesNotExist:
+        role = None
+    user._hazard_role = role
+    return role
+
+
+class UserRoleMiddleware:
+    """Resolves request.user's role once per request (after AuthenticationMiddleware)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            request.user_role = get_user_role(user)
+        else:
+            request.user_role = None
+        return self.get_response(request)
@@ -0,0 +1,189 @@
+# ============================================================================
+# login/rollups.py - Hourly / daily hazard report rollups for trend charts
+# ============================================================================
+
+from collections import Counter as Tally
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .utils import get_hazard_setting
+
+GRANULARITIES = ('hour', 'day')
+DIMENSIONS = ('hazard_type', 'severity', 'status', 'region')
+# Fields a HazardReport's rollup rows depend on (the receivers in login/signals.py track these)
+STATE_FIELDS = DIMENSIONS + ('created_at',)
+
+# ============================================================================
+# BUCKETS
+# ============================================================================
+
+def bucket_start(moment, granularity):
+    """Start of the hour (or local day) containing ``moment``"""
+    local = timezone.localtime(moment)
+    if granularity == 'hour':
+        return local.replace(minute=0, second=0, microsecond=0)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_keys(state):
+    """(granularity, bucket, hazard_type, severity, status, region) rows one report counts in"""
+    *dimensions, created_at = state
+    return [(granularity, bucket_start(created_at, granularity), *dimensions) for granularity in GRANULARITIES]
+
+# ============================================================================
+# INCREMENTAL UPDATES
+# ============================================================================
+
+# Loaded with a tracked field deferred: its changes are left to backfill_rollups
+UNTRACKED = 'untracked'
+
+
+def rollup_state(report):
+    if any(field not in report.__dict__ for field in STATE_FIELDS):
+        return UNTRACKED
+    return tuple(report.__dict__[field] or '' if field == 'region' else report.__dict__[field] for field in STATE_FIELDS)
+
+
+def apply_deltas(deltas):
+    """Add count deltas to rollup rows, creating missing rows; within the caller's transaction"""
+    from .models import HazardReportRollup
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    fields = ('granularity', 'bucket') + DIMENSIONS
+    with transaction.atomic():
+        HazardReportRollup.objects.bulk_create(
+            [HazardReportRollup(**dict(zip(fields, key))) for key in deltas], ignore_conflicts=True
+        )
+        for key, delta in sorted(deltas.items()):
+            HazardReportRollup.objects.filter(**dict(zip(fields, key))).update(count=F('count') + delta)
+
+
+def report_changed(report, old_state, removed=False):
+    """Move a report's counts from the buckets of its loaded state to those of its saved one"""
+    if old_state == UNTRACKED:
+        return UNTRACKED
+    deltas = Tally()
+    if old_state is not None:
+        deltas.subtract(rollup_keys(old_state))
+    new_state = None if removed else rollup_state(report)
+    if new_state is not None:
+        deltas.update(rollup_keys(new_state))
+    apply_deltas(deltas)
+    return new_state
+
+
+def reports_created(reports):
+    """Count reports inserted with bulk_create(), which sends no post_save"""
+    deltas = Tally()
+    for report in reports:
+        deltas.update(rollup_keys(rollup_state(report)))
+    apply_deltas(deltas)
+
+
+def update_rolled_up(queryset, **changes):
+    """counters.update_counted() for HazardReports that also keeps the rollups in step"""
+    from .counters import update_counted
+
+    with transaction.atomic():
+        rows = list(queryset.select_for_update().values_list(*STATE_FIELDS))
+        updated = update_counted(queryset, **changes)
+        deltas = Tally()
+        for row in rows:
+            deltas.subtract(rollup_keys(row))
+            new = dict(zip(STATE_FIELDS, row))
+            new.update({field: value for field, value in changes.items() if field in new})
+            deltas.update(rollup_keys(tuple(new.values())))
+        apply_deltas(deltas)
+    return updated
+
+# ============================================================================
+# BACKFILL
+# ============================================================================
+
+def _day_floor(value):
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def reports_created_between(since=None, until=None):
+    """HazardReports created on local dates [since, until); either end may be open"""
+    from .models import HazardReport
+
+    reports = HazardReport.objects.order_by()
+    if since:
+        reports = reports.filter(created_at__gte=_day_floor(since))
+    if until:
+        reports = reports.filter(created_at__lt=_day_floor(until))
+    return reports
+
+
+def backfill_rollups(since=None, until=None):
+    """Rebuild every rollup row for reports created on local dates [since, until).
+
+    Existing rows in the range are replaced with GROUP BY counts of the raw
+    table. Dates default to the whole history. Returns the rows written.
+    """
+    from .models import HazardReportRollup
+
+    reports = reports_created_between(since, until)
+    rollups = HazardReportRollup.objects.all()
+    if since:
+        rollups = rollups.filter(bucket__gte=_day_floor(since))
+    if until:
+        rollups = rollups.filter(bucket__lt=_day_floor(until))
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        for granularity, trunc in (('hour', TruncHour), ('day', TruncDay)):
+            rows = (
+                reports.annotate(bucket=trunc('created_at'))
+                .values('bucket', *DIMENSIONS)
+                .annotate(n=Count('pk'))
+            )
+            batch = [
+                HazardReportRollup(granularity=granularity, count=row.pop('n'), **row)
+                for row in rows.iterator(chunk_size=2000)
+            ]
+            HazardReportRollup.objects.bulk_create(batch, batch_size=1000)
+            written += len(batch)
+    return written
+
+
+def prune_hourly_rollups():
+    """Drop hourly rows older than ROLLUP_HOURLY_RETENTION_DAYS (daily rows are kept)"""
+    from .models import HazardReportRollup
+
+    cutoff = timezone.now() - timedelta(days=get_hazard_setting('ROLLUP_HOURLY_RETENTION_DAYS', 90))
+    deleted, _ = HazardReportRollup.objects.filter(granularity='hour', bucket__lt=cutoff).delete()
+    return deleted
+
+# ============================================================================
+# QUERY API
+# ============================================================================
+
+def trend_series(granularity, start, end, group_by=(), **filters):
+    """Counts per bucket in [start, end), split by ``group_by`` dimensions.
+
+    ``filters`` narrow any dimension (e.g. hazard_type='tsunami'). Returns a
+    list of dicts with 'bucket', each group_by dimension and 'count', ordered
+    by bucket. Reads only the rollup table.
+    """
+    from .models import HazardReportRollup
+
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    unknown = [name for name in list(group_by) + list(filters) if name not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension: {', '.join(unknown)}")
+
+    rows = HazardReportRollup.objects.filter(
+        granularity=granularity, bucket__gte=start, bucket__lt=end, **filters
+    ).exclude(count=0)
+    series = rows.values('bucket', *group_by).annotate(count=Sum('count')).order_by('bucket', *group_by)
+    return list(series)
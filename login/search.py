@@ -0,0 +1,226 @@
+# ============================================================================
+# login/search.py - Full-text search index (SQLite FTS5 / PostgreSQL tsvector)
+# ============================================================================
+
+import re
+
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.expressions import Col
+from django.db.models.fields import FloatField
+from django.db.models.sql.constants import INNER, LOUTER
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_QUERY_TOKENS = 8
+
+# ============================================================================
+# INDEXED DOCUMENTS
+# ============================================================================
+
+def hazard_report_document(report):
+    return ' '.join(filter(None, [
+        report.report_id, report.get_hazard_type_display(), report.location_name, report.description,
+    ]))
+
+
+def analyst_report_document(report):
+    user = report.created_by
+    return ' '.join(filter(None, [
+        report.title, report.description, user.username, user.first_name, user.last_name,
+    ]))
+
+
+def _registry():
+    from analyst.models import Report
+    from .models import HazardReport
+
+    return {
+        HazardReport: (hazard_report_document, lambda qs: qs),
+        Report: (analyst_report_document, lambda qs: qs.select_related('created_by')),
+    }
+
+
+def index_table(model):
+    return f"{model._meta.db_table}_fts"
+
+
+def backend_supported():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+# ============================================================================
+# SCHEMA (created on post_migrate; Django models cannot declare these)
+# ============================================================================
+
+def create_search_tables(sender=None, **kwargs):
+    """Create missing index tables and fill the new ones from existing rows"""
+    if not backend_supported():
+        return
+    existing = set(connection.introspection.table_names())
+    for model in _registry():
+        table = index_table(model)
+        if table in existing:
+            continue
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                # rowid is the model pk; prefix indexes make "term*" queries cheap
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {table} USING fts5("
+                    f"document, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+                )
+            else:
+                cursor.execute(f"CREATE TABLE {table} (object_id bigint PRIMARY KEY, document tsvector NOT NULL)")
+                cursor.execute(f"CREATE INDEX {table}_document ON {table} USING GIN (document)")
+        rebuild_index(model)
+
+
+def rebuild_index(model, chunk_size=2000):
+    """Re-index every row of ``model``; returns the number of rows indexed"""
+    document, prepare = _registry()[model]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {index_table(model)}")
+    total = 0
+    batch = []
+    for obj in prepare(model.objects.all()).iterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            total += index_objects(batch)
+            batch = []
+    return total + index_objects(batch)
+
+# ============================================================================
+# SYNC (signal receivers in login/signals.py call these on save / delete)
+# ============================================================================
+
+def index_objects(objects):
+    """Insert or replace the index entries of saved model instances"""
+    objects = [obj for obj in objects if obj.pk is not None]
+    if not objects or not backend_supported():
+        return 0
+    model = type(objects[0])
+    document, _ = _registry()[model]
+    table = index_table(model)
+    rows = [(obj.pk, document(obj)) for obj in objects]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.executemany(f"INSERT OR REPLACE INTO {table} (rowid, document) VALUES (%s, %s)", rows)
+        else:
+            cursor.executemany(
+                f"INSERT INTO {table} (object_id, document) VALUES (%s, to_tsvector('simple', %s)) "
+                f"ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+    return len(rows)
+
+
+def remove_objects(model, pks):
+    if not pks or not backend_supported():
+        return
+    column = 'rowid' if connection.vendor == 'sqlite' else 'object_id'
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {index_table(model)} WHERE {column} IN ({placeholders})", list(pks))
+
+# ============================================================================
+# QUERYING
+# ============================================================================
+
+def _match_expression(tokens):
+    """Every token must match, each as a prefix"""
+    if connection.vendor == 'sqlite':
+        return ' '.join(f'"{token}"*' for token in tokens)
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+class _MatchJoin:
+    """INNER JOIN of a derived table of (object_id, search_rank) matches onto the model's table.
+
+    Query.alias_map accepts any object shaped like
+    django.db.models.sql.datastructures.Join; this one joins a subquery, so
+    the full-text match runs once instead of once per outer row.
+    """
+
+    join_type = INNER
+    nullable = False
+    filtered_relation = None
+
+    def __init__(self, table_name, sql, params, pk_column, parent_alias, table_alias=None, join_type=INNER):
+        # Only names the alias; a second search on the same queryset gets a fresh one
+        self.table_name = table_name
+        self.sql = sql
+        self.params = params
+        self.pk_column = pk_column
+        self.parent_alias = parent_alias
+        self.table_alias = table_alias
+        self.join_type = join_type
+
+    def as_sql(self, compiler, connection):
+        qn = connection.ops.quote_name
+        alias = qn(self.table_alias)
+        on = f"{alias}.object_id = {qn(self.parent_alias)}.{qn(self.pk_column)}"
+        return f"{self.join_type} ({self.sql}) {alias} ON ({on})", list(self.params)
+
+    def _replace(self, **changes):
+        values = {
+            'parent_alias': self.parent_alias, 'table_alias': self.table_alias, 'join_type': self.join_type, **changes,
+        }
+        return _MatchJoin(self.table_name, self.sql, self.params, self.pk_column, **values)
+
+    def relabeled_clone(self, change_map):
+        return self._replace(
+            parent_alias=change_map.get(self.parent_alias, self.parent_alias),
+            table_alias=change_map.get(self.table_alias, self.table_alias),
+        )
+
+    def promote(self):
+        return self._replace(join_type=LOUTER)
+
+    def demote(self):
+        return self._replace(join_type=INNER)
+
+    @property
+    def identity(self):
+        return (self.__class__, self.sql, tuple(self.params), self.parent_alias)
+
+    def equals(self, other):
+        return self.identity == other.identity
+
+    def __eq__(self, other):
+        return isinstance(other, _MatchJoin) and self.identity == other.identity
+
+    def __hash__(self):
+        return hash(self.identity)
+
+
+def search(queryset, text, fallback_fields=()):
+    """Restrict ``queryset`` to rows matching ``text`` and annotate ``search_rank`` (higher is better).
+
+    On backends without a full-text index this falls back to icontains
+    over ``fallback_fields`` with a constant rank.
+    """
+    tokens = [token.lower() for token in TOKEN_RE.findall(text)][:MAX_QUERY_TOKENS]
+    if not tokens:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+    if not backend_supported():
+        condition = Q()
+        for field in fallback_fields:
+            condition |= Q(**{f'{field}__icontains': text})
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    table = index_table(queryset.model)
+    if connection.vendor == 'sqlite':
+        # bm25() is lower-is-better, so negate it
+        matches = f"SELECT rowid AS object_id, -bm25({table}) AS search_rank FROM {table} WHERE {table} MATCH %s"
+    else:
+        matches = (
+            f"SELECT object_id, ts_rank(document, query) AS search_rank "
+            f"FROM {table}, to_tsquery('simple', %s) query WHERE document @@ query"
+        )
+    queryset = queryset.all()
+    query = queryset.query
+    alias = query.join(_MatchJoin(
+        f"{table}_matches", matches, [_match_expression(tokens)], queryset.model._meta.pk.column, query.get_initial_alias(),
+    ))
+    rank = FloatField()
+    rank.set_attributes_from_name('search_rank')
+    rank.model = queryset.model
+    return queryset.annotate(search_rank=Col(alias, rank))
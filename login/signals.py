@@ -0,0 +1,192 @@
+# ============================================================================
+# login/signals.py - Model signal receivers (connected in LoginConfig.ready)
+# ============================================================================
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from analyst.models import BuoyReading, DartBuoy, Report
+
+from .changelog import record_changes, tracked_models
+from .counters import counter_state, objects_created, state_changed
+from .events import (
+    hazard_report_channels, hazard_report_status_event, publish_on_commit, report_channels, report_status_event,
+)
+from .models import HazardMedia, HazardReport, HazardReportTombstone, UserProfile
+from .rollups import report_changed, reports_created, rollup_state
+from .search import index_objects, remove_objects
+from .versions import bump_versions, next_version
+
+# bulk_create() skips post_save; sent with reports=[...] after a bulk ingest
+hazard_reports_bulk_created = Signal()
+
+
+@receiver(post_delete, sender=HazardMedia)
+def release_media_file(sender, instance, **kwargs):
+    """Drop this reference to the stored file and its renditions; the last reference deletes each"""
+    for field in ['file'] + HazardMedia.RENDITION_FIELDS:
+        field_file = getattr(instance, field)
+        if field_file:
+            field_file.storage.delete(field_file.name)
+
+
+@receiver(post_delete, sender=HazardReport)
+def record_report_tombstone(sender, instance, **kwargs):
+    """Leave a tombstone so delta-sync clients learn about the deletion"""
+    HazardReportTombstone.objects.create(report_id=instance.report_id, reporter_id=instance.reporter_id)
+
+
+@receiver(post_save, sender=HazardReport)
+@receiver(post_save, sender=Report)
+def index_for_search(sender, instance, **kwargs):
+    """Keep the full-text index in step with the saved row"""
+    index_objects([instance])
+
+
+@receiver(post_delete, sender=HazardReport)
+@receiver(post_delete, sender=Report)
+def remove_from_search(sender, instance, **kwargs):
+    remove_objects(sender, [instance.pk])
+
+
+@receiver(hazard_reports_bulk_created)
+def index_bulk_reports(sender, reports, **kwargs):
+    index_objects(reports)
+    objects_created(reports)
+    reports_created(reports)
+    bump_versions(HazardReport)
+    record_changes('insert', reports)
+
+
+SEARCHED_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def reindex_authored_reports(sender, instance, created, update_fields=None, **kwargs):
+    """Analyst reports are searchable by their author's names"""
+    # Logins save only last_login
+    if created or (update_fields is not None and not SEARCHED_USER_FIELDS & set(update_fields)):
+        return
+    index_objects(list(Report.objects.filter(created_by=instance).select_related('created_by')))
+
+
+# ============================================================================
+# TABLE VERSIONS (login/versions.py)
+# ============================================================================
+
+@receiver(post_save, sender=HazardReport)
+@receiver(post_save, sender=DartBuoy)
+@receiver(post_save, sender=BuoyReading)
+@receiver(post_delete, sender=HazardReport)
+@receiver(post_delete, sender=Report)
+@receiver(post_delete, sender=DartBuoy)
+@receiver(post_delete, sender=BuoyReading)
+def bump_table_version(sender, **kwargs):
+    """Conditional GETs on this table's data stop answering 304"""
+    bump_versions(sender)
+
+
+@receiver(pre_save, sender=Report)
+def stamp_report_version(sender, instance, **kwargs):
+    """Saving a Report bumps its table version and stamps the row with it (batched status polling)"""
+    instance.version = next_version(Report)
+
+
+# ============================================================================
+# DASHBOARD COUNTERS (login/counters.py)
+# ============================================================================
+
+@receiver(post_init, sender=HazardReport)
+@receiver(post_init, sender=UserProfile)
+@receiver(post_init, sender=Report)
+def remember_counter_state(sender, instance, **kwargs):
+    """The state a loaded row is currently counted under"""
+    instance._counter_state = counter_state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=HazardReport)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=Report)
+def update_counters(sender, instance, **kwargs):
+    instance._counter_state = state_changed(instance, instance._counter_state)
+
+
+@receiver(post_delete, sender=HazardReport)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=Report)
+def release_counters(sender, instance, **kwargs):
+    instance._counter_state = state_changed(instance, instance._counter_state, removed=True)
+
+
+@receiver(post_save, sender=User)
+def count_new_user(sender, instance, created, **kwargs):
+    if created:
+        state_changed(instance, None)
+
+
+@receiver(post_delete, sender=User)
+def uncount_user(sender, instance, **kwargs):
+    state_changed(instance, (), removed=True)
+
+
+# ============================================================================
+# TREND ROLLUPS (login/rollups.py)
+# ============================================================================
+
+@receiver(post_init, sender=HazardReport)
+def remember_rollup_state(sender, instance, **kwargs):
+    instance._rollup_state = rollup_state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=HazardReport)
+def update_rollups(sender, instance, **kwargs):
+    instance._rollup_state = report_changed(instance, instance._rollup_state)
+
+
+@receiver(post_delete, sender=HazardReport)
+def release_rollups(sender, instance, **kwargs):
+    instance._rollup_state = report_changed(instance, instance._rollup_state, removed=True)
+
+
+# ============================================================================
+# STATUS EVENTS (login/events.py, streamed by report_events)
+# ============================================================================
+
+STATUS_EVENTS = {
+    HazardReport: (hazard_report_channels, hazard_report_status_event),
+    Report: (report_channels, report_status_event),
+}
+
+
+@receiver(post_init, sender=HazardReport)
+@receiver(post_init, sender=Report)
+def remember_status(sender, instance, **kwargs):
+    instance._published_status = instance.__dict__.get('status') if instance.pk else None
+
+
+@receiver(post_save, sender=HazardReport)
+@receiver(post_save, sender=Report)
+def publish_status_change(sender, instance, created, **kwargs):
+    status = instance.__dict__.get('status')
+    if not created and status is not None and status != instance._published_status:
+        channels_for, event_for = STATUS_EVENTS[sender]
+        publish_on_commit(channels_for(instance), event_for(instance))
+    instance._published_status = status
+
+# ============================================================================
+# CHANGELOG
+# ============================================================================
+
+def log_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        record_changes('insert' if created else 'update', [instance])
+
+
+def log_delete(sender, instance, **kwargs):
+    record_changes('delete', [instance])
+
+
+for model in tracked_models():
+    post_save.connect(log_save, sender=model, weak=False, dispatch_uid=f'changelog_save_{model.__name__}')
+    post_delete.connect(log_delete, sender=model, weak=False, dispatch_uid=f'changelog_delete_{model.__name__}')
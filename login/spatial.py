@@ -0,0 +1,165 @@
+# ============================================================================
+# login/spatial.py - Geohash indexing and bbox / radius queries for reports
+# ============================================================================
+
+import math
+
+from django.db.models import Q
+
+from .utils import get_hazard_setting
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~5 m cells
+# Sorts after every geohash character, so [prefix, prefix + '~') spans a cell
+PREFIX_END = '~'
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        span, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (span[0] + span[1]) / 2
+        if coordinate >= mid:
+            value = value * 2 + 1
+            span[0] = mid
+        else:
+            value *= 2
+            span[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell"""
+    lng_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision - lng_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering_prefixes(south, west, north, east, max_cells=None):
+    """Geohash prefixes whose cells together cover the box, or None if the box is too large.
+
+    Uses the finest precision that needs at most ``max_cells`` cells, so the
+    index range scan stays tight without building a huge OR clause.
+    """
+    max_cells = max_cells or get_hazard_setting('SPATIAL_MAX_COVER_CELLS', 24)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(north / height) - math.floor(south / height) + 1
+        cols = math.floor(east / width) - math.floor(west / width) + 1
+        if rows * cols > max_cells:
+            continue
+        prefixes = set()
+        for row in range(math.floor(south / height), math.floor(north / height) + 1):
+            for col in range(math.floor(west / width), math.floor(east / width) + 1):
+                center_lat = min(max((row + 0.5) * height, -90.0), 90.0)
+                center_lng = min(max((col + 0.5) * width, -180.0), 180.0)
+                prefixes.add(encode_geohash(center_lat, center_lng, precision))
+        return sorted(prefixes)
+    return None
+
+
+def bbox_filter(south, west, north, east):
+    """Q object matching reports inside the box, driven by the geohash index"""
+    exact = Q(latitude__gte=south, latitude__lte=north, longitude__gte=west, longitude__lte=east)
+    prefixes = covering_prefixes(south, west, north, east)
+    if not prefixes:
+        return exact
+    cover = Q()
+    for prefix in prefixes:
+        cover |= Q(geohash__gte=prefix, geohash__lt=prefix + PREFIX_END)
+    return cover & exact
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """(south, west, north, east) of the box enclosing a circle"""
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    d_lng = d_lat / max(math.cos(math.radians(latitude)), 0.01)
+    return (
+        max(latitude - d_lat, -90.0), max(longitude - d_lng, -180.0),
+        min(latitude + d_lat, 90.0), min(longitude + d_lng, 180.0),
+    )
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Haversine distance"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+# ============================================================================
+# QUERY PARAMETERS
+# ============================================================================
+
+def _floats(value, count, name):
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        raise ValueError(f"{name} must be {count} comma-separated numbers")
+    return numbers
+
+
+def parse_bbox(value):
+    """bbox=west,south,east,north (the GeoJSON / Leaflet toBBoxString order)"""
+    west, south, east, north = _floats(value, 4, 'bbox')
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        raise ValueError("bbox must be west,south,east,north within valid ranges")
+    return south, west, north, east
+
+
+def parse_near(value, radius_value=None):
+    """near=lat,lng with radius_km= (default SPATIAL_DEFAULT_RADIUS_KM)"""
+    latitude, longitude = _floats(value, 2, 'near')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("near must be a valid lat,lng")
+    radius_km = get_hazard_setting('SPATIAL_DEFAULT_RADIUS_KM', 10)
+    if radius_value:
+        radius_km = _floats(radius_value, 1, 'radius_km')[0]
+    max_radius = get_hazard_setting('SPATIAL_MAX_RADIUS_KM', 500)
+    if not 0 < radius_km <= max_radius:
+        raise ValueError(f"radius_km must be between 0 and {max_radius}")
+    return latitude, longitude, radius_km
+
+
+def apply_spatial_filters(queryset, params):
+    """Apply bbox= / near= query parameters to a HazardReport queryset.
+
+    Returns (queryset, near) where near is (lat, lng, radius_km) or None; the
+    box around ``near`` is filtered in SQL and callers trim to the circle with
+    within_radius(). Raises ValueError on malformed parameters.
+    """
+    near = None
+    if params.get('bbox'):
+        queryset = queryset.filter(bbox_filter(*parse_bbox(params['bbox'])))
+    if params.get('near'):
+        near = parse_near(params['near'], params.get('radius_km'))
+        queryset = queryset.filter(bbox_filter(*radius_bbox(*near)))
+    return queryset, near
+
+
+def within_radius(reports, near):
+    """Yield (report, distance_km) for reports inside the circle, nearest first"""
+    latitude, longitude, radius_km = near
+    matches = []
+    for report in reports:
+        distance = distance_km(latitude, longitude, float(report.latitude), float(report.longitude))
+        if distance <= radius_km:
+            matches.append((report, distance))
+    matches.sort(key=lambda match: match[1])
+    return matches
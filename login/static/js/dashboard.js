@@ -4,6 +4,7 @@ let locationMap, mainMap;
 let currentLocation = { lat: 20.5937, lng: 78.9629 }; // Default: India center
 let selectedLocation = null;
 let mapMarkers = [];
+let liveFeed = null;
 
 // Initialize when document is ready
 document.addEventListener('DOMContentLoaded', function() {
@@ -171,8 +172,46 @@ function initializeMainMap() {
         attribution: '© OpenStreetMap contributors'
     }).addTo(mainMap);
     
-    // Load hazard reports
+    // Load hazard reports, then follow changes in the visible area
     loadHazardReports();
+    connectLiveFeed();
+}
+
+function connectLiveFeed() {
+    if (typeof LiveFeed === 'undefined') return;
+    
+    const bbox = LiveFeed.bboxOf(mainMap);
+    if (liveFeed) {
+        liveFeed.subscribe({ bbox });
+    } else {
+        liveFeed = new LiveFeed({ kinds: ['hazard_report'], bbox, onEntry: applyLiveReport, onResync: loadHazardReports });
+    }
+    mainMap.on('moveend', () => liveFeed.subscribe({ bbox: LiveFeed.bboxOf(mainMap) }));
+}
+
+// Add, replace or remove the marker of a report pushed by the live feed
+function applyLiveReport(entry) {
+    mapMarkers = mapMarkers.filter(marker => {
+        if (marker.reportId !== entry.id) return true;
+        mainMap.removeLayer(marker);
+        return false;
+    });
+    if (entry.deleted) return;
+    
+    const marker = createHazardMarker({
+        id: entry.id,
+        lat: entry.lat,
+        lng: entry.lng,
+        hazard_type: entry.hazard_type_display,
+        severity: entry.severity,
+        description: entry.description,
+        status: entry.status,
+        created_at: new Date(entry.time).toLocaleString(),
+        urgent: entry.urgent,
+        reporter: '-'
+    });
+    marker.addTo(mainMap);
+    mapMarkers.push(marker);
 }
 
 function updateLocationInputs(lat, lng) {
@@ -246,6 +285,7 @@ function createHazardMarker(report) {
     let iconColor = getMarkerColor(report.status, report.severity);
     
     const marker = L.marker([report.lat, report.lng]);
+    marker.reportId = report.id;
     
     // Create popup content
     const popupContent = `
@@ -0,0 +1,114 @@
+# ============================================================================
+# login/storage.py - Content-addressed, deduplicating storage for HazardMedia
+# ============================================================================
+
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+CAS_PREFIX = 'cas'
+HASH_BLOCK_SIZE = 64 * 1024
+
+
+def content_hash_from_name(name):
+    """Return the SHA-256 encoded in a content-addressed file name, or ''"""
+    if not name or not name.startswith(f"{CAS_PREFIX}/"):
+        return ''
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores each distinct file once under cas/<aa>/<bb>/<sha256><ext>.
+
+    Every saved reference is counted in a MediaBlob row. Saving a file whose
+    content is already stored skips the write, and delete() only removes the
+    file once the last reference to it is released. Names outside cas/ (files
+    saved before this storage was introduced) behave as plain file storage.
+    """
+
+    def cas_name(self, sha256, extension):
+        return f"{CAS_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension.lower()}"
+
+    @staticmethod
+    def hash_content(content):
+        hasher = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'temporary_file_path'):
+            with open(content.temporary_file_path(), 'rb') as handle:
+                for block in iter(lambda: handle.read(HASH_BLOCK_SIZE), b''):
+                    hasher.update(block)
+                    size += len(block)
+        else:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks():
+                hasher.update(chunk)
+                size += len(chunk)
+            if hasattr(content, 'seek'):
+                content.seek(0)
+        return hasher.hexdigest(), size
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        sha256, size = self.hash_content(content)
+
+        with transaction.atomic():
+            # Holding the blob's row lock keeps a concurrent delete() of the
+            # last reference from removing the file between the check and the count
+            blob = self._lock_blob(sha256, self.cas_name(sha256, os.path.splitext(name)[1]), size)
+            if not self.exists(blob.name):
+                # Write under a unique name first so concurrent saves of the same
+                # content never collide, then atomically move it into place
+                incoming = super()._save(f"{CAS_PREFIX}/incoming/{uuid.uuid4().hex}", content)
+                os.makedirs(os.path.dirname(self.path(blob.name)), exist_ok=True)
+                os.replace(self.path(incoming), self.path(blob.name))
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return blob.name
+
+    @staticmethod
+    def _lock_blob(sha256, name, size):
+        """Lock the blob row for ``sha256``, creating it unreferenced if there is none"""
+        from .models import MediaBlob
+
+        while True:
+            MediaBlob.objects.get_or_create(sha256=sha256, defaults={'name': name, 'size': size, 'ref_count': 0})
+            blob = MediaBlob.objects.select_for_update().filter(sha256=sha256).first()
+            # None when a delete() removed the row while we waited for its lock
+            if blob is not None:
+                return blob
+
+    def reference_existing(self, sha256, size=None):
+        """Add a reference to already-stored content, returning its name or None"""
+        from .models import MediaBlob
+
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(sha256=sha256).first()
+            if blob is None or (size is not None and blob.size != size) or not self.exists(blob.name):
+                return None
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return blob.name
+
+    def delete(self, name):
+        from .models import MediaBlob
+
+        sha256 = content_hash_from_name(name)
+        if not sha256:
+            return super().delete(name)
+
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(sha256=sha256).first()
+            if blob is not None and blob.ref_count > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            # Still under the lock, so a concurrent _save() waits and writes the file again
+            super().delete(name)
+
+
+media_storage = ContentAddressedStorage()
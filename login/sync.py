@@ -0,0 +1,124 @@
+# ============================================================================
+# login/sync.py - Cursor-based delta sync of hazard reports
+# ============================================================================
+
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .utils import get_hazard_setting
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(Exception):
+    """Raised when a client sends a cursor this server did not issue"""
+
+
+class SyncCursor:
+    """Position in the report change stream and the tombstone stream.
+
+    Each stream is ordered by (timestamp, id) so rows sharing a timestamp are
+    never skipped or repeated between pages. Clients treat the encoded value
+    as opaque.
+    """
+
+    def __init__(self, report_at=EPOCH, report_pk=0, deleted_at=EPOCH, tombstone_pk=0):
+        self.report_at = report_at
+        self.report_pk = report_pk
+        self.deleted_at = deleted_at
+        self.tombstone_pk = tombstone_pk
+
+    def encode(self):
+        payload = [self.report_at.isoformat(), self.report_pk, self.deleted_at.isoformat(), self.tombstone_pk]
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    @classmethod
+    def decode(cls, value):
+        if not value:
+            return cls()
+        try:
+            padded = value + '=' * (-len(value) % 4)
+            report_at, report_pk, deleted_at, tombstone_pk = json.loads(base64.urlsafe_b64decode(padded))
+            return cls(
+                datetime.fromisoformat(report_at), int(report_pk),
+                datetime.fromisoformat(deleted_at), int(tombstone_pk),
+            )
+        except (ValueError, TypeError):
+            raise InvalidCursor("Unrecognised sync cursor")
+
+    @property
+    def is_initial(self):
+        return self.report_at == EPOCH and self.report_pk == 0
+
+
+def _after(queryset, field, at, pk):
+    return queryset.filter(Q(**{f'{field}__gt': at}) | Q(**{field: at, 'pk__gt': pk}))
+
+
+def changes_since(reports, tombstones, cursor, limit, is_visible=None):
+    """Return (changed_reports, removed_report_ids, next_cursor, has_more).
+
+    Only rows older than SYNC_SAFETY_LAG_SECONDS are served, so a slow
+    transaction that commits with an earlier updated_at cannot land behind a
+    cursor that has already moved past it. Rows the caller may no longer see
+    (``is_visible`` returns False) are reported as removed.
+    """
+    lag = get_hazard_setting('SYNC_SAFETY_LAG_SECONDS', 2)
+    horizon = timezone.now() - timedelta(seconds=lag)
+
+    # An exhausted stream jumps to the horizon, which also keeps the cursor of
+    # an idle stream fresh enough to pass needs_full_resync()
+    next_cursor = SyncCursor(horizon, 0, horizon, 0)
+
+    changed = list(
+        _after(reports, 'updated_at', cursor.report_at, cursor.report_pk)
+        .filter(updated_at__lte=horizon)
+        .order_by('updated_at', 'pk')[:limit + 1]
+    )
+    has_more = len(changed) > limit
+    if has_more:
+        changed = changed[:limit]
+        next_cursor.report_at, next_cursor.report_pk = changed[-1].updated_at, changed[-1].pk
+
+    removed = []
+    if not cursor.is_initial:
+        # A fresh client has nothing to delete, so it skips the tombstone stream
+        deleted = list(
+            _after(tombstones, 'deleted_at', cursor.deleted_at, cursor.tombstone_pk)
+            .filter(deleted_at__lte=horizon)
+            .order_by('deleted_at', 'pk')[:limit + 1]
+        )
+        if len(deleted) > limit:
+            has_more = True
+            deleted = deleted[:limit]
+            next_cursor.deleted_at, next_cursor.tombstone_pk = deleted[-1].deleted_at, deleted[-1].pk
+        removed.extend(tombstone.report_id for tombstone in deleted)
+
+    changed_out = []
+    for report in changed:
+        if is_visible is None or is_visible(report):
+            changed_out.append(report)
+        elif not cursor.is_initial:
+            removed.append(report.report_id)
+
+    return changed_out, removed, next_cursor, has_more
+
+
+def tombstone_cutoff():
+    return timezone.now() - timedelta(days=get_hazard_setting('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def needs_full_resync(cursor):
+    """True when tombstones the client has not seen may already be pruned"""
+    return not cursor.is_initial and cursor.deleted_at < tombstone_cutoff()
+
+
+def prune_tombstones():
+    from .models import HazardReportTombstone
+
+    removed, _ = HazardReportTombstone.objects.filter(deleted_at__lt=tombstone_cutoff()).delete()
+    return removed
@@ -1,3 +1,856 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import smtplib
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from analyst.models import Report
+
+from . import uploads
+from .benchmarks import BenchmarkTestCase, seed_hazard_reports, use_temporary_tile_cache
+from .bulk_ingest import _insert_batch, _validate, ingest_reports
+from .changelog import prune_changelog
+from .counters import read_counters, reconcile_counters, seed_counters
+from .events import get_broker
+from .geocode_cache import geocode_cache
+from .geocoding import _claim_pending_reports, geocode_pending_reports
+from .media_processing import process_pending_media
+from .models import (
+    AlertSubscription, ChangeLogEntry, Counter, GazetteerPlace, HazardMedia, HazardReport, HazardReportRollup, MediaBlob,
+    NotificationDelivery, UserProfile,
+)
+from .notifications import dispatch_notifications, enqueue_urgent_events, send_pending_deliveries
+from .pagination import KeysetPaginator
+from .report_ids import ReportIdAllocator, report_id_allocator
+from .rollups import update_rolled_up
+from .search import search
+from .storage import media_storage
+from .utils import get_hazard_setting
+
+
+def setUpModule():
+    use_temporary_tile_cache()
+
+
+class ReportIdAllocatorTests(TestCase):
+    def test_concurrent_allocation_is_unique_and_ordered(self):
+        allocator = ReportIdAllocator(node='T01')
+        per_thread = 5000
+        results = {}
+
+        def worker(index):
+            results[index] = allocator.allocate_many(per_thread)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        all_ids = [report_id for ids in results.values() for report_id in ids]
+        self.assertEqual(len(all_ids), 8 * per_thread)
+        self.assertEqual(len(set(all_ids)), len(all_ids))
+        for ids in results.values():
+            self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(len(report_id) <= 32 for report_id in all_ids))
+
+    def test_nodes_keep_processes_apart(self):
+        first = ReportIdAllocator(node='AAA').allocate_many(1000)
+        second = ReportIdAllocator(node='BBB').allocate_many(1000)
+        self.assertFalse(set(first) & set(second))
+
+    def test_burst_of_reports_in_one_second(self):
+        reporter = User.objects.create_user('burst', 'burst@example.com', 'pw')
+        reports = [
+            HazardReport.objects.create(
+                reporter=reporter, hazard_type='high_waves', severity='moderate',
+                description='Burst', latitude=15.5, longitude=73.8,
+            )
+            for _ in range(200)
+        ]
+        self.assertEqual(len({report.report_id for report in reports}), 200)
+
+    def test_retries_when_another_process_took_the_id(self):
+        reporter = User.objects.create_user('clash', 'clash@example.com', 'pw')
+        taken = report_id_allocator.allocate()
+        HazardReport.objects.create(
+            reporter=reporter, report_id=taken, hazard_type='other', severity='low',
+            description='Existing', latitude=0, longitude=0,
+        )
+
+        fresh = report_id_allocator.allocate()
+        with mock.patch.object(report_id_allocator, 'allocate', side_effect=[taken, fresh]) as allocate:
+            report = HazardReport.objects.create(
+                reporter=reporter, hazard_type='other', severity='low',
+                description='New', latitude=0, longitude=0,
+            )
+        self.assertEqual(report.report_id, fresh)
+        self.assertEqual(allocate.call_count, 2)
+
+
+class ReportViewBenchmarks(BenchmarkTestCase):
+    scan_tables = ('login_hazardreport', 'login_hazardmedia', 'login_hazardreportrollup', 'login_counter')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporters = [User.objects.create_user(f'reporter{i}', password='pw') for i in range(20)]
+        UserProfile.objects.bulk_create([UserProfile(user=user, user_type='reporter') for user in cls.reporters])
+        cls.admin = User.objects.create_user('bench-admin', password='pw', first_name='Bench')
+        UserProfile.objects.create(user=cls.admin, user_type='admin')
+        cls.reports = seed_hazard_reports(cls.reporters, 3000)
+
+    def login(self, user):
+        self.client.force_login(user)
+
+    def test_map_data_api(self):
+        self.login(self.admin)
+        with self.benchmark('map_data_api (all reports)', 4):
+            response = self.client.get(reverse('map_data_api'))
+        self.assertEqual(len(response.json()['reports']), 3000)
+
+    def test_map_data_api_page(self):
+        self.login(self.reporters[0])
+        first = self.client.get(reverse('map_data_api'), {'limit': 100}).json()
+        with self.benchmark('map_data_api (verified, page 2)', 4):
+            response = self.client.get(reverse('map_data_api'), {'limit': 100, 'cursor': first['next_cursor']})
+        self.assertEqual(len(response.json()['reports']), 100)
+
+    def test_map_data_api_bbox(self):
+        self.login(self.admin)
+        with self.benchmark('map_data_api (bbox)', 4):
+            response = self.client.get(reverse('map_data_api'), {'bbox': '12,79,14,81', 'hazard_type': 'tsunami'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_my_reports(self):
+        self.login(self.reporters[0])
+        with self.benchmark('my_reports', 4):
+            response = self.client.get(reverse('my_reports'))
+        self.assertEqual(len(response.context['reports']), 10)
+
+    def test_my_reports_search(self):
+        self.login(self.reporters[0])
+        params = {'time_filter': 'all', 'hazard_type': 'all', 'severity': 'all', 'status': 'all', 'search': 'coast'}
+        with self.benchmark('my_reports (search)', 4):
+            response = self.client.get(reverse('my_reports'), params)
+        self.assertEqual(len(response.context['reports']), 10)
+
+    def test_report_detail(self):
+        self.login(self.admin)
+        report = self.reports[0]
+        with self.benchmark('report_detail', 5):
+            response = self.client.get(reverse('report_detail', args=[report.report_id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_dashboard(self):
+        self.login(self.admin)
+        with self.benchmark('admin_dashboard', 5):
+            response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_stats_api(self):
+        self.login(self.reporters[0])
+        with self.benchmark('dashboard_stats_api', 4):
+            response = self.client.get(reverse('dashboard_stats_api'))
+        self.assertIn('total_reports', response.json())
+
+    def test_trends_api(self):
+        self.login(self.admin)
+        start = (timezone.localdate() - timedelta(days=61)).isoformat()
+        with self.benchmark('trends_api', 3):
+            response = self.client.get(reverse('trends_api'), {'start': start, 'group_by': 'hazard_type,severity'})
+        self.assertEqual(sum(row['count'] for row in response.json()['series']), 3000)
+
+    def test_sync_reports_api(self):
+        self.login(self.admin)
+        with self.benchmark('sync_reports_api (map, first page)', 3):
+            response = self.client.get(reverse('sync_reports_api'), {'scope': 'map'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_map_data_api_not_modified(self):
+        self.login(self.admin)
+        etag = self.client.get(reverse('map_data_api'), {'limit': 50})['ETag']
+        with self.benchmark('map_data_api (304)', 3) as profile:
+            response = self.client.get(reverse('map_data_api'), {'limit': 50}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([sql for sql in profile.queries if 'login_hazardreport' in sql])
+
+        report = HazardReport.objects.get(pk=self.reports[0].pk)
+        report.status = 'verified'
+        report.save()
+        response = self.client.get(reverse('map_data_api'), {'limit': 50}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_rolling_window_etag_expires_without_writes(self):
+        self.login(self.admin)
+        params = {'limit': 50, 'time_filter': 'week'}
+        with mock.patch('login.versions.time.time', return_value=1000.0):
+            etag = self.client.get(reverse('map_data_api'), params)['ETag']
+            self.assertEqual(self.client.get(reverse('map_data_api'), params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with mock.patch('login.versions.time.time', return_value=1000.0 + 300):
+            self.assertEqual(self.client.get(reverse('map_data_api'), params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ReportEventStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.analyst = User.objects.create_user('stream-analyst', password='pw')
+        UserProfile.objects.create(user=cls.analyst, user_type='analyst')
+        cls.other = User.objects.create_user('stream-other', password='pw')
+        UserProfile.objects.create(user=cls.other, user_type='analyst')
+        cls.report = Report.objects.create(title='Swell', report_type='event', created_by=cls.analyst)
+
+    def open_stream(self, user, headers=None, **params):
+        self.client.force_login(user)
+        response = self.client.get(reverse('report_events'), params, headers=headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_status_change_is_pushed(self):
+        response = self.open_stream(self.analyst, report=self.report.pk)
+        frames = iter(response.streaming_content)
+        self.assertIn(b'retry:', next(frames))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.report.status = 'submitted'
+            self.report.save()
+        frame = next(frames).decode()
+        self.assertIn('event: status', frame)
+        data = json.loads(frame.split('data: ', 1)[1])
+        self.assertEqual((data['type'], data['id'], data['status']), ('report', self.report.pk, 'submitted'))
+
+    def test_unknown_last_event_id_asks_for_resync(self):
+        response = self.open_stream(self.analyst, headers={'Last-Event-ID': 'gone-1'}, mine='1')
+        frames = iter(response.streaming_content)
+        next(frames)
+        self.assertIn(b'event: resync', next(frames))
+
+    def test_cannot_follow_other_users_reports(self):
+        response = self.open_stream(self.other, report=self.report.pk)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_asgi_stream_sends_each_event_as_it_is_published(self):
+        await self.async_client.aforce_login(self.analyst)
+        response = await self.async_client.get(reverse('report_events'), {'report': self.report.pk})
+        frames = aiter(response.streaming_content)
+        try:
+            self.assertIn(b'retry:', await asyncio.wait_for(anext(frames), 1))
+
+            get_broker().publish([f'report:{self.report.pk}'], {'type': 'report', 'id': self.report.pk})
+            self.assertIn(b'event: status', await asyncio.wait_for(anext(frames), 1))
+        finally:
+            await frames.aclose()
+
+
+class ChangelogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.analyst = User.objects.create_user('changes-analyst', password='pw')
+        UserProfile.objects.create(user=cls.analyst, user_type='analyst')
+
+    def make_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            report = HazardReport.objects.create(
+                reporter=self.analyst, report_id='CL-1', hazard_type='tsunami', severity='high',
+                description='Receding sea', latitude=12, longitude=80,
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            report.status = 'verified'
+            report.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            report.delete()
+        # Past the safety lag
+        ChangeLogEntry.objects.update(changed_at=timezone.now() - timedelta(minutes=1))
+
+    def get_changes(self, **params):
+        self.client.force_login(self.analyst)
+        return self.client.get(reverse('changes_api'), params)
+
+    def test_pages_through_changes_in_sequence(self):
+        self.make_changes()
+        first = self.get_changes(models='login.hazardreport', limit=2).json()
+        self.assertEqual([change['action'] for change in first['changes']], ['insert', 'update'])
+        self.assertEqual(first['changes'][1]['data']['status'], 'verified')
+        self.assertTrue(first['has_more'])
+
+        rest = self.get_changes(since=first['next_since']).json()
+        self.assertEqual([(change['action'], change['data']) for change in rest['changes']], [('delete', None)])
+        self.assertFalse(rest['has_more'])
+
+    def test_recent_changes_are_held_back(self):
+        self.make_changes()
+        ChangeLogEntry.objects.filter(action='update').update(changed_at=timezone.now())
+        page = self.get_changes().json()
+        self.assertEqual([change['action'] for change in page['changes']], ['insert'])
+        self.assertFalse(page['has_more'])
+
+    def test_pruned_cursor_must_resync(self):
+        self.make_changes()
+        ChangeLogEntry.objects.filter(action='insert').update(changed_at=timezone.now() - timedelta(days=400))
+        self.assertEqual(prune_changelog(), 1)
+        response = self.get_changes(since=0)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()['latest'], ChangeLogEntry.objects.latest('pk').pk)
+
+
+class GeocodingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporter = User.objects.create_user('geocode-reporter', password='pw')
+        cls.report = HazardReport.objects.create(
+            reporter=cls.reporter, hazard_type='high_waves', severity='moderate', description='Swell',
+            latitude=15.5, longitude=73.8, location_name='Lat: 15.5000, Lng: 73.8000', geocode_status='pending',
+        )
+
+    def test_claimed_reports_are_skipped_by_other_workers(self):
+        claimed = _claim_pending_reports(10)
+        self.assertEqual([report.pk for report in claimed], [self.report.pk])
+        self.assertEqual(_claim_pending_reports(10), [])
+
+        # An expired lease is picked up again
+        HazardReport.objects.filter(pk=self.report.pk).update(geocode_retry_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(_claim_pending_reports(10)), 1)
+
+    def test_failed_lookup_goes_back_to_pending(self):
+        with mock.patch('login.geocoding.cached_reverse_geocode', return_value=None):
+            stats = geocode_pending_reports()
+        self.assertEqual(stats['retrying'], 1)
+        report = HazardReport.objects.get(pk=self.report.pk)
+        self.assertEqual((report.geocode_status, report.geocode_attempts), ('pending', 1))
+
+        with mock.patch('login.geocoding.cached_reverse_geocode', return_value='Panaji, Goa') as lookup:
+            self.assertEqual(geocode_pending_reports()['processed'], 0)
+        lookup.assert_not_called()
+
+
+class BackfillRollupsTests(TestCase):
+    def test_regions_are_filled_only_inside_the_rebuilt_range(self):
+        reporter = User.objects.create_user('rollup-reporter', password='pw')
+        old, new = [
+            HazardReport.objects.create(
+                # Open ocean, far from any gazetteer place
+                reporter=reporter, hazard_type='high_waves', severity='moderate', description='Swell',
+                latitude=-30.0, longitude=70.0,
+            )
+            for _ in range(2)
+        ]
+        update_rolled_up(HazardReport.objects.filter(pk=old.pk), created_at=timezone.now() - timedelta(days=30))
+        since = timezone.localdate() - timedelta(days=1)
+
+        with mock.patch('login.management.commands.backfill_rollups.lookup_region', return_value='Goa'):
+            call_command('backfill_rollups', since=since.isoformat(), stdout=io.StringIO())
+        self.assertEqual(
+            dict(HazardReport.objects.values_list('pk', 'region')), {old.pk: '', new.pk: 'Goa'}
+        )
+
+        # The report left out still moves between its own rollup rows
+        old = HazardReport.objects.get(pk=old.pk)
+        old.status = 'verified'
+        old.save()
+        self.assertFalse(HazardReportRollup.objects.filter(count__lt=0).exists())
+        self.assertEqual(
+            set(HazardReportRollup.objects.filter(count__gt=0, granularity='day').values_list('region', 'status')),
+            {('', 'verified'), ('Goa', 'pending')},
+        )
+
+
+class GeocodeCacheTests(TestCase):
+    def setUp(self):
+        geocode_cache.clear_memory()
+        # Start from zero whatever earlier tests looked up
+        geocode_cache.flush_stats()
+        Counter.objects.filter(name__startswith='geocode_cache:').delete()
+
+    def test_hits_and_misses_reach_the_shared_counters(self):
+        self.assertIsNone(geocode_cache.get(9.9312, 76.2673))
+        geocode_cache.set(9.9312, 76.2673, 'Kochi, Kerala')
+        self.assertEqual(geocode_cache.get(9.9312, 76.2673), 'Kochi, Kerala')
+        geocode_cache.flush_stats()
+        self.assertEqual(
+            read_counters(['geocode_cache:hits', 'geocode_cache:misses']),
+            {'geocode_cache:hits': 1, 'geocode_cache:misses': 1},
+        )
+
+        out = io.StringIO()
+        call_command('geocode_cache', stdout=out)
+        self.assertIn('1 memory hits, 0 database hits, 1 misses (hit rate 50.0%)', out.getvalue())
+
+
+class GazetteerImportTests(TestCase):
+    def write(self, directory, name, lines):
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(''.join('\t'.join(fields) + '\n' for fields in lines))
+        return path
+
+    def test_geonames_admin1_codes_become_state_names(self):
+        place = ['1273874', 'Kochi', 'Kochi', '', '9.93988', '76.26022', 'P', 'PPLA2', 'IN', '', '13', '', '', '', '633553']
+        with tempfile.TemporaryDirectory() as directory:
+            dump = self.write(directory, 'IN.txt', [place])
+            codes = self.write(directory, 'admin1CodesASCII.txt', [['IN.13', 'Kerala', 'Kerala', '1267254']])
+
+            call_command('import_gazetteer', dump, format='geonames', stdout=io.StringIO())
+            self.assertEqual(GazetteerPlace.objects.get(name='Kochi').region, '')
+
+            # Re-importing with the codes fixes the places imported without them
+            call_command('import_gazetteer', dump, format='geonames', admin1_codes=codes, stdout=io.StringIO())
+        self.assertEqual(GazetteerPlace.objects.get(name='Kochi').region, 'Kerala')
+
+
+class MediaStorageTestCase(TestCase):
+    """Keeps media writes in a throwaway MEDIA_ROOT"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT=cls.media_root, MEDIA_UPLOAD_TEMP_DIR=os.path.join(cls.media_root, 'uploads_in_progress'),
+        ))
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('media-owner', password='pw')
+        cls.other = User.objects.create_user('media-other', password='pw')
+        cls.owner_reports = [
+            HazardReport.objects.create(
+                reporter=cls.owner, hazard_type='coastal_flooding', severity='high', description='Flooded road',
+                latitude=13.08, longitude=80.27,
+            )
+            for _ in range(2)
+        ]
+        cls.other_report = HazardReport.objects.create(
+            reporter=cls.other, hazard_type='coastal_flooding', severity='high', description='Same photo',
+            latitude=13.08, longitude=80.27,
+        )
+
+
+class ContentAddressedStorageTests(MediaStorageTestCase):
+    content = b'\xff\xd8 flooded road \xff\xd9'
+
+    def attach(self, report, name='photo.jpg'):
+        return HazardMedia.objects.create(report=report, file=ContentFile(self.content, name=name))
+
+    def start_upload(self, user, report, **overrides):
+        self.client.force_login(user)
+        payload = {
+            'report_id': report.report_id, 'file_name': 'forwarded.jpg',
+            'size': len(self.content), 'sha256': hashlib.sha256(self.content).hexdigest(), **overrides,
+        }
+        response = self.client.post(reverse('create_media_upload'), payload, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def test_identical_content_is_stored_once(self):
+        first = self.attach(self.owner_reports[0])
+        second = self.attach(self.owner_reports[1], name='copy.JPG')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(MediaBlob.objects.get().ref_count, 2)
+
+        path = media_storage.path(first.file.name)
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_declared_hash_only_reuses_the_uploaders_own_content(self):
+        self.attach(self.owner_reports[0])
+
+        state = self.start_upload(self.other, self.other_report)
+        self.assertEqual((state['status'], state['received_bytes']), ('uploading', 0))
+
+        state = self.start_upload(self.owner, self.owner_reports[1], size=len(self.content) + 1)
+        self.assertEqual(state['status'], 'uploading')
+
+        state = self.start_upload(self.owner, self.owner_reports[1])
+        self.assertEqual(state['status'], 'complete')
+        self.assertEqual(MediaBlob.objects.get().ref_count, 2)
+
+
+class BulkIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporter = User.objects.create_user('bulk-reporter', password='pw')
+        UserProfile.objects.create(user=cls.reporter, user_type='reporter')
+
+    def record(self, **overrides):
+        return {
+            'hazard_type': 'high_waves', 'severity': 'moderate', 'description': 'Waves over the sea wall',
+            'latitude': 15.4909, 'longitude': 73.8278, **overrides,
+        }
+
+    def post(self, records):
+        self.client.force_login(self.reporter)
+        body = '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('bulk_ingest_reports'), body, content_type='application/x-ndjson').json()
+
+    def test_results_per_line(self):
+        data = self.post([
+            self.record(idempotency_key='a'),
+            '{not json',
+            self.record(severity='apocalyptic'),
+            self.record(idempotency_key='a'),
+            self.record(),
+        ])
+        self.assertEqual((data['created'], data['duplicate'], data['invalid']), (2, 1, 2))
+        self.assertEqual([result['status'] for result in data['results']], [
+            'created', 'invalid', 'invalid', 'duplicate', 'created',
+        ])
+        self.assertEqual(data['results'][3]['report_id'], data['results'][0]['report_id'])
+        self.assertIn('severity', data['results'][2]['errors'])
+
+        report = HazardReport.objects.get(report_id=data['results'][0]['report_id'])
+        self.assertEqual((report.reporter, report.geocode_status), (self.reporter, 'pending'))
+
+    def test_resubmitted_keys_are_not_inserted_again(self):
+        first = self.post([self.record(idempotency_key='k1'), self.record(idempotency_key='k2')])
+        again = self.post([self.record(idempotency_key='k2'), self.record(idempotency_key='k3')])
+        self.assertEqual([result['status'] for result in again['results']], ['duplicate', 'created'])
+        self.assertEqual(again['results'][0]['report_id'], first['results'][1]['report_id'])
+        self.assertEqual(HazardReport.objects.filter(reporter=self.reporter).count(), 3)
+
+    def test_key_race_falls_back_to_row_inserts(self):
+        self.post([self.record(idempotency_key='raced')])
+        existing = HazardReport.objects.get(idempotency_key='raced')
+
+        # As if a concurrent request inserted the key after this batch looked it up
+        report, result = _validate(self.reporter, 1, self.record(idempotency_key='raced'))
+        fresh, fresh_result = _validate(self.reporter, 2, self.record())
+        with self.captureOnCommitCallbacks(execute=True):
+            created = _insert_batch(self.reporter, [(report, result), (fresh, fresh_result)])
+        self.assertEqual(created, [fresh])
+        # The row saved on its own is counted once, by post_save
+        self.assertEqual(read_counters(['reports:total'])['reports:total'], 2)
+        self.assertEqual((result['status'], result['report_id']), ('duplicate', existing.report_id))
+        self.assertEqual(fresh_result['status'], 'created')
+
+    def test_committed_batches_keep_their_derived_state_when_a_later_one_fails(self):
+        real_enqueue = enqueue_urgent_events
+        calls = []
+
+        def enqueue_then_fail(reports):
+            calls.append(reports)
+            if len(calls) > 1:
+                raise DatabaseError('connection lost')
+            return real_enqueue(reports)
+
+        stream = [json.dumps(self.record()), json.dumps(self.record(description='Boats capsized'))]
+        with mock.patch('login.bulk_ingest.enqueue_urgent_events', side_effect=enqueue_then_fail), \
+                self.assertRaises(DatabaseError):
+            ingest_reports(self.reporter, stream, batch_size=1)
+
+        self.assertEqual(HazardReport.objects.count(), 1)
+        self.assertEqual(read_counters(['reports:total'])['reports:total'], 1)
+        # Nothing left for reconciliation to repair
+        self.assertEqual(reconcile_counters(), {})
+        self.assertEqual(search(HazardReport.objects.all(), 'waves').count(), 1)
+
+    def test_keyless_row_failure_is_not_reported_as_duplicate(self):
+        self.post([self.record()])
+        report, result = _validate(self.reporter, 1, self.record())
+        with mock.patch.object(HazardReport.objects, 'bulk_create', side_effect=IntegrityError), \
+                mock.patch.object(HazardReport, 'save', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                _insert_batch(self.reporter, [(report, result)])
+        self.assertNotIn('status', result)
+
+
+class CounterSeedTests(TestCase):
+    def test_existing_rows_are_counted_on_first_migrate(self):
+        reporter = User.objects.create_user('seed-reporter', password='pw')
+        seed_hazard_reports([reporter], 3)
+        Counter.objects.all().delete()
+
+        seed_counters()
+        self.assertEqual(read_counters(['users:total', 'reports:total']), {'users:total': 1, 'reports:total': 3})
+
+        # Already seeded: later migrations leave the counters alone
+        Counter.objects.filter(name='reports:total').update(value=7)
+        seed_counters()
+        self.assertEqual(read_counters(['reports:total'])['reports:total'], 7)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporter = User.objects.create_user('search-reporter', password='pw')
+        seed_hazard_reports([cls.reporter], 200)
+
+    def test_match_runs_once_per_query(self):
+        results = search(HazardReport.objects.all(), 'flood').order_by('-search_rank', '-id')
+        with CaptureQueriesContext(connection) as queries:
+            ranked = list(results)
+        self.assertEqual(queries[0]['sql'].count(' MATCH '), 1)
+        ranks = [report.search_rank for report in ranked]
+        self.assertTrue(ranks)
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_ranked_pages_cover_every_match_once(self):
+        results = search(HazardReport.objects.all(), 'flood')
+        paginator = KeysetPaginator(results, 7, ordering=('-search_rank', '-id'))
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(report.pk for report in page)
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        self.assertEqual(sorted(seen), sorted(results.values_list('pk', flat=True)))
+        self.assertEqual(paginator.count, len(seen))
+
+
+class MediaProcessingTests(MediaStorageTestCase):
+    def attach(self, content=None):
+        if content is None:
+            buffer = io.BytesIO()
+            Image.new('RGB', (64, 48), 'navy').save(buffer, 'PNG')
+            content = buffer.getvalue()
+        media = HazardMedia.objects.create(report=self.owner_reports[0], file=ContentFile(content, name='photo.png'))
+        self.assertEqual(media.media_type, 'image')
+        return media
+
+    def test_renditions_are_written_and_the_lease_released(self):
+        media = self.attach()
+        stats = process_pending_media()
+        self.assertEqual((stats['processed'], stats['done']), (1, 1))
+
+        media.refresh_from_db()
+        self.assertEqual((media.processing_status, media.processing_attempts), ('done', 1))
+        self.assertIsNone(media.processing_claimed_at)
+        self.assertTrue(media.thumbnail.name and media.preview.name)
+
+    def test_leased_rows_are_skipped_until_the_lease_expires(self):
+        media = self.attach()
+        # Another worker claimed the row and crashed before finishing it
+        HazardMedia.objects.filter(pk=media.pk).update(
+            processing_status='processing', processing_claimed_at=timezone.now(), processing_attempts=1,
+        )
+        self.assertEqual(process_pending_media()['processed'], 0)
+
+        lease = timedelta(seconds=get_hazard_setting('MEDIA_PROCESSING_LEASE_SECONDS', 3600))
+        HazardMedia.objects.filter(pk=media.pk).update(processing_claimed_at=timezone.now() - lease - timedelta(seconds=1))
+        self.assertEqual(process_pending_media()['done'], 1)
+        media.refresh_from_db()
+        self.assertEqual((media.processing_status, media.processing_attempts), ('done', 2))
+
+    def test_failures_retry_then_give_up(self):
+        media = self.attach(b'not an image')
+        self.assertEqual(process_pending_media(max_attempts=2)['retrying'], 1)
+        media.refresh_from_db()
+        self.assertEqual((media.processing_status, media.processing_claimed_at), ('pending', None))
+
+        self.assertEqual(process_pending_media(max_attempts=2)['failed'], 1)
+        media.refresh_from_db()
+        self.assertEqual((media.processing_status, media.processing_attempts), ('failed', 2))
+        self.assertFalse(media.thumbnail.name)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class NotificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporter = User.objects.create_user('alert-reporter', password='pw')
+        AlertSubscription.objects.bulk_create([
+            AlertSubscription(email='all@example.com'),
+            AlertSubscription(email='tsunami@example.com', hazard_types='tsunami'),
+            AlertSubscription(email='critical@example.com', min_severity='critical'),
+            AlertSubscription(email='inactive@example.com', is_active=False),
+        ])
+
+    def report_urgent(self, hazard_type='storm_surge', severity='high'):
+        report = HazardReport.objects.create(
+            reporter=self.reporter, hazard_type=hazard_type, severity=severity, description='Water over the sea wall',
+            latitude=13.08, longitude=80.27, urgent=True,
+        )
+        enqueue_urgent_events([report])
+        return report
+
+    def test_events_fan_out_to_matching_subscribers(self):
+        self.report_urgent()
+        self.assertEqual(dispatch_notifications()['sent'], 1)
+        self.assertEqual([message.to for message in mail.outbox], [['all@example.com']])
+        self.assertIn('URGENT: Storm Surge', mail.outbox[0].subject)
+
+        self.report_urgent('tsunami', 'critical')
+        self.assertEqual(dispatch_notifications()['sent'], 3)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox[1:]), [
+            'all@example.com', 'critical@example.com', 'tsunami@example.com',
+        ])
+
+    def test_one_connection_serves_the_whole_batch(self):
+        self.report_urgent('tsunami', 'critical')
+        with mock.patch('login.notifications.get_connection', wraps=mail.get_connection) as get_connection:
+            self.assertEqual(dispatch_notifications()['sent'], 3)
+        get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failed_send_is_retried_once_due(self):
+        self.report_urgent()
+        backend = 'django.core.mail.backends.locmem.EmailBackend.send_messages'
+        with mock.patch(backend, side_effect=smtplib.SMTPRecipientsRefused({})):
+            self.assertEqual(dispatch_notifications()['retrying'], 1)
+        delivery = NotificationDelivery.objects.get()
+        self.assertEqual((delivery.status, delivery.attempts), ('pending', 1))
+        self.assertTrue(delivery.last_error)
+
+        # Backing off: nothing is due yet
+        self.assertEqual(send_pending_deliveries()['sent'], 0)
+        NotificationDelivery.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_pending_deliveries()['sent'], 1)
+        delivery.refresh_from_db()
+        self.assertEqual((delivery.status, delivery.attempts, delivery.last_error), ('sent', 2, ''))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_deliveries_of_a_crashed_worker_are_sent_after_the_lease(self):
+        self.report_urgent()
+        with mock.patch('login.notifications.send_pending_deliveries'):
+            dispatch_notifications()
+        # Claimed by a worker that died before sending
+        lease = timedelta(seconds=get_hazard_setting('NOTIFICATION_LEASE_SECONDS', 600))
+        NotificationDelivery.objects.update(status='sending', next_attempt_at=timezone.now() + lease)
+        self.assertEqual(send_pending_deliveries()['sent'], 0)
+
+        NotificationDelivery.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(send_pending_deliveries()['sent'], 1)
+        self.assertEqual(NotificationDelivery.objects.get().status, 'sent')
+
+
+class ChunkedUploadTests(MediaStorageTestCase):
+    content = bytes(range(256)) * 40
+
+    def start(self, **overrides):
+        self.client.force_login(self.owner)
+        payload = {
+            'report_id': self.owner_reports[0].report_id, 'file_name': 'clip.mp4', 'size': len(self.content),
+            **overrides,
+        }
+        response = self.client.post(reverse('create_media_upload'), payload, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return reverse('media_upload_detail', args=[response.json()['upload_id']])
+
+    def put(self, url, offset, chunk, **headers):
+        return self.client.generic(
+            'PUT', url, chunk, content_type='application/octet-stream',
+            headers={'Upload-Offset': str(offset), **headers},
+        )
+
+    def test_resumes_from_the_received_offset(self):
+        url = self.start(sha256=hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(self.put(url, 0, self.content[:4000]).json()['received_bytes'], 4000)
+
+        # The client lost the response and re-sends from its own idea of the offset
+        response = self.put(url, 0, self.content[:4000])
+        self.assertEqual((response.status_code, response.json()['received_bytes']), (409, 4000))
+
+        offset = self.client.get(url).json()['received_bytes']
+        state = self.put(url, offset, self.content[offset:]).json()
+        self.assertEqual(state['status'], 'complete')
+        media = HazardMedia.objects.get(pk=state['media_id'])
+        with media.file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+        self.assertEqual(media.content_hash, hashlib.sha256(self.content).hexdigest())
+
+    def test_stale_chunk_leaves_the_partial_file_alone(self):
+        url = self.start()
+        self.put(url, 0, self.content[:4000])
+        response = self.put(url, 0, b'x' * 4000)
+        self.assertEqual(response.status_code, 409)
+
+        state = self.put(url, 4000, self.content[4000:]).json()
+        with HazardMedia.objects.get(pk=state['media_id']).file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+
+    def test_running_digests_are_bounded(self):
+        urls = [self.start(sha256=hashlib.sha256(self.content).hexdigest()) for _ in range(2)]
+        with override_settings(OCEAN_HAZARD_SETTINGS={**settings.OCEAN_HAZARD_SETTINGS, 'MEDIA_UPLOAD_HASHER_CACHE_SIZE': 1}):
+            for url in urls:
+                self.put(url, 0, self.content[:4000])
+            self.assertEqual(len(uploads._hashers), 1)
+
+            # The evicted upload rebuilds its digest from the partial file
+            state = self.put(urls[0], 4000, self.content[4000:]).json()
+        self.assertEqual(state['status'], 'complete')
+        self.assertNotIn(state['upload_id'], uploads._hashers)
+
+    def test_corrupted_chunk_is_rejected(self):
+        url = self.start()
+        response = self.put(url, 0, self.content[:100], **{'Upload-Checksum-Sha256': '0' * 64})
+        self.assertEqual(response.status_code, 400)
+
+    def test_file_checksum_mismatch_fails_the_upload(self):
+        url = self.start(sha256='0' * 64)
+        response = self.put(url, 0, self.content)
+        self.assertEqual((response.status_code, response.json()['status']), (422, 'failed'))
+        self.assertFalse(HazardMedia.objects.exists())
+
+
+class UserRoleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('role-admin', password='pw')
+        cls.profile = UserProfile.objects.create(user=cls.user, user_type='admin')
+
+    def test_role_comes_with_the_session_user(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('login'))
+        self.assertFalse([query['sql'] for query in queries if 'FROM "login_userprofile"' in query['sql']])
+
+    def test_demotion_applies_on_the_next_request(self):
+        self.assertTrue(self.client.login(username='role-admin', password='pw'))
+        self.assertRedirects(self.client.get(reverse('login')), reverse('verify_wallet'), fetch_redirect_response=False)
+
+        UserProfile.objects.filter(pk=self.profile.pk).update(user_type='reporter')
+        self.assertRedirects(self.client.get(reverse('login')), reverse('reporter_dashboard'), fetch_redirect_response=False)
+
+    def test_sessions_from_the_previous_backend_stay_signed_in(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertRedirects(self.client.get(reverse('login')), reverse('verify_wallet'), fetch_redirect_response=False)
+
+    def test_login_does_not_reindex_authored_reports(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.client.login(username='role-admin', password='pw'))
+        self.assertFalse([query['sql'] for query in queries if 'FROM "analyst_report"' in query['sql']])
+
+
+class MapClusterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('cluster-admin', password='pw')
+        UserProfile.objects.create(user=cls.admin, user_type='admin')
+        seed_hazard_reports([cls.admin], 50)
+
+    def get_clusters(self, **params):
+        self.client.force_login(self.admin)
+        return self.client.get(reverse('map_data_api'), params)
+
+    def test_zoom_is_clamped_to_the_cluster_levels(self):
+        for params in ({'zoom': 25}, {'zoom': 25, 'severity': 'high'}, {'zoom': -3, 'severity': 'high'}):
+            response = self.get_clusters(**params)
+            self.assertEqual(response.status_code, 200, params)
+        self.assertEqual(self.get_clusters(zoom=25, severity='high').json()['zoom'], 16)
+        self.assertEqual(self.get_clusters(zoom=-3).json()['zoom'], 0)
+
+    def test_non_integer_zoom(self):
+        response = self.get_clusters(zoom='near')
+        self.assertEqual((response.status_code, response.json()['error']), (400, 'zoom must be an integer'))
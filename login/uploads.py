@@ -0,0 +1,239 @@
+# ============================================================================
+# login/uploads.py - Streaming, resumable chunked uploads for HazardMedia
+# ============================================================================
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .storage import media_storage
+from .utils import get_hazard_setting
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Raised when a chunk cannot be accepted; carries an HTTP status code"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class AssembledFile(File):
+    """Completed upload on local disk.
+
+    Exposing temporary_file_path() lets FileSystemStorage move the file into
+    place instead of copying it through memory.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+# ============================================================================
+# PATHS AND VALIDATION
+# ============================================================================
+
+def upload_temp_dir():
+    path = getattr(settings, 'MEDIA_UPLOAD_TEMP_DIR', os.path.join(settings.MEDIA_ROOT, 'uploads_in_progress'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def upload_temp_path(upload):
+    return os.path.join(upload_temp_dir(), f"{upload.upload_id}.part")
+
+def validate_new_upload(report, file_name, total_size):
+    """Check extension, size and per-report file count before accepting an upload"""
+    extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+    allowed = get_hazard_setting('ALLOWED_FILE_EXTENSIONS', [])
+    if allowed and extension not in allowed:
+        raise UploadError(f"File type .{extension} is not allowed")
+
+    max_bytes = get_hazard_setting('MAX_FILE_SIZE_MB', 50) * 1024 * 1024
+    if total_size <= 0 or total_size > max_bytes:
+        raise UploadError(f"File size must be between 1 byte and {max_bytes} bytes")
+
+    max_files = get_hazard_setting('MAX_MEDIA_FILES_PER_REPORT', 10)
+    in_flight = report.media_uploads.filter(status='uploading').count()
+    if report.media_files.count() + in_flight >= max_files:
+        raise UploadError(f"A report can have at most {max_files} media files", status=409)
+
+# ============================================================================
+# INCREMENTAL HASHING
+# ============================================================================
+
+# upload_id -> (offset, sha256 state); lets consecutive chunks handled by the
+# same worker continue the digest without re-reading the partial file. Least
+# recently used entries are dropped past MEDIA_UPLOAD_HASHER_CACHE_SIZE, so
+# abandoned uploads cannot pile up; an evicted digest is rebuilt from disk.
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+def _hasher_for(upload, path):
+    with _hashers_lock:
+        cached = _hashers.pop(upload.upload_id, None)
+    if cached is not None and cached[0] == upload.received_bytes:
+        return cached[1]
+
+    # Another worker handled the previous chunk: rebuild the digest from disk
+    hasher = hashlib.sha256()
+    remaining = upload.received_bytes
+    if remaining:
+        with open(path, 'rb') as handle:
+            while remaining:
+                block = handle.read(min(READ_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+def _remember_hasher(upload, offset, hasher):
+    limit = get_hazard_setting('MEDIA_UPLOAD_HASHER_CACHE_SIZE', 256)
+    with _hashers_lock:
+        _hashers[upload.upload_id] = (offset, hasher)
+        while len(_hashers) > limit:
+            _hashers.popitem(last=False)
+
+def _forget_hasher(upload):
+    with _hashers_lock:
+        _hashers.pop(upload.upload_id, None)
+
+# ============================================================================
+# CHUNK HANDLING
+# ============================================================================
+
+def append_chunk(upload, offset, stream, length, chunk_sha256=''):
+    """Stream one chunk from ``stream`` to the partial file at ``offset``.
+
+    The chunk is read in small blocks so a worker never holds more than
+    READ_BLOCK_SIZE bytes of it in memory. The upload only advances when the
+    offset matches what the server has already received, so a client that
+    lost its connection resumes by asking for received_bytes and re-sending
+    from there.
+    """
+    from .models import MediaUpload
+
+    if length > get_hazard_setting('MEDIA_UPLOAD_CHUNK_MAX_BYTES', 8 * 1024 * 1024):
+        raise UploadError("Chunk is too large", status=413)
+
+    # The row lock is held from the offset check until the new offset is
+    # stored, so two requests for the same offset never write the file together
+    with transaction.atomic():
+        locked = MediaUpload.objects.select_for_update().get(pk=upload.pk)
+        upload.status, upload.received_bytes = locked.status, locked.received_bytes
+        if upload.status != 'uploading':
+            raise UploadError("Upload is no longer accepting data", status=409)
+        if offset != upload.received_bytes:
+            raise UploadError(f"Expected offset {upload.received_bytes}", status=409)
+        if length <= 0 or offset + length > upload.total_size:
+            raise UploadError("Chunk does not fit the declared file size")
+
+        path = upload_temp_path(upload)
+        hasher = _hasher_for(upload, path)
+        chunk_hasher = hashlib.sha256()
+        written = 0
+        mode = 'r+b' if os.path.exists(path) else 'wb'
+        with open(path, mode) as handle:
+            handle.seek(offset)
+            while written < length:
+                block = stream.read(min(READ_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                handle.write(block)
+                hasher.update(block)
+                chunk_hasher.update(block)
+                written += len(block)
+
+        # Bytes past received_bytes are simply overwritten by the retried chunk
+        if written != length:
+            raise UploadError("Connection closed before the chunk was complete")
+        if chunk_sha256 and chunk_hasher.hexdigest() != chunk_sha256.lower():
+            raise UploadError("Chunk checksum mismatch")
+
+        new_offset = offset + length
+        MediaUpload.objects.filter(pk=upload.pk).update(received_bytes=new_offset, updated_at=timezone.now())
+
+    upload.received_bytes = new_offset
+    if new_offset < upload.total_size:
+        _remember_hasher(upload, new_offset, hasher)
+        return upload
+    return finalize_upload(upload, hasher.hexdigest())
+
+def finalize_upload(upload, sha256):
+    """Verify the digest and attach the assembled file to the report"""
+    from .models import HazardMedia
+
+    path = upload_temp_path(upload)
+    if upload.expected_sha256 and upload.expected_sha256.lower() != sha256:
+        upload.status = 'failed'
+        upload.sha256 = sha256
+        upload.save(update_fields=['status', 'sha256', 'updated_at'])
+        os.remove(path)
+        raise UploadError("File checksum does not match the declared sha256", status=422)
+
+    with open(path, 'rb') as handle:
+        os.truncate(path, upload.total_size)
+        media = HazardMedia(report=upload.report, file=AssembledFile(handle, name=upload.file_name))
+        media.save()
+    # The storage leaves the partial file behind when the content was a duplicate
+    if os.path.exists(path):
+        os.remove(path)
+
+    upload.sha256 = sha256
+    upload.media = media
+    upload.status = 'complete'
+    upload.save(update_fields=['sha256', 'media', 'status', 'updated_at'])
+    return upload
+
+def attach_existing_content(upload):
+    """Complete an upload without any bytes when the uploader already stored the same content.
+
+    A declared sha256 proves nothing about holding the bytes, so only content
+    attached to one of the uploader's own reports is reused, and only when the
+    declared size matches. Anything else is uploaded and hashed on the server,
+    where the storage deduplicates it.
+    """
+    from .models import HazardMedia
+
+    sha256 = upload.expected_sha256
+    if not sha256:
+        return False
+    if not HazardMedia.objects.filter(report__reporter_id=upload.uploader_id, content_hash=sha256).exists():
+        return False
+    name = media_storage.reference_existing(sha256, size=upload.total_size)
+    if name is None:
+        return False
+
+    media = HazardMedia(report=upload.report, file=name, file_size=upload.total_size)
+    media.save()
+    upload.sha256 = upload.expected_sha256
+    upload.received_bytes = upload.total_size
+    upload.media = media
+    upload.status = 'complete'
+    upload.save(update_fields=['sha256', 'received_bytes', 'media', 'status', 'updated_at'])
+    return True
+
+def prune_stale_uploads(max_age_hours=None):
+    """Delete unfinished uploads (and their partial files) nobody resumed"""
+    from .models import MediaUpload
+
+    max_age_hours = max_age_hours or get_hazard_setting('MEDIA_UPLOAD_EXPIRY_HOURS', 24)
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    stale = MediaUpload.objects.filter(updated_at__lt=cutoff).exclude(status='complete')
+    removed = 0
+    for upload in stale:
+        path = upload_temp_path(upload)
+        if os.path.exists(path):
+            os.remove(path)
+        _forget_hasher(upload)
+        upload.delete()
+        removed += 1
+    return removed
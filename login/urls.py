@@ -50,6 +50,14 @@ urlpatterns = [
     # API Endpoints
     path('api/map-data/', views.map_data_api, name='map_data_api'),
     path('api/dashboard-stats/', views.dashboard_stats_api, name='dashboard_stats_api'),
+    path('api/trends/', views.trends_api, name='trends_api'),
+    path('api/events/', views.report_events, name='report_events'),
+    path('api/reverse-geocode/', views.reverse_geocode_api, name='reverse_geocode_api'),
+    path('api/sync/reports/', views.sync_reports_api, name='sync_reports_api'),
+    path('api/changes/', views.changes_api, name='changes_api'),
+    path('api/reports/bulk/', views.bulk_ingest_reports, name='bulk_ingest_reports'),
+    path('api/uploads/', views.create_media_upload, name='create_media_upload'),
+    path('api/uploads/<uuid:upload_id>/', views.media_upload_detail, name='media_upload_detail'),
 ]
 
 # Serve media files during development
@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def get_hazard_setting(name, default):
+    """Read a value from settings.OCEAN_HAZARD_SETTINGS with a fallback"""
+    return getattr(settings, 'OCEAN_HAZARD_SETTINGS', {}).get(name, default)
@@ -10,21 +10,44 @@ from django.contrib.auth.views import (
     PasswordResetConfirmView, PasswordResetCompleteView
 )
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q, Count
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.http import urlsafe_base64_decode
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
 
 # Third-party Imports
 import json
-from datetime import timedelta
+import os
+from datetime import datetime, timedelta
 
 # Local App Imports
 from .forms import CustomUserCreationForm, LoginForm, HazardReportForm, ReportFilterForm
-from .models import UserProfile, HazardReport, HazardMedia
+from .models import UserProfile, HazardReport, HazardReportTombstone, HazardMedia, MediaUpload
+from .geocoding import provisional_location_name
+from .geocode_cache import geocode_cache
+from .gazetteer import lookup_location_name
+from .bulk_ingest import ingest_reports
+from .notifications import enqueue_urgent_events
+from .roles import get_user_role
+from .clustering import all_clusters, cluster_points, public_clusters
+from .counters import day_key, month_key, read_counters
+from .changelog import ChangelogPruned, changes_after, latest_sequence, tracked_models
+from .events import event_stream
+from .pagination import InvalidPageCursor, KeysetPaginator
+from .rollups import DIMENSIONS, bucket_start, trend_series
+from .search import search as search_index
+from .spatial import apply_spatial_filters, distance_km, parse_bbox, within_radius
+from .sync import InvalidCursor, SyncCursor, changes_since, needs_full_resync
+from .utils import get_hazard_setting
+from .versions import versioned
+from .uploads import UploadError, append_chunk, attach_existing_content, validate_new_upload
 from analyst.models import Report, ReportComment
 from analyst import views as analysis_views
 
@@ -39,45 +62,8 @@ ADMIN_DASHBOARD = 'verify_wallet'
 
 def check_user_type(user, required_type):
     """Helper function to check if user has the required user type"""
-    try:
-        profile = UserProfile.objects.get(user=user)
-        return profile.user_type == required_type
-    except UserProfile.DoesNotExist:
-        return False
-
-def get_location_name(latitude, longitude):
-    """Reverse geocode coordinates to get location name using OpenStreetMap Nominatim"""
-    try:
-        import requests
-        url = "https://nominatim.openstreetmap.org/reverse"
-        params = {
-            'lat': latitude,
-            'lon': longitude,
-            'format': 'json',
-            'addressdetails': 1
-        }
-        headers = {
-            'User-Agent': 'OceanHazardSystem/1.0'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if 'display_name' in data:
-                return data['display_name'][:255]
-        
-    except Exception as e:
-        print(f"Geocoding error: {e}")
-    
-    return f"Lat: {latitude:.4f}, Lng: {longitude:.4f}"
-
-def send_urgent_notification(report):
-    """Send notifications for urgent reports"""
-    try:
-        print(f"URGENT REPORT: {report.report_id} - {report.hazard_type} at {report.location_name}")
-        # Email implementation can be added here
-    except Exception as e:
-        print(f"Notification error: {e}")
+    # Resolved once per request by UserRoleMiddleware and cached in the session
+    return get_user_role(user) == required_type
 
 # ============================================================================
 # BASIC VIEWS
@@ -96,15 +82,14 @@ def menu(request):
 def user_login(request):
     """Handle user login with role-based redirection"""
     if request.user.is_authenticated:
-        try:
-            profile = UserProfile.objects.get(user=request.user)
-            if profile.user_type == 'analyst':
-                return redirect(ANALYST_DASHBOARD)
-            elif profile.user_type == 'reporter':
-                return redirect(REPORTER_DASHBOARD)
-            elif profile.user_type == 'admin':
-                return redirect(ADMIN_DASHBOARD)
-        except UserProfile.DoesNotExist:
+        user_type = get_user_role(request.user)
+        if user_type == 'analyst':
+            return redirect(ANALYST_DASHBOARD)
+        elif user_type == 'reporter':
+            return redirect(REPORTER_DASHBOARD)
+        elif user_type == 'admin':
+            return redirect(ADMIN_DASHBOARD)
+        elif user_type is None:
             messages.error(request, 'User profile not found. Please contact administrator.')
             logout(request)
             return redirect('login')
@@ -118,22 +103,21 @@ def user_login(request):
 
         if user is not None:
             login(request, user)
-            try:
-                profile = UserProfile.objects.get(user=user)
-                if profile.user_type == 'analyst':
-                    return redirect(ANALYST_DASHBOARD)
-                elif profile.user_type == 'reporter':
-                    return redirect(REPORTER_DASHBOARD)
-                elif profile.user_type == 'admin':
-                    return redirect(ADMIN_DASHBOARD)
-                else:
-                    messages.error(request, 'Invalid user type.')
-                    logout(request)
-                    return redirect('login')
-            except UserProfile.DoesNotExist:
+            user_type = get_user_role(user)
+            if user_type == 'analyst':
+                return redirect(ANALYST_DASHBOARD)
+            elif user_type == 'reporter':
+                return redirect(REPORTER_DASHBOARD)
+            elif user_type == 'admin':
+                return redirect(ADMIN_DASHBOARD)
+            elif user_type is None:
                 messages.error(request, 'User profile not found. Please contact administrator.')
                 logout(request)
                 return redirect('login')
+            else:
+                messages.error(request, 'Invalid user type.')
+                logout(request)
+                return redirect('login')
         else:
             messages.error(request, 'Invalid username or password.')
 
@@ -199,29 +183,24 @@ def admin_dashboard(request):
     
     profile = UserProfile.objects.get(user=request.user)
     
-    # User statistics
-    total_users = User.objects.count()
-    analyst_count = UserProfile.objects.filter(user_type='analyst').count()
-    reporter_count = UserProfile.objects.filter(user_type='reporter').count()
-    admin_count = UserProfile.objects.filter(user_type='admin').count()
-    
-    # Report statistics
-    total_reports = HazardReport.objects.count()
-    pending_reports = HazardReport.objects.filter(status='pending').count()
-    critical_reports = HazardReport.objects.filter(severity='critical').count()
-    today_reports = HazardReport.objects.filter(created_at__date=timezone.now().date()).count()
+    # User and report statistics, precomputed in the counters table
+    today = f'reports:day:{day_key(timezone.now())}'
+    counts = read_counters([
+        'users:total', 'profiles:analyst', 'profiles:reporter', 'profiles:admin',
+        'reports:total', 'reports:status:pending', 'reports:severity:critical', today,
+    ])
     
     context = {
         'user': request.user,
         'profile': profile,
-        'total_users': total_users,
-        'analyst_count': analyst_count,
-        'reporter_count': reporter_count,
-        'admin_count': admin_count,
-        'total_reports': total_reports,
-        'pending_reports': pending_reports,
-        'critical_reports': critical_reports,
-        'today_reports': today_reports,
+        'total_users': counts['users:total'],
+        'analyst_count': counts['profiles:analyst'],
+        'reporter_count': counts['profiles:reporter'],
+        'admin_count': counts['profiles:admin'],
+        'total_reports': counts['reports:total'],
+        'pending_reports': counts['reports:status:pending'],
+        'critical_reports': counts['reports:severity:critical'],
+        'today_reports': counts[today],
         'show_satellite_link': True,
     }
     return render(request, 'login/admin_dashboard.html', context)
@@ -249,15 +228,16 @@ def submit_hazard_report(request):
                 report = form.save(commit=False)
                 report.reporter = request.user
                 
-                # Reverse geocode location
-                try:
-                    latitude = float(form.cleaned_data['latitude'])
-                    longitude = float(form.cleaned_data['longitude'])
-                    report.location_name = get_location_name(latitude, longitude)
-                except:
-                    report.location_name = f"Lat: {report.latitude}, Lng: {report.longitude}"
+                # Save with a provisional name right away; the geocode_reports
+                # worker resolves the place name in the background
+                report.location_name = provisional_location_name(report.latitude, report.longitude)
+                report.geocode_status = 'pending'
                 
-                report.save()
+                # Urgent reports get an outbox event in the same transaction;
+                # dispatch_notifications emails subscribers outside the request
+                with transaction.atomic():
+                    report.save()
+                    enqueue_urgent_events([report])
                 
                 # Handle file uploads
                 files = request.FILES.getlist('media_files')
@@ -283,9 +263,6 @@ def submit_hazard_report(request):
                         print(f"Error uploading file {file.name}: {str(e)}")
                         continue
                 
-                if report.urgent:
-                    send_urgent_notification(report)
-                
                 is_ajax = request.headers.get('Content-Type') == 'application/json' or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
                 if is_ajax:
                     return JsonResponse({
@@ -336,7 +313,10 @@ def my_reports(request):
         messages.error(request, 'Access denied.')
         return redirect('login')
     
-    reports = HazardReport.objects.filter(reporter=request.user)
+    # Attachment counts ride along with each row instead of two queries per card
+    media_count = HazardMedia.objects.filter(report=OuterRef('pk')).order_by().values('report').annotate(n=Count('pk')).values('n')
+    reports = HazardReport.objects.filter(reporter=request.user).annotate(media_count=Coalesce(Subquery(media_count), 0))
+    ordering = ('-created_at', '-id')
     
     # Apply filters
     filter_form = ReportFilterForm(request.GET or None)
@@ -365,21 +345,18 @@ def my_reports(request):
         if status != 'all':
             reports = reports.filter(status=status)
         if search:
-            reports = reports.filter(
-                Q(description__icontains=search) |
-                Q(location_name__icontains=search) |
-                Q(report_id__icontains=search)
-            )
+            reports = search_index(reports, search, ['description', 'location_name', 'report_id'])
+            ordering = ('-search_rank', '-created_at', '-id')
     
     # Pagination
-    paginator = Paginator(reports, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(reports, 10, ordering=ordering)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'reports': page_obj,
         'filter_form': filter_form,
-        'total_reports': reports.count(),
+        'total_reports': paginator.count,
+        'total_is_estimate': paginator.count_is_estimate,
     }
     return render(request, 'my_reports.html', context)
 
@@ -428,6 +405,112 @@ def update_report_status(request, report_id):
     
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
+# ============================================================================
+# RESUMABLE MEDIA UPLOADS
+# ============================================================================
+
+def _upload_state(upload):
+    data = {
+        'upload_id': str(upload.upload_id),
+        'report_id': upload.report.report_id,
+        'file_name': upload.file_name,
+        'total_size': upload.total_size,
+        'received_bytes': upload.received_bytes,
+        'status': upload.status,
+    }
+    if upload.status == 'complete':
+        data['sha256'] = upload.sha256
+        data['media_id'] = upload.media_id
+        if upload.media is not None:
+            data['media'] = upload.media.rendition_urls()
+    return data
+
+@login_required
+def bulk_ingest_reports(request):
+    """Create many reports from an NDJSON body (one report object per line)"""
+    if not check_user_type(request.user, 'reporter'):
+        return JsonResponse({'error': 'Access denied. You do not have reporter permissions.'}, status=403)
+    
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST method allowed'}, status=405)
+    
+    # The body is read line by line rather than loaded whole
+    results, created = ingest_reports(request.user, request)
+    
+    counts = {'created': 0, 'duplicate': 0, 'invalid': 0}
+    for result in results:
+        counts[result['status']] += 1
+    
+    return JsonResponse({'success': counts['invalid'] == 0, **counts, 'results': results})
+
+@login_required
+def create_media_upload(request):
+    """Start a resumable upload for a file attached to one of the user's reports"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Only POST method allowed'}, status=405)
+    
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    else:
+        payload = request.POST
+    
+    report = get_object_or_404(HazardReport, report_id=payload.get('report_id'), reporter=request.user)
+    file_name = os.path.basename(str(payload.get('file_name', '')).strip())
+    try:
+        total_size = int(payload.get('size'))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'size is required'}, status=400)
+    
+    if not file_name:
+        return JsonResponse({'error': 'file_name is required'}, status=400)
+    
+    try:
+        validate_new_upload(report, file_name, total_size)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    
+    upload = MediaUpload.objects.create(
+        uploader=request.user,
+        report=report,
+        file_name=file_name,
+        total_size=total_size,
+        expected_sha256=str(payload.get('sha256', '')).lower()[:64],
+    )
+    # The user already attached this content to another report: no bytes need to be sent
+    attach_existing_content(upload)
+    return JsonResponse(_upload_state(upload), status=201)
+
+@login_required
+def media_upload_detail(request, upload_id):
+    """GET returns the resume offset; PUT appends the chunk at the Upload-Offset header"""
+    upload = get_object_or_404(
+        MediaUpload.objects.select_related('report'), upload_id=upload_id, uploader=request.user
+    )
+    
+    if request.method == 'GET':
+        return JsonResponse(_upload_state(upload))
+    
+    if request.method != 'PUT':
+        return JsonResponse({'error': 'Only GET and PUT methods allowed'}, status=405)
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.headers.get('Content-Length', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Upload-Offset and Content-Length headers are required'}, status=400)
+    
+    try:
+        upload = append_chunk(upload, offset, request, length, request.headers.get('Upload-Checksum-Sha256', ''))
+    except UploadError as e:
+        data = _upload_state(upload)
+        data['error'] = str(e)
+        return JsonResponse(data, status=e.status)
+    
+    return JsonResponse(_upload_state(upload))
+
 # ============================================================================
 # ANALYST REPORT VIEWS (Admin Management)
 # ============================================================================
@@ -464,21 +547,17 @@ def admin_view_analyst_reports(request):
         month_ago = timezone.now() - timedelta(days=30)
         reports = reports.filter(created_at__gte=month_ago)
     
+    # Grouped by status, newest first within each status; best matches first when searching
+    ordering = ('status', '-created_at', '-id')
     if search_query:
-        reports = reports.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(created_by__username__icontains=search_query) |
-            Q(created_by__first_name__icontains=search_query) |
-            Q(created_by__last_name__icontains=search_query)
-        )
-    
-    reports = reports.order_by('status', '-created_at')
+        reports = search_index(reports, search_query, [
+            'title', 'description', 'created_by__username', 'created_by__first_name', 'created_by__last_name',
+        ])
+        ordering = ('-search_rank', '-created_at', '-id')
     
     # Pagination
-    paginator = Paginator(reports, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(reports, 12, ordering=ordering)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     # Statistics
     total_reports = Report.objects.count()
@@ -580,12 +659,14 @@ def view_all_reports(request):
 # ============================================================================
 
 @login_required
+@versioned(HazardReport, rolling=lambda request: request.GET.get('time_filter') == 'week')
 def map_data_api(request):
     """API endpoint for map data"""
+    # Every row shows its reporter's name; join instead of a query per row
     if check_user_type(request.user, 'admin') or check_user_type(request.user, 'analyst'):
-        reports = HazardReport.objects.all()
+        reports = HazardReport.objects.select_related('reporter')
     else:
-        reports = HazardReport.objects.filter(status='verified')
+        reports = HazardReport.objects.filter(status='verified').select_related('reporter')
     
     # Apply filters
     time_filter = request.GET.get('time_filter', 'all')
@@ -604,9 +685,33 @@ def map_data_api(request):
     if severity != 'all':
         reports = reports.filter(severity=severity)
     
+    try:
+        reports, near = apply_spatial_filters(reports, request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if request.GET.get('zoom'):
+        return _map_clusters_response(request, reports, near, time_filter, hazard_type, severity)
+    
+    page = None
+    if request.GET.get('limit') or request.GET.get('cursor'):
+        try:
+            limit = int(request.GET.get('limit') or get_hazard_setting('MAP_DATA_PAGE_SIZE', 500))
+        except ValueError:
+            return JsonResponse({'error': 'limit must be an integer'}, status=400)
+        limit = max(1, min(limit, get_hazard_setting('MAP_DATA_MAX_PAGE_SIZE', 2000)))
+        paginator = KeysetPaginator(reports, limit)
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidPageCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        reports = page.object_list
+    
+    matches = within_radius(reports, near) if near else ((report, None) for report in reports)
+    
     # Format data for map
     map_data = []
-    for report in reports:
+    for report, distance in matches:
         map_data.append({
             'id': report.report_id,
             'lat': float(report.latitude),
@@ -619,38 +724,293 @@ def map_data_api(request):
             'urgent': report.urgent,
             'reporter': report.reporter.get_full_name() or report.reporter.username,
         })
+        if distance is not None:
+            map_data[-1]['distance_km'] = round(distance, 2)
+    
+    if page is None:
+        return JsonResponse({'reports': map_data})
     
-    return JsonResponse({'reports': map_data})
+    # Within a radius, a page holds the page's rows that fall inside the circle
+    response = {'reports': map_data, 'next_cursor': page.next_cursor, 'previous_cursor': page.previous_cursor}
+    if request.GET.get('include_total') == '1':
+        response['total'] = paginator.count
+        response['total_is_estimate'] = paginator.count_is_estimate
+    return JsonResponse(response)
+
+def _map_clusters_response(request, reports, near, time_filter, hazard_type, severity):
+    """Clusters for one zoom level and viewport instead of individual points"""
+    try:
+        zoom = int(request.GET['zoom'])
+    except ValueError:
+        return JsonResponse({'error': 'zoom must be an integer'}, status=400)
+    # Zooming in past the deepest level shows that level's clusters
+    zoom = max(get_hazard_setting('CLUSTER_MIN_ZOOM', 0), min(zoom, get_hazard_setting('CLUSTER_MAX_ZOOM', 16)))
+    try:
+        bbox = parse_bbox(request.GET['bbox']) if request.GET.get('bbox') else None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    unfiltered = time_filter == 'all' and hazard_type == 'all' and severity == 'all' and near is None
+    if unfiltered:
+        # The common case reads the incrementally maintained index
+        can_see_all = check_user_type(request.user, 'admin') or check_user_type(request.user, 'analyst')
+        clusters = (all_clusters if can_see_all else public_clusters).get().clusters(zoom, bbox)
+    else:
+        points = reports.values_list('report_id', 'latitude', 'longitude', 'severity', 'urgent')
+        if near:
+            latitude, longitude, radius_km = near
+            points = [
+                point for point in points
+                if distance_km(latitude, longitude, float(point[1]), float(point[2])) <= radius_km
+            ]
+        clusters = cluster_points(points, zoom, bbox)
+    
+    return JsonResponse({'zoom': zoom, 'clusters': clusters, 'total': sum(cluster['count'] for cluster in clusters)})
+
+def _sync_record(report, include_private):
+    record = {
+        'id': report.report_id,
+        'lat': float(report.latitude),
+        'lng': float(report.longitude),
+        'hazard_type': report.hazard_type,
+        'severity': report.severity,
+        'status': report.status,
+        'urgent': report.urgent,
+        'location_name': report.location_name,
+        'description': report.description,
+        'created_at': report.created_at.isoformat(),
+        'updated_at': report.updated_at.isoformat(),
+    }
+    if include_private:
+        record['admin_notes'] = report.admin_notes
+        record['verified_at'] = report.verified_at.isoformat() if report.verified_at else None
+    else:
+        record['reporter'] = report.reporter.get_full_name() or report.reporter.username
+    return record
 
 @login_required
+def sync_reports_api(request):
+    """Delta sync: reports changed and deleted since the client's cursor"""
+    scope = request.GET.get('scope', 'mine')
+    try:
+        cursor = SyncCursor.decode(request.GET.get('cursor', ''))
+        limit = min(
+            int(request.GET.get('limit', get_hazard_setting('SYNC_PAGE_SIZE', 200))),
+            get_hazard_setting('SYNC_MAX_PAGE_SIZE', 1000),
+        )
+    except (InvalidCursor, ValueError):
+        return JsonResponse({'error': 'Invalid cursor or limit'}, status=400)
+    
+    if needs_full_resync(cursor):
+        return JsonResponse({'full_resync': True, 'error': 'Cursor expired; sync again without a cursor'}, status=410)
+    
+    is_visible = None
+    if scope == 'mine':
+        reports = HazardReport.objects.filter(reporter=request.user)
+        tombstones = HazardReportTombstone.objects.filter(reporter_id=request.user.id)
+    elif scope == 'map':
+        reports = HazardReport.objects.select_related('reporter')
+        tombstones = HazardReportTombstone.objects.all()
+        if not (check_user_type(request.user, 'admin') or check_user_type(request.user, 'analyst')):
+            # Reports that leave 'verified' must disappear from the client's map
+            is_visible = lambda report: report.status == 'verified'
+    else:
+        return JsonResponse({'error': 'scope must be mine or map'}, status=400)
+    
+    changed, removed, next_cursor, has_more = changes_since(reports, tombstones, cursor, max(limit, 1), is_visible)
+    return JsonResponse({
+        'changed': [_sync_record(report, scope == 'mine') for report in changed],
+        'removed': removed,
+        'cursor': next_cursor.encode(),
+        'has_more': has_more,
+    })
+
+@login_required
+def changes_api(request):
+    """Changelog entries after sequence ?since= (analysts/admins); optional models=app.model,..."""
+    if not (check_user_type(request.user, 'admin') or check_user_type(request.user, 'analyst')):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    try:
+        since = max(int(request.GET.get('since') or 0), 0)
+        limit = min(
+            int(request.GET.get('limit', get_hazard_setting('CHANGELOG_PAGE_SIZE', 500))),
+            get_hazard_setting('CHANGELOG_MAX_PAGE_SIZE', 5000),
+        )
+    except ValueError:
+        return JsonResponse({'error': 'since and limit must be integers'}, status=400)
+    
+    models = [label for label in request.GET.get('models', '').split(',') if label]
+    known = {model._meta.label_lower for model in tracked_models()}
+    if not set(models) <= known:
+        return JsonResponse({'error': f"models must be among {', '.join(sorted(known))}"}, status=400)
+    
+    try:
+        entries, next_since, has_more = changes_after(since, max(limit, 1), models)
+    except ChangelogPruned:
+        return JsonResponse({
+            'full_resync': True, 'latest': latest_sequence(),
+            'error': 'Entries after this sequence were pruned; re-read the tables, then follow from latest',
+        }, status=410)
+    
+    return JsonResponse({
+        'changes': [
+            {
+                'seq': entry.pk,
+                'model': entry.model,
+                'id': entry.object_id,
+                'action': entry.action,
+                'changed_at': entry.changed_at.isoformat(),
+                'data': entry.data,
+            }
+            for entry in entries
+        ],
+        'next_since': next_since,
+        'has_more': has_more,
+    })
+
+@login_required
+@versioned(HazardReport)
 def dashboard_stats_api(request):
     """API endpoint for dashboard statistics"""
+    # Precomputed in the counters table: one query per poll
     if check_user_type(request.user, 'reporter'):
-        user_reports = HazardReport.objects.filter(reporter=request.user)
-        stats = {
-            'total_reports': user_reports.count(),
-            'this_month': user_reports.filter(
-                created_at__month=timezone.now().month,
-                created_at__year=timezone.now().year
-            ).count(),
-            'verified': user_reports.filter(status='verified').count(),
-            'pending': user_reports.filter(status='pending').count(),
+        prefix = f'reporter:{request.user.pk}'
+        names = {
+            'total_reports': f'{prefix}:total',
+            'this_month': f'{prefix}:month:{month_key(timezone.now())}',
+            'verified': f'{prefix}:status:verified',
+            'pending': f'{prefix}:status:pending',
         }
     elif check_user_type(request.user, 'analyst') or check_user_type(request.user, 'admin'):
-        all_reports = HazardReport.objects.all()
-        stats = {
-            'total_reports': all_reports.count(),
-            'today': all_reports.filter(created_at__date=timezone.now().date()).count(),
-            'pending': all_reports.filter(status='pending').count(),
-            'verified': all_reports.filter(status='verified').count(),
-            'critical': all_reports.filter(severity='critical', status='pending').count(),
-            'urgent': all_reports.filter(urgent=True, status='pending').count(),
+        names = {
+            'total_reports': 'reports:total',
+            'today': f'reports:day:{day_key(timezone.now())}',
+            'pending': 'reports:status:pending',
+            'verified': 'reports:status:verified',
+            'critical': 'reports:critical_pending',
+            'urgent': 'reports:urgent_pending',
         }
     else:
-        stats = {}
+        names = {}
+    counts = read_counters(list(names.values())) if names else {}
+    stats = {key: counts[name] for key, name in names.items()}
     
     return JsonResponse(stats)
 
+def _parse_trend_bound(value):
+    """Aware datetime from an ISO date or datetime query parameter"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, datetime.min.time())
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+@login_required
+def trends_api(request):
+    """Report counts per hour or day, served from the rollup tables (analysts/admins)"""
+    if not (check_user_type(request.user, 'admin') or check_user_type(request.user, 'analyst')):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    granularity = request.GET.get('granularity', 'day')
+    if granularity not in ('hour', 'day'):
+        return JsonResponse({'error': 'granularity must be hour or day'}, status=400)
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+    
+    try:
+        end = _parse_trend_bound(request.GET['end']) if request.GET.get('end') else timezone.now() + step
+        start = _parse_trend_bound(request.GET['start']) if request.GET.get('start') else end - step * (48 if granularity == 'hour' else 30)
+    except ValueError:
+        return JsonResponse({'error': 'start and end must be ISO dates or datetimes'}, status=400)
+    start, end = bucket_start(start, granularity), bucket_start(end, granularity)
+    if end <= start:
+        return JsonResponse({'error': 'end must be after start'}, status=400)
+    if (end - start) / step > get_hazard_setting('TRENDS_MAX_BUCKETS', 2000):
+        return JsonResponse({'error': 'Time range too long for this granularity'}, status=400)
+    
+    group_by = [name for name in request.GET.get('group_by', '').split(',') if name]
+    filters = {name: request.GET[name] for name in DIMENSIONS if name in request.GET}
+    try:
+        series = trend_series(granularity, start, end, group_by, **filters)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    for row in series:
+        row['bucket'] = timezone.localtime(row['bucket']).isoformat()
+    return JsonResponse({
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group_by': group_by,
+        'filters': filters,
+        'series': series,
+    })
+
+@login_required
+@require_GET
+def report_events(request):
+    """Server-Sent Events stream of status changes for the given reports.
+
+    ?report=<id> (analyst reports) and ?hazard_report=<report_id> may repeat;
+    ?mine=1 follows every report the user authored. One connection replaces
+    polling the status API per report.
+    """
+    is_staff_role = check_user_type(request.user, 'admin') or check_user_type(request.user, 'analyst')
+    report_ids = request.GET.getlist('report')
+    hazard_ids = request.GET.getlist('hazard_report')
+    if len(report_ids) + len(hazard_ids) > get_hazard_setting('SSE_MAX_REPORTS', 200):
+        return JsonResponse({'error': 'Too many reports in one stream'}, status=400)
+    
+    try:
+        reports = Report.objects.filter(pk__in=[int(pk) for pk in report_ids])
+    except ValueError:
+        return JsonResponse({'error': 'report must be an integer'}, status=400)
+    if not check_user_type(request.user, 'admin'):
+        reports = reports.filter(Q(created_by=request.user) | Q(submitted_to=request.user))
+    hazard_reports = HazardReport.objects.filter(report_id__in=hazard_ids)
+    if not is_staff_role:
+        hazard_reports = hazard_reports.filter(reporter=request.user)
+    
+    channels = [f'report:{pk}' for pk in reports.values_list('pk', flat=True)]
+    channels += [f'hazard-report:{report_id}' for report_id in hazard_reports.values_list('report_id', flat=True)]
+    if len(channels) < len(set(report_ids)) + len(set(hazard_ids)):
+        return JsonResponse({'error': 'Report not found'}, status=404)
+    if request.GET.get('mine') == '1':
+        channels += [f'report-author:{request.user.pk}', f'hazard-reporter:{request.user.pk}']
+    if not channels:
+        return JsonResponse({'error': 'Nothing to subscribe to'}, status=400)
+    
+    frames = event_stream(
+        channels, request.headers.get('Last-Event-ID'), asynchronous=isinstance(request, ASGIRequest)
+    )
+    response = StreamingHttpResponse(frames, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+def reverse_geocode_api(request):
+    """Resolve coordinates from the geocode cache or the offline gazetteer"""
+    try:
+        latitude = float(request.GET.get('lat'))
+        longitude = float(request.GET.get('lng'))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'lat and lng are required'}, status=400)
+    
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return JsonResponse({'error': 'Invalid coordinates'}, status=400)
+    
+    location_name = geocode_cache.get(latitude, longitude)
+    source = 'cache'
+    if location_name is None:
+        location_name = lookup_location_name(latitude, longitude)
+        source = 'gazetteer' if location_name else None
+    
+    return JsonResponse({'location_name': location_name, 'source': source})
+
 # ============================================================================
 # WALLET MANAGEMENT
 # ============================================================================
@@ -1,5 +1,8 @@
 from django.contrib import admin
 from .models import SatelliteReading, OceanHazard
+from login.changelog import record_updates
+from visualizer.live import publish_ocean_hazard_updates
+from visualizer.tiles import invalidate_queryset
 
 # ============================================================================
 # ADMIN CLASS DEFINITIONS
@@ -64,13 +67,21 @@ class OceanHazardAdmin(admin.ModelAdmin):
     
     def mark_inactive(self, request, queryset):
         """Mark selected hazards as inactive"""
+        invalidate_queryset('ocean-hazards', queryset)
+        pks = list(queryset.values_list('pk', flat=True))
         queryset.update(is_active=False)
+        publish_ocean_hazard_updates(pks)
+        record_updates(OceanHazard, pks)
         self.message_user(request, f"{queryset.count()} hazards marked as inactive.")
     mark_inactive.short_description = "Mark selected hazards as inactive"
     
     def mark_active(self, request, queryset):
         """Mark selected hazards as active"""
+        invalidate_queryset('ocean-hazards', queryset)
+        pks = list(queryset.values_list('pk', flat=True))
         queryset.update(is_active=True)
+        publish_ocean_hazard_updates(pks)
+        record_updates(OceanHazard, pks)
         self.message_user(request, f"{queryset.count()} hazards marked as active.")
     mark_active.short_description = "Mark selected hazards as active"
 
@@ -18,6 +18,24 @@ class INCOISSatelliteMap {
         this.setupEventListeners();
         this.loadInitialData();
         this.startHealthCheck();
+        this.connectLiveFeed();
+    }
+
+    // Report counts follow the live feed instead of the refresh timer
+    connectLiveFeed() {
+        if (typeof LiveFeed === 'undefined') return;
+
+        this.liveFeed = new LiveFeed({
+            kinds: ['hazard_report'],
+            onEntry: () => this.scheduleStatsUpdate(),
+            onResync: () => this.scheduleStatsUpdate(),
+        });
+    }
+
+    // One stats request per burst of pushed changes
+    scheduleStatsUpdate() {
+        clearTimeout(this.statsUpdateTimer);
+        this.statsUpdateTimer = setTimeout(() => this.updateDashboardStats(), 1000);
     }
 
     setupEventListeners() {
@@ -208,7 +226,9 @@ class INCOISSatelliteMap {
 
         this.autoRefreshInterval = setInterval(() => {
             this.refreshAllMaps();
-            this.updateDashboardStats();
+            if (!this.liveFeed) {
+                this.updateDashboardStats();
+            }
         }, intervalMs);
 
         this.isAutoRefreshActive = true;
@@ -304,9 +324,9 @@ class INCOISSatelliteMap {
 
     updateStatCards(stats) {
         const statElements = {
-            'recent_reports': stats.today_reports,
-            'critical_reports': stats.critical_reports,
-            'unverified_reports': stats.pending_reports,
+            'recent_reports': stats.today,
+            'critical_reports': stats.critical,
+            'unverified_reports': stats.pending,
             'total_reports': stats.total_reports
         };
 
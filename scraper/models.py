@@ -43,6 +43,12 @@ class ExtractedInfo(models.Model):
     related_posts = models.ManyToManyField('SocialMediaPost', related_name='extractions')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination in ExtractedInfoListView
+            models.Index(fields=['created_at', 'id']),
+        ]
+
 
     def keyword_list(self):
         """Return keywords as a list, stripping spaces."""
@@ -24,6 +24,33 @@ locations = [
     "Port Blair", "Agatti", "Kavaratti"
 ]
 
+# Approximate coordinates and state/UT for each location, used to seed the
+# offline gazetteer in login/gazetteer.py
+location_coordinates = {
+    "Kolkata": (22.5726, 88.3639, "West Bengal"),
+    "Digha": (21.6266, 87.5074, "West Bengal"),
+    "Puri": (19.8135, 85.8312, "Odisha"),
+    "Paradip": (20.3164, 86.6085, "Odisha"),
+    "Visakhapatnam": (17.6868, 83.2185, "Andhra Pradesh"),
+    "Kakinada": (16.9891, 82.2475, "Andhra Pradesh"),
+    "Chennai": (13.0827, 80.2707, "Tamil Nadu"),
+    "Thoothukudi": (8.7642, 78.1348, "Tamil Nadu"),
+    "Nagapattinam": (10.7672, 79.8449, "Tamil Nadu"),
+    "Puducherry": (11.9416, 79.8083, "Puducherry"),
+    "Kandla": (23.0333, 70.2167, "Gujarat"),
+    "Dwarka": (22.2394, 68.9678, "Gujarat"),
+    "Mumbai": (19.0760, 72.8777, "Maharashtra"),
+    "Ratnagiri": (16.9902, 73.3120, "Maharashtra"),
+    "Panaji": (15.4909, 73.8278, "Goa"),
+    "Mangaluru": (12.9141, 74.8560, "Karnataka"),
+    "Kochi": (9.9312, 76.2673, "Kerala"),
+    "Alappuzha": (9.4981, 76.3388, "Kerala"),
+    "Thiruvananthapuram": (8.5241, 76.9366, "Kerala"),
+    "Port Blair": (11.6234, 92.7265, "Andaman and Nicobar Islands"),
+    "Agatti": (10.8590, 72.1760, "Lakshadweep"),
+    "Kavaratti": (10.5669, 72.6420, "Lakshadweep"),
+}
+
 def generate_queries():
     queries = [{'query':f"{hazard} {location}", 'location':location, 'hazard':hazard} for hazard in hazards for location in locations]
     return queries
\ No newline at end of file
@@ -1,3 +1,34 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from login.benchmarks import BenchmarkTestCase
+
+from .models import ExtractedInfo, SocialMediaPost
+
+
+class ExtractedInfoBenchmarks(BenchmarkTestCase):
+    scan_tables = ('scraper_extractedinfo', 'scraper_extractedinfo_related_posts')
+
+    @classmethod
+    def setUpTestData(cls):
+        posts = SocialMediaPost.objects.bulk_create([
+            SocialMediaPost(location='Chennai', hazard='flood', title=f'Post {i}', body='Water on the road', url='https://example.com/p')
+            for i in range(500)
+        ])
+        infos = ExtractedInfo.objects.bulk_create([
+            ExtractedInfo(
+                life_loss='0', infra_lost='none', hazard_type='coastal_flooding', intensity=1 + i % 10,
+                emotions='fear', hazard_description='Flooding reported', keywords='flood, tide',
+            )
+            for i in range(2000)
+        ])
+        Through = ExtractedInfo.related_posts.through
+        Through.objects.bulk_create([
+            Through(extractedinfo_id=info.pk, socialmediapost_id=posts[(index + offset) % len(posts)].pk)
+            for index, info in enumerate(infos) for offset in range(3)
+        ])
+
+    def test_extracted_info_list(self):
+        first = self.client.get(reverse('extracted_info_list'))
+        with self.benchmark('extracted_info_list (page 2)', 3):
+            response = self.client.get(reverse('extracted_info_list'), {'cursor': first.context['page_obj'].next_cursor})
+        self.assertEqual(len(response.context['extracted_infos']), 10)
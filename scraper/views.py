@@ -1,9 +1,18 @@
 from django.views.generic import ListView
+from login.pagination import KeysetPaginator
 from .models import ExtractedInfo
 
 class ExtractedInfoListView(ListView):
     model = ExtractedInfo
+    # The list shows each extraction's source posts
+    queryset = ExtractedInfo.objects.prefetch_related('related_posts')
     template_name = "extracted_info_list.html"
     context_object_name = "extracted_infos"
     paginate_by = 10  # Optional: show 10 per page
-    ordering = ['-created_at']  # Most recent first
\ No newline at end of file
+    ordering = ['-created_at', '-id']  # Most recent first
+
+    def paginate_queryset(self, queryset, page_size):
+        """Cursor pagination on (created_at, id) instead of COUNT + OFFSET"""
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.ordering)
+        page = paginator.get_page(self.request.GET.get('cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
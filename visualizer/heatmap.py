@@ -0,0 +1,226 @@
+# ============================================================================
+# visualizer/heatmap.py - Server-side heatmap density grids (NumPy)
+# ============================================================================
+
+import math
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from login.models import HazardReport
+from login.utils import get_hazard_setting
+
+HAZARD_TYPES = [value for value, _ in HazardReport.HAZARD_TYPES]
+SEVERITIES = [value for value, _ in HazardReport.SEVERITY_LEVELS]
+# Same weighting the dashboard applied client-side, indexed like SEVERITIES
+SEVERITY_WEIGHTS = np.array([0.3, 0.6, 1.0, 1.0])
+MODES = ('density', 'severity', 'time')
+# Recency weighting fades a report out over a week, as the dashboard did
+TIME_FADE_HOURS = 168
+
+# ============================================================================
+# GRID GEOMETRY
+# ============================================================================
+
+def grid_spec():
+    """(south, west, north, east, cell_degrees, rows, cols) of the heatmap grid"""
+    south, west, north, east = get_hazard_setting('HEATMAP_BOUNDS', (-15.0, 30.0, 35.0, 120.0))
+    cell = get_hazard_setting('HEATMAP_CELL_DEGREES', 0.25)
+    rows = math.ceil((north - south) / cell)
+    cols = math.ceil((east - west) / cell)
+    return south, west, north, east, cell, rows, cols
+
+
+def grid_cells(latitudes, longitudes, spec):
+    """Flat cell index per point (row 0 is the southern edge), -1 outside the grid"""
+    south, west, north, east, cell, rows, cols = spec
+    row = np.floor((latitudes - south) / cell).astype(np.int64)
+    col = np.floor((longitudes - west) / cell).astype(np.int64)
+    inside = (row >= 0) & (row < rows) & (col >= 0) & (col < cols)
+    return np.where(inside, row * cols + col, -1).astype(np.int32)
+
+
+def epoch_hours(datetimes):
+    return np.array([int(value.timestamp() // 3600) for value in datetimes], dtype=np.int32)
+
+# ============================================================================
+# INCREMENTAL INDEX
+# ============================================================================
+
+class HeatmapIndex:
+    """Columnar (cell, hazard type, severity, hour bucket) arrays for recent reports.
+
+    Reports are kept for HEATMAP_WINDOW_HOURS. Every grid is a single masked
+    np.bincount over these columns, so building one costs the same whatever
+    combination of hazard type, severity and time range is asked for. Like
+    login.clustering.LiveClusterIndex, refreshes only read reports whose
+    updated_at moved past a watermark, plus tombstones of deleted reports.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spec = None
+        self._slots = None
+        self._checked_at = 0.0
+        self._watermark = None
+
+    def _reset(self):
+        self._spec = grid_spec()
+        self._slots = {}
+        self.report_ids = np.empty(0, dtype=object)
+        self.cell = np.empty(0, dtype=np.int32)
+        self.hazard = np.empty(0, dtype=np.int8)
+        self.severity = np.empty(0, dtype=np.int8)
+        self.hour = np.empty(0, dtype=np.int32)
+        self.live = np.empty(0, dtype=bool)
+        self._grids = {}
+        self._grids_hour = None
+
+    def _upsert(self, rows):
+        if not rows:
+            return
+        report_ids, latitudes, longitudes, hazard_types, severities, created = zip(*rows)
+        cells = grid_cells(np.array(latitudes, dtype=float), np.array(longitudes, dtype=float), self._spec)
+        hazards = np.array([HAZARD_TYPES.index(value) if value in HAZARD_TYPES else -1 for value in hazard_types], dtype=np.int8)
+        levels = np.array([SEVERITIES.index(value) if value in SEVERITIES else -1 for value in severities], dtype=np.int8)
+        hours = epoch_hours(created)
+
+        # Overwrite the slots of reports we already hold, append the rest
+        existing = np.array([self._slots.get(report_id, -1) for report_id in report_ids])
+        known = existing >= 0
+        slots = existing[known]
+        self.cell[slots] = cells[known]
+        self.hazard[slots] = hazards[known]
+        self.severity[slots] = levels[known]
+        self.hour[slots] = hours[known]
+        self.live[slots] = cells[known] >= 0
+
+        new = ~known
+        start = len(self.cell)
+        for offset, report_id in enumerate(np.array(report_ids, dtype=object)[new]):
+            self._slots[report_id] = start + offset
+        self.report_ids = np.concatenate([self.report_ids, np.array(report_ids, dtype=object)[new]])
+        self.cell = np.concatenate([self.cell, cells[new]])
+        self.hazard = np.concatenate([self.hazard, hazards[new]])
+        self.severity = np.concatenate([self.severity, levels[new]])
+        self.hour = np.concatenate([self.hour, hours[new]])
+        self.live = np.concatenate([self.live, cells[new] >= 0])
+
+    def _remove(self, report_ids):
+        slots = [self._slots[report_id] for report_id in report_ids if report_id in self._slots]
+        self.live[slots] = False
+
+    def _expire(self, now_hour):
+        """Drop reports older than the window and compact once half the slots are dead"""
+        self.live &= self.hour > now_hour - get_hazard_setting('HEATMAP_WINDOW_HOURS', 720)
+        if len(self.live) and np.count_nonzero(self.live) < len(self.live) // 2:
+            keep = self.live
+            self.report_ids = self.report_ids[keep]
+            self.cell = self.cell[keep]
+            self.hazard = self.hazard[keep]
+            self.severity = self.severity[keep]
+            self.hour = self.hour[keep]
+            self.live = self.live[keep]
+            self._slots = {report_id: slot for slot, report_id in enumerate(self.report_ids)}
+
+    def refresh(self):
+        from login.models import HazardReportTombstone
+
+        fields = ('report_id', 'latitude', 'longitude', 'hazard_type', 'severity', 'created_at')
+        started = timezone.now()
+        window_start = started - timedelta(hours=get_hazard_setting('HEATMAP_WINDOW_HOURS', 720))
+        if self._slots is None or self._spec != grid_spec():
+            self._reset()
+            reports = HazardReport.objects.filter(created_at__gte=window_start)
+            self._upsert(list(reports.values_list(*fields).iterator(chunk_size=2000)))
+        else:
+            overlap = timedelta(seconds=get_hazard_setting('SYNC_SAFETY_LAG_SECONDS', 2))
+            since = self._watermark - overlap
+            changed = list(
+                HazardReport.objects.filter(updated_at__gte=since, created_at__gte=window_start).values_list(*fields)
+            )
+            deleted = list(HazardReportTombstone.objects.filter(deleted_at__gte=since).values_list('report_id', flat=True))
+            self._upsert(changed)
+            self._remove(deleted)
+            if changed or deleted:
+                self._grids = {}
+        self._expire(int(started.timestamp() // 3600))
+        self._watermark = started
+
+    def _ensure_fresh(self):
+        interval = get_hazard_setting('HEATMAP_REFRESH_SECONDS', 10)
+        if self._slots is None or time.monotonic() - self._checked_at >= interval:
+            self.refresh()
+            self._checked_at = time.monotonic()
+
+    def grid(self, mode='density', hazard_type=None, severity=None, hours=None):
+        """Dense float grid (rows * cols) for one combination of filters"""
+        with self._lock:
+            self._ensure_fresh()
+            now_hour = int(time.time() // 3600)
+            if self._grids_hour != now_hour:
+                # Time buckets and recency weights shift every hour
+                self._grids = {}
+                self._grids_hour = now_hour
+            key = (mode, hazard_type, severity, hours)
+            if key not in self._grids:
+                self._grids[key] = self._build(mode, hazard_type, severity, hours, now_hour)
+            return self._spec, self._grids[key]
+
+    def _build(self, mode, hazard_type, severity, hours, now_hour):
+        mask = self.live.copy()
+        if hazard_type:
+            mask &= self.hazard == HAZARD_TYPES.index(hazard_type)
+        if severity:
+            mask &= self.severity == SEVERITIES.index(severity)
+        if hours:
+            mask &= self.hour > now_hour - hours
+
+        weights = None
+        if mode == 'severity':
+            weights = SEVERITY_WEIGHTS[self.severity[mask]]
+        elif mode == 'time':
+            weights = np.clip(1 - (now_hour - self.hour[mask]) / TIME_FADE_HOURS, 0.1, 1.0)
+        rows, cols = self._spec[5], self._spec[6]
+        return np.bincount(self.cell[mask], weights=weights, minlength=rows * cols).astype(np.float32)
+
+
+report_heatmap = HeatmapIndex()
+
+# ============================================================================
+# SERIALIZATION
+# ============================================================================
+
+def heatmap_payload(mode='density', hazard_type=None, severity=None, hours=None, bbox=None):
+    """Sparse grid: flat indices and values of the non-empty cells"""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    if hazard_type and hazard_type not in HAZARD_TYPES:
+        raise ValueError("Unknown hazard_type")
+    if severity and severity not in SEVERITIES:
+        raise ValueError("Unknown severity")
+
+    spec, grid = report_heatmap.grid(mode, hazard_type or None, severity or None, hours)
+    south, west, north, east, cell, rows, cols = spec
+    cells = np.flatnonzero(grid)
+    if bbox is not None:
+        box_south, box_west, box_north, box_east = bbox
+        row, col = cells // cols, cells % cols
+        cells = cells[
+            (row >= math.floor((box_south - south) / cell)) & (row <= math.floor((box_north - south) / cell))
+            & (col >= math.floor((box_west - west) / cell)) & (col <= math.floor((box_east - west) / cell))
+        ]
+    values = grid[cells].astype(float)
+    return {
+        'mode': mode,
+        'bounds': [south, west, north, east],
+        'cell_degrees': cell,
+        'shape': [rows, cols],
+        'max': round(float(values.max()), 3) if len(values) else 0,
+        'cells': cells.tolist(),
+        'values': np.round(values, 3).tolist(),
+        'query': {'hazard_type': hazard_type or '', 'severity': severity or '', 'hours': hours or ''},
+    }
@@ -0,0 +1,299 @@
+# ============================================================================
+# visualizer/live.py - WebSocket live feed of hazard reports, ocean hazards and buoy readings
+# ============================================================================
+
+import asyncio
+import json
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http.cookie import parse_cookie
+from django.http.request import split_domain_port, validate_host
+
+from login.events import AsyncSubscription, get_broker, publish_on_commit
+from login.roles import get_user_role
+from login.spatial import parse_bbox
+from login.utils import get_hazard_setting
+
+LIVE_FEED_PATH = '/ws/live/'
+LIVE_CHANNEL = 'live-feed'
+KINDS = ('hazard_report', 'ocean_hazard', 'buoy_reading')
+
+# Roles that see reports in every status; everyone else only sees verified ones
+STAFF_ROLES = ('admin', 'analyst')
+
+# ============================================================================
+# PAYLOADS
+# ============================================================================
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def hazard_report_event(report, was_public=False, deleted=False):
+    """Feed entry for a HazardReport; ``was_public`` if viewers without a staff role could see it before"""
+    description = report.description or ''
+    return {
+        'kind': 'hazard_report',
+        'id': report.report_id,
+        'lat': float(report.latitude),
+        'lng': float(report.longitude),
+        'hazard_type': report.hazard_type,
+        'hazard_type_display': report.get_hazard_type_display(),
+        'severity': report.severity,
+        'status': report.status,
+        'description': description[:100] + '...' if len(description) > 100 else description,
+        'location': report.location_name or '',
+        'time': _isoformat(report.created_at),
+        'urgent': report.urgent,
+        'was_public': was_public,
+        'deleted': deleted,
+    }
+
+
+def ocean_hazard_event(hazard, deleted=False):
+    return {
+        'kind': 'ocean_hazard',
+        'id': hazard.pk,
+        'lat': hazard.latitude,
+        'lng': hazard.longitude,
+        'hazard_type': hazard.hazard_type,
+        'hazard_type_display': hazard.get_hazard_type_display(),
+        'severity': hazard.severity,
+        'location': hazard.location_name,
+        'description': hazard.description,
+        'time': _isoformat(hazard.timestamp),
+        'active': hazard.is_active,
+        'deleted': deleted,
+    }
+
+
+def buoy_reading_event(reading):
+    buoy = reading.buoy
+    return {
+        'kind': 'buoy_reading',
+        'id': reading.pk,
+        'buoy_id': buoy.buoy_id,
+        'name': buoy.name,
+        'lat': buoy.latitude,
+        'lng': buoy.longitude,
+        'wave_height': reading.wave_height,
+        'water_temperature': reading.water_temperature,
+        'wind_speed': reading.wind_speed,
+        'pressure': reading.pressure,
+        'time': _isoformat(reading.timestamp),
+    }
+
+# ============================================================================
+# PUBLISHING
+# ============================================================================
+
+def publish_live(data):
+    """Push one entry to every connected dashboard once the transaction commits"""
+    # Dashboards reload on reconnect rather than replaying, so keep this
+    # traffic out of the history the SSE streams replay from
+    publish_on_commit([LIVE_CHANNEL], data, history=False)
+
+
+def publish_bulk_hazard_reports(reports):
+    """New reports from a bulk ingest; past LIVE_FEED_MAX_BULK_EVENTS dashboards reload instead"""
+    if len(reports) > get_hazard_setting('LIVE_FEED_MAX_BULK_EVENTS', 200):
+        publish_live({'kind': 'resync'})
+        return
+    for report in reports:
+        publish_live(hazard_report_event(report))
+
+
+def publish_hazard_report_updates(previous_statuses):
+    """Announce HazardReports changed with queryset.update(); ``previous_statuses`` is {pk: status}"""
+    from login.models import HazardReport
+
+    for report in HazardReport.objects.filter(pk__in=previous_statuses):
+        publish_live(hazard_report_event(report, was_public=previous_statuses[report.pk] == 'verified'))
+
+
+def publish_ocean_hazard_updates(pks):
+    from ocean_monitor.models import OceanHazard
+
+    for hazard in OceanHazard.objects.filter(pk__in=pks):
+        publish_live(ocean_hazard_event(hazard))
+
+# ============================================================================
+# VIEWER FILTERS
+# ============================================================================
+
+def _hazard_type_choices():
+    from login.models import HazardReport
+    from ocean_monitor.models import OceanHazard
+
+    return {value for value, _ in HazardReport.HAZARD_TYPES + OceanHazard.HAZARD_TYPES}
+
+
+class FeedFilter:
+    """What one connection receives: its role's visibility plus the kinds, hazard types and viewport it asked for"""
+
+    def __init__(self, can_see_all):
+        self.can_see_all = can_see_all
+        self.kinds = set(KINDS)
+        self.hazard_types = None
+        self.bbox = None
+
+    def update(self, message):
+        """Apply a {"type": "subscribe", "bbox": "w,s,e,n", "hazard_types": [...], "kinds": [...]} message"""
+        if not isinstance(message, dict) or message.get('type') != 'subscribe':
+            raise ValueError("Expected a subscribe message")
+
+        kinds = message.get('kinds') or KINDS
+        if not isinstance(kinds, list | tuple) or not set(kinds) <= set(KINDS):
+            raise ValueError(f"kinds must be a list of {', '.join(KINDS)}")
+
+        hazard_types = message.get('hazard_types') or None
+        if hazard_types is not None:
+            if not isinstance(hazard_types, list) or not set(hazard_types) <= _hazard_type_choices():
+                raise ValueError("hazard_types must be a list of known hazard types")
+            hazard_types = set(hazard_types)
+
+        bbox = message.get('bbox') or None
+        if bbox is not None:
+            if not isinstance(bbox, str):
+                raise ValueError("bbox must be west,south,east,north")
+            bbox = parse_bbox(bbox)
+
+        self.kinds, self.hazard_types, self.bbox = set(kinds), hazard_types, bbox
+
+    def describe(self):
+        south, west, north, east = self.bbox or (None,) * 4
+        return {
+            'kinds': sorted(self.kinds),
+            'hazard_types': sorted(self.hazard_types) if self.hazard_types else None,
+            'bbox': None if self.bbox is None else f'{west},{south},{east},{north}',
+        }
+
+    def view(self, data):
+        """What to send this connection for a feed entry, or None to skip it"""
+        kind = data.get('kind')
+        if kind == 'resync':
+            return data
+        if kind not in self.kinds:
+            return None
+        if self.hazard_types and data.get('hazard_type') and data['hazard_type'] not in self.hazard_types:
+            return None
+        if self.bbox is not None:
+            south, west, north, east = self.bbox
+            if not (south <= data['lat'] <= north and west <= data['lng'] <= east):
+                return None
+
+        if kind != 'hazard_report':
+            return data
+        if self.can_see_all or data['status'] == 'verified':
+            return {key: value for key, value in data.items() if key != 'was_public'}
+        # Left the verified state: take it off the maps that were showing it
+        if data['was_public']:
+            return {'kind': kind, 'id': data['id'], 'lat': data['lat'], 'lng': data['lng'], 'deleted': True}
+        return None
+
+# ============================================================================
+# ASGI APPLICATION
+# ============================================================================
+
+def _origin_allowed(scope):
+    """Browsers send Origin on WebSocket handshakes but no CSRF token; only accept our own pages"""
+    headers = dict(scope.get('headers', ()))
+    origin = headers.get(b'origin')
+    if origin is None:
+        return True
+    host = origin.decode('latin-1').split('://', 1)[-1]
+    domain, _ = split_domain_port(host)
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    return bool(domain) and validate_host(domain, allowed_hosts)
+
+
+@sync_to_async
+def _can_see_all(scope):
+    """Whether the session cookie belongs to an admin or analyst"""
+    headers = dict(scope.get('headers', ()))
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return False
+    close_old_connections()
+    try:
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        request = type('FeedRequest', (), {'session': session})()
+        return get_user_role(get_user(request)) in STAFF_ROLES
+    finally:
+        close_old_connections()
+
+
+async def _send_json(send, data):
+    await send({'type': 'websocket.send', 'text': json.dumps(data, separators=(',', ':'))})
+
+
+async def _read(receive, send, feed):
+    """Apply the client's subscribe messages until it disconnects"""
+    while True:
+        message = await receive()
+        if message['type'] == 'websocket.disconnect':
+            return
+        if message['type'] != 'websocket.receive':
+            continue
+        try:
+            feed.update(json.loads(message.get('text') or message.get('bytes') or ''))
+        except ValueError as e:
+            await _send_json(send, {'kind': 'error', 'error': str(e)})
+        else:
+            await _send_json(send, {'kind': 'subscribed', **feed.describe()})
+
+
+async def _write(send, subscription, feed):
+    heartbeat = get_hazard_setting('LIVE_FEED_HEARTBEAT_SECONDS', 25)
+    while True:
+        event = await subscription.get(timeout=heartbeat)
+        if subscription.overflowed:
+            subscription.overflowed = False
+            await _send_json(send, {'kind': 'resync'})
+        if event is None:
+            await _send_json(send, {'kind': 'heartbeat'})
+            continue
+        data = feed.view(event[2])
+        if data is not None:
+            await _send_json(send, data)
+
+
+async def live_feed(scope, receive, send):
+    """ASGI handler for LIVE_FEED_PATH.
+
+    Dashboards connect once, send a subscribe message with their viewport
+    and hazard types (again whenever the map moves) and get every matching
+    new, changed or deleted entry pushed as a JSON message. A "resync"
+    message means entries were dropped and the dashboard should reload.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if not _origin_allowed(scope):
+        await send({'type': 'websocket.close', 'code': 4003})
+        return
+    feed = FeedFilter(await _can_see_all(scope))
+    await send({'type': 'websocket.accept'})
+
+    broker = get_broker()
+    subscription = AsyncSubscription(
+        [LIVE_CHANNEL], get_hazard_setting('LIVE_FEED_QUEUE_SIZE', 500), asyncio.get_running_loop(),
+    )
+    broker.subscribe(subscription.channels, subscription=subscription)
+    tasks = [asyncio.ensure_future(_read(receive, send, feed)), asyncio.ensure_future(_write(send, subscription, feed))]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,89 @@
+# ============================================================================
+# visualizer/signals.py - Tile cache invalidation and the live feed (connected in VisualizerConfig.ready)
+# ============================================================================
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from analyst.models import BuoyReading, DartBuoy
+from login.models import HazardReport
+from login.signals import hazard_reports_bulk_created
+from ocean_monitor.models import OceanHazard
+
+from .live import (
+    buoy_reading_event, hazard_report_event, ocean_hazard_event, publish_bulk_hazard_reports, publish_live,
+)
+from .tiles import invalidate_on_commit
+
+TILE_LAYERS = {
+    HazardReport: 'reports',
+    OceanHazard: 'ocean-hazards',
+    DartBuoy: 'buoys',
+}
+
+
+def _remember_position(sender, instance, **kwargs):
+    # Where the point was when loaded, so a move also clears its old tiles
+    instance._tile_origin = (instance.__dict__.get('latitude'), instance.__dict__.get('longitude'))
+
+
+def _invalidate(sender, instance, **kwargs):
+    points = [(instance.latitude, instance.longitude)]
+    origin = getattr(instance, '_tile_origin', None)
+    if origin and origin != points[0]:
+        points.append(origin)
+    invalidate_on_commit(TILE_LAYERS[sender], points)
+    instance._tile_origin = (instance.latitude, instance.longitude)
+
+
+for model in TILE_LAYERS:
+    post_init.connect(_remember_position, sender=model, weak=False, dispatch_uid=f'tile_origin_{model.__name__}')
+    post_save.connect(_invalidate, sender=model, weak=False, dispatch_uid=f'tile_save_{model.__name__}')
+    post_delete.connect(_invalidate, sender=model, weak=False, dispatch_uid=f'tile_delete_{model.__name__}')
+
+
+@receiver(hazard_reports_bulk_created)
+def invalidate_bulk_reports(sender, reports, **kwargs):
+    """bulk_create skips post_save; clear the tiles of every ingested report"""
+    invalidate_on_commit('reports', [(report.latitude, report.longitude) for report in reports])
+
+# ============================================================================
+# LIVE FEED
+# ============================================================================
+
+@receiver(post_init, sender=HazardReport)
+def remember_live_status(sender, instance, **kwargs):
+    instance._live_status = instance.__dict__.get('status') if instance.pk else None
+
+
+@receiver(post_save, sender=HazardReport)
+def publish_hazard_report(sender, instance, **kwargs):
+    publish_live(hazard_report_event(instance, was_public=instance._live_status == 'verified'))
+    instance._live_status = instance.status
+
+
+@receiver(post_delete, sender=HazardReport)
+def publish_hazard_report_deletion(sender, instance, **kwargs):
+    publish_live(hazard_report_event(instance, was_public=instance._live_status == 'verified', deleted=True))
+
+
+@receiver(hazard_reports_bulk_created)
+def publish_bulk_reports(sender, reports, **kwargs):
+    publish_bulk_hazard_reports(reports)
+
+
+@receiver(post_save, sender=OceanHazard)
+def publish_ocean_hazard(sender, instance, **kwargs):
+    publish_live(ocean_hazard_event(instance))
+
+
+@receiver(post_delete, sender=OceanHazard)
+def publish_ocean_hazard_deletion(sender, instance, **kwargs):
+    publish_live(ocean_hazard_event(instance, deleted=True))
+
+
+@receiver(post_save, sender=BuoyReading)
+def publish_buoy_reading(sender, instance, created, **kwargs):
+    # Readings are never edited after the scraper stores them
+    if created:
+        publish_live(buoy_reading_event(instance))
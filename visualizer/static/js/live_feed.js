@@ -0,0 +1,62 @@
+// CoastSense live feed: new and changed hazard reports, ocean hazards and
+// buoy readings pushed over a WebSocket (served by incois/asgi.py)
+class LiveFeed {
+    constructor({ onEntry, onResync = null, kinds = null, hazardTypes = null, bbox = null }) {
+        this.onEntry = onEntry;
+        this.onResync = onResync;
+        this.subscription = { type: 'subscribe', kinds, hazard_types: hazardTypes, bbox };
+        this.retryMs = 1000;
+        this.dropped = false;
+        this.connect();
+    }
+
+    connect() {
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        this.socket = new WebSocket(`${scheme}://${window.location.host}/ws/live/`);
+
+        this.socket.onopen = () => {
+            this.retryMs = 1000;
+            this.socket.send(JSON.stringify(this.subscription));
+            // Whatever changed while disconnected was missed
+            if (this.dropped && this.onResync) this.onResync();
+            this.dropped = false;
+        };
+
+        this.socket.onmessage = (message) => {
+            const entry = JSON.parse(message.data);
+            if (entry.kind === 'resync') {
+                if (this.onResync) this.onResync();
+            } else if (entry.kind === 'error') {
+                console.warn('Live feed rejected the subscription:', entry.error);
+            } else if (entry.kind !== 'subscribed' && entry.kind !== 'heartbeat') {
+                this.onEntry(entry);
+            }
+        };
+
+        this.socket.onclose = () => {
+            this.dropped = true;
+            setTimeout(() => this.connect(), this.retryMs);
+            this.retryMs = Math.min(this.retryMs * 2, 30000);
+        };
+    }
+
+    // Change what the server sends, e.g. after the map moved
+    subscribe({ kinds, hazardTypes, bbox } = {}) {
+        if (kinds !== undefined) this.subscription.kinds = kinds;
+        if (hazardTypes !== undefined) this.subscription.hazard_types = hazardTypes;
+        if (bbox !== undefined) this.subscription.bbox = bbox;
+        if (this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify(this.subscription));
+        }
+    }
+
+    // "west,south,east,north" of a Leaflet map, clamped to valid coordinates
+    static bboxOf(map) {
+        const bounds = map.getBounds();
+        const west = Math.max(-180, bounds.getWest());
+        const south = Math.max(-90, bounds.getSouth());
+        const east = Math.min(180, bounds.getEast());
+        const north = Math.min(90, bounds.getNorth());
+        return `${west},${south},${east},${north}`;
+    }
+}
@@ -4,12 +4,16 @@
 
 // CoastSense Ocean Hazard Platform JavaScript - WORKING VERSION
 class OceanHazardPlatform {
-    constructor(hazards) {
+    constructor(hazards, heatmapGrid = null, stats = null, timeFilter = '') {
         this.map = null;
+        // Pre-aggregated density grid from the server (see /visual/api/heatmap/)
+        this.heatmapGrid = heatmapGrid;
+        // Stat card totals over every matching report; the embedded markers are only the newest ones
+        this.stats = stats;
         this.markers = [];
         this.allReports = [];
         this.currentHeatmapType = 'density';
-        this.timeFilter = '24h';
+        this.timeFilter = timeFilter;
         this.hazards = hazards
         console.log('🚀 OceanHazardPlatform initialized');
         this.init();
@@ -226,12 +230,15 @@ class OceanHazardPlatform {
         console.log(this.hazards)
         this.allReports = sampleReports; // Store all reports for filtering
         this.currentHeatmapType = 'density'; // Default heatmap type
-        this.timeFilter = '24h'; // Default time filter
 
         console.log('Loading sample data with', sampleReports.length, 'reports');
 
         this.displayReports(sampleReports);
-        this.updateStats(sampleReports);
+        if (this.stats) {
+            this.showStats(this.stats);
+        } else {
+            this.refreshStats();
+        }
 
         // Create initial heatmap immediately
         setTimeout(() => {
@@ -251,14 +258,15 @@ class OceanHazardPlatform {
             }, 1000);
         }, 1500);
 
-        // Start live updates
-        // this.startLiveUpdates();
         this.map.setView([20.5937, 78.9629], 5);
+
+        // Start live updates
+        this.connectLiveFeed();
         console.log('done')
     }
 
     // Display reports on map
-    displayReports(reports) {
+    displayReports(reports, fitToMarkers = true) {
         if (!this.map) return;
 
         // Clear existing markers
@@ -299,7 +307,7 @@ class OceanHazardPlatform {
         });
 
         // Center map on markers
-        if (this.markers.length > 0) {
+        if (fitToMarkers && this.markers.length > 0) {
             const group = new L.featureGroup(this.markers);
             this.map.fitBounds(group.getBounds().pad(0.1));
         }
@@ -480,6 +488,9 @@ class OceanHazardPlatform {
 
     // Generate heatmap data based on type
     generateHeatmapData(reports) {
+        if (this.heatmapGrid) {
+            return this.gridToHeatmapData(this.heatmapGrid);
+        }
         const filteredReports = this.filterReportsByTime(reports);
 
         switch (this.currentHeatmapType) {
@@ -494,6 +505,32 @@ class OceanHazardPlatform {
         }
     }
 
+    // Expand a sparse server grid into [lat, lng, intensity] cell centres
+    gridToHeatmapData(grid) {
+        if (!grid.max) return [];
+        const [south, west] = grid.bounds;
+        const cols = grid.shape[1];
+        return grid.cells.map((cell, i) => [
+            south + (Math.floor(cell / cols) + 0.5) * grid.cell_degrees,
+            west + ((cell % cols) + 0.5) * grid.cell_degrees,
+            grid.values[i] / grid.max
+        ]);
+    }
+
+    // Fetch the grid for another heatmap type, keeping the page's filters
+    fetchHeatmapGrid(type) {
+        const query = this.heatmapGrid.query;
+        const params = new URLSearchParams({
+            mode: type,
+            hazard_type: query.hazard_type,
+            severity: query.severity,
+            time_range: query.hours ? `${query.hours}h` : ''
+        });
+        return fetch(`/visual/api/heatmap/?${params}`)
+            .then(response => response.json())
+            .then(grid => { this.heatmapGrid = grid; });
+    }
+
     // Generate density heatmap data
     generateDensityData(reports) {
         if (!reports || reports.length === 0) return [];
@@ -552,7 +589,7 @@ class OceanHazardPlatform {
             case '24h': hoursBack = 24; break;
             case '7d': hoursBack = 168; break;
             case '30d': hoursBack = 720; break;
-            default: hoursBack = 24;
+            default: return reports;
         }
 
         const cutoffTime = new Date(now.getTime() - hoursBack * 60 * 60 * 1000);
@@ -563,6 +600,13 @@ class OceanHazardPlatform {
     // Switch heatmap type
     switchHeatmapType(type) {
         this.currentHeatmapType = type;
+        if (this.heatmapGrid) {
+            this.fetchHeatmapGrid(type).then(() => {
+                this.updateHeatmap(this.generateHeatmapData(this.allReports));
+                this.updateLegend(type);
+            });
+            return;
+        }
         const filteredReports = this.filterReportsByTime(this.allReports);
         const heatmapData = this.generateHeatmapData(filteredReports);
         this.updateHeatmap(heatmapData);
@@ -586,7 +630,7 @@ class OceanHazardPlatform {
         this.timeFilter = filter;
         const filteredReports = this.filterReportsByTime(this.allReports);
         this.displayReports(filteredReports);
-        this.updateStats(filteredReports);
+        this.refreshStats();
         console.log('Updated time filter to:', filter);
     }
 
@@ -753,42 +797,43 @@ class OceanHazardPlatform {
         }
     }
 
-    // Start live updates
-    startLiveUpdates() {
-        // Update data every 30 seconds
-        setInterval(() => {
-            this.updateLiveData();
-        }, 30000);
-
-        console.log('Live updates started - data will refresh every 30 seconds');
-    }
-
-    // Update live data with simulated changes
-    updateLiveData() {
-        // Add a new random report to simulate live data
-        const hazardTypes = ['High Waves', 'Storm Surge', 'Tsunami Warning', 'Coastal Flooding', 'Abnormal Tides', 'Coastal Erosion'];
-        const locations = ['Mumbai Coast', 'Chennai Coast', 'Goa Coast', 'Kolkata Coast', 'Visakhapatnam Coast', 'Kochi Coast'];
-
-        const newReport = {
-            lat: 8 + Math.random() * 25, // Random lat between 8-33 (Indian coastal region)
-            lng: 70 + Math.random() * 35, // Random lng between 70-105 (Indian coastal region)
-            hazardType: hazardTypes[Math.floor(Math.random() * hazardTypes.length)],
-            severity: this.getRandomSeverity(),
-            severityScore: Math.floor(Math.random() * 10) + 1,
-            reportCount: Math.floor(Math.random() * 20) + 1,
-            time: new Date().toISOString(),
-            location: locations[Math.floor(Math.random() * locations.length)],
-            description: this.getRandomDescription()
-        };
+    // Subscribe to pushed report changes for the visible area
+    connectLiveFeed() {
+        if (typeof LiveFeed === 'undefined') return;
 
-        // Add to all reports
-        this.allReports.push(newReport);
+        const hazardType = document.getElementById('hazard-type')?.value;
+        this.liveFeed = new LiveFeed({
+            kinds: ['hazard_report'],
+            hazardTypes: hazardType ? [hazardType] : null,
+            bbox: LiveFeed.bboxOf(this.map),
+            onEntry: (entry) => this.applyLiveEntry(entry),
+            onResync: () => this.showNotification('Some live updates were missed - reload for the latest reports', 'info'),
+        });
+        this.map.on('moveend', () => this.liveFeed.subscribe({ bbox: LiveFeed.bboxOf(this.map) }));
+        console.log('Live feed connected');
+    }
+
+    // Add, replace or remove one report pushed by the live feed
+    applyLiveEntry(entry) {
+        this.allReports = this.allReports.filter(report => report.id !== entry.id);
+        if (!entry.deleted) {
+            this.allReports.push({
+                id: entry.id,
+                lat: entry.lat,
+                lng: entry.lng,
+                hazardType: entry.hazard_type,
+                severity: entry.severity,
+                time: entry.time,
+                location: entry.location,
+                description: entry.description
+            });
+        }
 
-        // Filter and display current time range
         const filteredReports = this.filterReportsByTime(this.allReports);
-        this.displayReports(filteredReports);
-        this.updateStats(filteredReports);
-        console.log('Live data updated at', new Date().toLocaleTimeString(), '- Added new report');
+        this.displayReports(filteredReports, false);
+        // Coalesce bursts of updates into one stats request
+        clearTimeout(this.statsTimer);
+        this.statsTimer = setTimeout(() => this.refreshStats(), 2000);
     }
 
     // Get random ocean parameter
@@ -826,17 +871,27 @@ class OceanHazardPlatform {
         return descriptions[Math.floor(Math.random() * descriptions.length)];
     }
 
-    // Update dashboard statistics
-    updateStats(reports) {
-        console.log(reports)
-        const stats = {
-            total: reports.length,
-            high: reports.filter(r => r.severity === 'high' || r.severity == 'critical').length,
-            medium: reports.filter(r => r.severity === 'moderate').length,
-            low: reports.filter(r => r.severity === 'low').length
-        };
+    // Re-read the stat card totals for the page's filters and the selected time range
+    refreshStats() {
+        const query = this.heatmapGrid ? this.heatmapGrid.query : {};
+        const params = new URLSearchParams({
+            hazard_type: query.hazard_type || '',
+            severity: query.severity || '',
+            time_range: this.timeFilter || ''
+        });
+        // Spatial filters of the page itself (?bbox= / ?near=)
+        const page = new URLSearchParams(window.location.search);
+        ['bbox', 'near', 'radius_km'].forEach(name => {
+            if (page.get(name)) params.set(name, page.get(name));
+        });
+        fetch(`/visual/api/stats/?${params}`)
+            .then(response => response.json())
+            .then(stats => this.showStats(stats))
+            .catch(error => console.warn('Could not refresh stats:', error));
+    }
 
-        // Animate stat numbers
+    showStats(stats) {
+        this.stats = stats;
         const statElements = {
             'total-reports': stats.total,
             'high-severity': stats.high,
@@ -847,7 +902,7 @@ class OceanHazardPlatform {
         Object.entries(statElements).forEach(([id, value]) => {
             const element = document.getElementById(id);
             if (element) {
-                this.animateNumber(element, 0, value, 1000);
+                this.animateNumber(element, parseInt(element.textContent, 10) || 0, value, 1000);
             }
         });
     }
@@ -1,3 +1,218 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from login.benchmarks import BenchmarkTestCase, seed_hazard_reports, use_temporary_tile_cache
+from login.counters import reconcile_counters
+from login.events import get_broker
+from login.models import HazardReport
+
+from .heatmap import report_heatmap
+from .live import LIVE_CHANNEL, LIVE_FEED_PATH, live_feed
+from .tiles import invalidate_point, open_tile, render_tile, tile_for, tile_path
+
+
+def setUpModule():
+    use_temporary_tile_cache()
+
+
+class VisualizerBenchmarks(BenchmarkTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tile_dir = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(TILE_CACHE_DIR=cls.tile_dir))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.tile_dir, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        reporters = [User.objects.create_user(f'reporter{i}', password='pw') for i in range(20)]
+        seed_hazard_reports(reporters, 3000)
+
+    def setUp(self):
+        # Each test rebuilds the in-process index against its own data
+        report_heatmap._slots = None
+
+    def test_dashboard(self):
+        with self.benchmark('visualizer dashboard (cold heatmap)', 3):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        with self.benchmark('visualizer dashboard (warm heatmap)', 2):
+            self.client.get(reverse('dashboard'))
+
+    def test_heatmap_api(self):
+        self.client.get(reverse('heatmap_api'))
+        with self.benchmark('heatmap_api (warm)', 0):
+            response = self.client.get(reverse('heatmap_api'), {'mode': 'severity', 'hazard_type': 'tsunami'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_map_tile(self):
+        with self.benchmark('map_tile (render)', 1):
+            response = self.client.get(reverse('map_tile', args=['reports', 6, 45, 28]))
+        self.assertEqual(response.status_code, 200)
+        with self.benchmark('map_tile (cached)', 0):
+            self.client.get(reverse('map_tile', args=['reports', 6, 45, 28]))
+
+
+class LiveFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporter = User.objects.create_user('live-reporter', password='pw')
+
+    def create_reports(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for report_id, latitude, status in [('LIVE-1', 15, 'verified'), ('LIVE-2', 40, 'verified'), ('LIVE-3', 16, 'pending')]:
+                HazardReport.objects.create(
+                    reporter=self.reporter, report_id=report_id, hazard_type='tsunami', severity='high',
+                    description='Receding sea', latitude=latitude, longitude=80, status=status,
+                )
+
+    def reject_verified_report(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            report = HazardReport.objects.get(report_id='LIVE-1')
+            report.status = 'rejected'
+            report.save()
+
+    @async_to_sync
+    async def run_feed(self, *steps, headers=()):
+        """Messages the feed sends an anonymous viewer of India while ``steps`` run"""
+        feed = ApplicationCommunicator(live_feed, {'type': 'websocket', 'path': LIVE_FEED_PATH, 'headers': list(headers)})
+        await feed.send_input({'type': 'websocket.connect'})
+        accepted = await feed.receive_output(1)
+        if accepted['type'] != 'websocket.accept':
+            return accepted
+        await feed.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'subscribe', 'bbox': '68,8,90,23'})})
+        received = [json.loads((await feed.receive_output(1))['text'])]
+        for step in steps:
+            await sync_to_async(step)()
+        while not await feed.receive_nothing(0.2):
+            received.append(json.loads((await feed.receive_output())['text']))
+        await feed.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await feed.wait(1)
+        return received
+
+    def test_pushes_visible_reports_in_viewport(self):
+        subscribed, *entries = self.run_feed(self.create_reports, self.reject_verified_report)
+        self.assertEqual((subscribed['kind'], subscribed['bbox']), ('subscribed', '68.0,8.0,90.0,23.0'))
+        # Outside the viewport and unverified reports are left out; a report
+        # leaving the verified state is taken off the map
+        self.assertEqual([(entry['id'], entry['deleted']) for entry in entries], [('LIVE-1', False), ('LIVE-1', True)])
+        self.assertNotIn('was_public', entries[0])
+
+    def test_rejects_foreign_origin(self):
+        message = self.run_feed(headers=[(b'origin', b'https://evil.example')])
+        self.assertEqual(message['type'], 'websocket.close')
+
+    def test_entries_stay_out_of_the_event_history(self):
+        broker = get_broker()
+        subscription, _ = broker.subscribe(['report:0'])
+        self.addCleanup(broker.unsubscribe, subscription)
+        broker.publish(['report:0'], {'type': 'report', 'id': 0})
+        last_event_id = subscription.get(timeout=1)[0]
+
+        self.create_reports()
+        replayed, replayable = broker.subscribe([LIVE_CHANNEL, 'report:0'], last_event_id)
+        self.addCleanup(broker.unsubscribe, replayed)
+        self.assertTrue(replayable)
+        self.assertIsNone(replayed.get(timeout=0))
+
+
+class TileCacheTests(TestCase):
+    tile = ('reports', 6, *tile_for(13.08, 80.27, 6))
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tile_dir = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(TILE_CACHE_DIR=cls.tile_dir))
+        cls.addClassCleanup(shutil.rmtree, cls.tile_dir, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reporter = User.objects.create_user('tile-reporter', password='pw')
+
+    def create_report(self, status='verified'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return HazardReport.objects.create(
+                reporter=self.reporter, hazard_type='storm_surge', severity='high', description='Surge',
+                latitude=13.08, longitude=80.27, status=status,
+            )
+
+    def features(self):
+        with open_tile(*self.tile) as handle:
+            return [feature['properties']['id'] for feature in json.load(handle)['features']]
+
+    def test_saves_invalidate_after_commit(self):
+        self.assertEqual(self.features(), [])
+        report = self.create_report()
+        self.assertEqual(self.features(), [report.report_id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            report.status = 'rejected'
+            report.save()
+            # Still the committed state: re-rendering now would cache a stale tile
+            self.assertTrue(os.path.exists(tile_path(*self.tile)))
+        self.assertEqual(self.features(), [])
+
+    def test_render_overtaken_by_an_invalidation_is_not_kept(self):
+        report = self.create_report()
+
+        def render_then_invalidate(*args):
+            content = render_tile(*args)
+            invalidate_point('reports', report.latitude, report.longitude)
+            return content
+
+        with mock.patch('visualizer.tiles.render_tile', side_effect=render_then_invalidate):
+            self.assertEqual(self.features(), [report.report_id])
+        self.assertFalse(os.path.exists(tile_path(*self.tile)))
+
+    def test_invalidating_elsewhere_keeps_this_tile(self):
+        report = self.create_report()
+
+        def render_then_invalidate_elsewhere(*args):
+            content = render_tile(*args)
+            invalidate_point('reports', 22.57, 88.36)
+            return content
+
+        with mock.patch('visualizer.tiles.render_tile', side_effect=render_then_invalidate_elsewhere):
+            self.assertEqual(self.features(), [report.report_id])
+        self.assertTrue(os.path.exists(tile_path(*self.tile)))
+
+
+@override_settings(OCEAN_HAZARD_SETTINGS={**settings.OCEAN_HAZARD_SETTINGS, 'HEATMAP_DASHBOARD_MARKERS': 5})
+class DashboardStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        reporter = User.objects.create_user('stats-reporter', password='pw')
+        HazardReport.objects.bulk_create([
+            HazardReport(
+                reporter=reporter, report_id=f'STAT-{i}', hazard_type='high_waves', description='Swell',
+                severity=('critical', 'high', 'moderate', 'low')[i % 4], latitude=15, longitude=73,
+            )
+            for i in range(12)
+        ])
+        reconcile_counters()
+
+    def test_totals_are_not_capped_by_the_markers(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.context['hazards']), 5)
+        self.assertEqual(response.context['stats'], {'total': 12, 'high': 6, 'medium': 3, 'low': 3})
+        # The unfiltered heatmap covers the same range as the markers
+        self.assertEqual(response.context['heatmap']['query']['hours'], '')
+
+    def test_filtered_totals(self):
+        stats = self.client.get(reverse('visualizer_stats'), {'severity': 'low', 'time_range': '7d'}).json()
+        self.assertEqual(stats, {'total': 3, 'high': 0, 'medium': 0, 'low': 3})
@@ -0,0 +1,216 @@
+# ============================================================================
+# visualizer/tiles.py - Disk-cached GeoJSON map tiles for hazard layers
+# ============================================================================
+
+import json
+import math
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from login.spatial import bbox_filter
+from login.utils import get_hazard_setting
+
+# ============================================================================
+# TILE GEOMETRY
+# ============================================================================
+
+def tile_bounds(z, x, y):
+    """(south, west, north, east) of an XYZ (slippy map) tile"""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def tile_for(latitude, longitude, z):
+    """XYZ tile containing a point at zoom ``z``"""
+    latitude = max(min(float(latitude), 85.05112878), -85.05112878)
+    n = 2 ** z
+    x = int((float(longitude) + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+# ============================================================================
+# LAYERS
+# ============================================================================
+
+def _point(longitude, latitude, properties):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [round(float(longitude), 6), round(float(latitude), 6)]},
+        'properties': properties,
+    }
+
+
+def _report_features(bounds):
+    from login.models import HazardReport
+
+    # Tiles are shared by every visitor (and proxies), so only public reports
+    reports = HazardReport.objects.filter(bbox_filter(*bounds), status='verified')
+    for report in reports.only('report_id', 'hazard_type', 'severity', 'status', 'urgent',
+                               'location_name', 'latitude', 'longitude', 'created_at'):
+        yield _point(report.longitude, report.latitude, {
+            'id': report.report_id,
+            'hazard_type': report.hazard_type,
+            'severity': report.severity,
+            'urgent': report.urgent,
+            'location_name': report.location_name,
+            'created_at': report.created_at,
+        })
+
+
+def _ocean_hazard_features(bounds):
+    from ocean_monitor.models import OceanHazard
+
+    south, west, north, east = bounds
+    hazards = OceanHazard.objects.filter(
+        is_active=True, latitude__gte=south, latitude__lte=north, longitude__gte=west, longitude__lte=east
+    )
+    for hazard in hazards:
+        yield _point(hazard.longitude, hazard.latitude, {
+            'id': hazard.pk,
+            'hazard_type': hazard.hazard_type,
+            'severity': hazard.severity,
+            'location_name': hazard.location_name,
+            'timestamp': hazard.timestamp,
+        })
+
+
+def _buoy_features(bounds):
+    from analyst.models import DartBuoy
+
+    south, west, north, east = bounds
+    buoys = DartBuoy.objects.filter(
+        latitude__gte=south, latitude__lte=north, longitude__gte=west, longitude__lte=east
+    )
+    for buoy in buoys:
+        yield _point(buoy.longitude, buoy.latitude, {
+            'id': buoy.buoy_id,
+            'name': buoy.name,
+            'status': buoy.status,
+            'wave_height': buoy.wave_height,
+            'water_temperature': buoy.water_temperature,
+            'wind_speed': buoy.wind_speed,
+            'pressure': buoy.pressure,
+            'last_report_time': buoy.last_report_time,
+        })
+
+
+LAYERS = {
+    'reports': _report_features,
+    'ocean-hazards': _ocean_hazard_features,
+    'buoys': _buoy_features,
+}
+
+# ============================================================================
+# DISK CACHE
+# ============================================================================
+
+def tile_cache_dir():
+    return getattr(settings, 'TILE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'tile_cache'))
+
+
+def tile_path(layer, z, x, y):
+    return os.path.join(tile_cache_dir(), layer, str(z), str(x), f"{y}.geojson")
+
+
+def _generation_path(path):
+    return f"{path}.generation"
+
+
+def _generation(path):
+    """Token that changes on every invalidation of the tile at ``path``"""
+    try:
+        with open(_generation_path(path)) as handle:
+            return handle.read()
+    except FileNotFoundError:
+        return ''
+
+
+def _bump_generation(path):
+    generation_path = _generation_path(path)
+    os.makedirs(os.path.dirname(generation_path), exist_ok=True)
+    partial = f"{generation_path}.{uuid.uuid4().hex}.tmp"
+    with open(partial, 'w') as handle:
+        handle.write(uuid.uuid4().hex)
+    os.replace(partial, generation_path)
+
+
+def render_tile(layer, z, x, y):
+    """Serialize one tile to GeoJSON bytes"""
+    features = list(LAYERS[layer](tile_bounds(z, x, y)))
+    collection = {'type': 'FeatureCollection', 'features': features}
+    return json.dumps(collection, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def open_tile(layer, z, x, y):
+    """Return an open binary handle on the cached tile, rendering it if missing or expired.
+
+    A render that an invalidation of this tile overtook is still served to
+    this request, but it is not kept: it may predate the change.
+    """
+    path = tile_path(layer, z, x, y)
+    max_age = get_hazard_setting('TILE_CACHE_SECONDS', 3600)
+    try:
+        handle = open(path, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        if time.time() - os.fstat(handle.fileno()).st_mtime < max_age:
+            return handle
+        handle.close()
+
+    generation = _generation(path)
+    content = render_tile(layer, z, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so concurrent readers never see a partial tile
+    partial = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(partial, 'wb') as handle:
+        handle.write(content)
+    handle = open(partial, 'rb')
+    os.replace(partial, path)
+    if _generation(path) != generation:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return handle
+
+
+def invalidate_point(layer, latitude, longitude):
+    """Drop the cached tile containing a point at every zoom level; other tiles stay cached"""
+    if latitude is None or longitude is None:
+        return 0
+    removed = 0
+    for z in range(get_hazard_setting('TILE_MAX_ZOOM', 18) + 1):
+        path = tile_path(layer, z, *tile_for(latitude, longitude, z))
+        # Before removing, so a render of this tile already under way does not store it
+        _bump_generation(path)
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def invalidate_on_commit(layer, points):
+    """Drop the tiles of (latitude, longitude) points once the transaction commits.
+
+    Earlier, a request could re-render a tile from the rows as they were
+    before the change and cache it again.
+    """
+    points = set(points)
+    transaction.on_commit(lambda: [invalidate_point(layer, *point) for point in points])
+
+
+def invalidate_queryset(layer, queryset):
+    """Drop cached tiles for every row of a queryset (for queryset.update(), which sends no signals)"""
+    invalidate_on_commit(layer, queryset.values_list('latitude', 'longitude').distinct())
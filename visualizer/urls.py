@@ -2,5 +2,7 @@ from django.urls import path
 from . import views
 from login.views import home
 urlpatterns = [
-    path('', views.dashboard, name='dashboard')
+    path('', views.dashboard, name='dashboard'),
+    path('api/heatmap/', views.heatmap_api, name='heatmap_api'),
+    path('api/stats/', views.dashboard_stats, name='visualizer_stats'),
 ]
\ No newline at end of file
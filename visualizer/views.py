@@ -1,9 +1,22 @@
 from django.shortcuts import render
+from django.http import FileResponse, Http404, HttpResponseBadRequest, HttpResponseNotModified, JsonResponse
+from django.views.decorators.http import require_GET
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.db.models import Count, Q
+from login.counters import read_counters
 from login.models import HazardReport
+from login.spatial import apply_spatial_filters, parse_bbox, within_radius
+from login.utils import get_hazard_setting
+from .heatmap import heatmap_payload
+from .tiles import LAYERS, open_tile
+import math
+import os
+from collections import Counter
 from datetime import timedelta
 
+STAT_SEVERITIES = ('critical', 'high', 'moderate', 'low')
+
 # ============================================================================
 # MAIN DASHBOARD VIEWS
 # ============================================================================
@@ -41,14 +54,112 @@ def dashboard(request):
             hazards = hazards.filter(severity=severity)
             filters['severity'] = severity
     
+    # Spatial filters come from the query string for both GET and POST
+    try:
+        hazards, near = apply_spatial_filters(hazards, request.GET)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    if request.GET.get('bbox'):
+        filters['bbox'] = request.GET['bbox']
+    if near:
+        hazards = [hazard for hazard, _ in within_radius(hazards, near)]
+        filters['near'] = request.GET['near']
+    
+    # The heatmap and the stat cards come pre-aggregated from the server, so
+    # only the newest reports are embedded as individual markers
+    heatmap = heatmap_payload(
+        hazard_type=filters.get('hazard_type'),
+        severity=filters.get('severity'),
+        hours=_time_range_hours(filters.get('time_range')),
+        bbox=parse_bbox(request.GET['bbox']) if request.GET.get('bbox') else None,
+    )
+    stats = _hazard_stats(hazards, filtered=bool(filters))
+    marker_limit = get_hazard_setting('HEATMAP_DASHBOARD_MARKERS', 500)
+    if near:
+        hazards = hazards[:marker_limit]
+    else:
+        hazards = hazards.order_by('-created_at')[:marker_limit]
+    
     # Convert hazards to JSON format for frontend consumption
     hazards_json = _convert_hazards_to_json(hazards)
     
     return render(request, 'dashboard.html', {
         'hazards': hazards_json, 
+        'heatmap': heatmap,
+        'stats': stats,
         'filters': filters
     })
 
+@require_GET
+def dashboard_stats(request):
+    """Stat card totals for the dashboard's filters (hazard_type, severity, time_range, bbox)"""
+    hazards = HazardReport.objects.all()
+    hazard_type = request.GET.get('hazard_type')
+    severity = request.GET.get('severity')
+    time_range = request.GET.get('time_range')
+    if hazard_type:
+        hazards = hazards.filter(hazard_type=hazard_type)
+    if severity:
+        hazards = hazards.filter(severity=severity)
+    if time_range:
+        hazards = hazards.filter(created_at__gte=_parse_time_range(time_range))
+    try:
+        hazards, near = apply_spatial_filters(hazards, request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if near:
+        hazards = [hazard for hazard, _ in within_radius(hazards, near)]
+    
+    filtered = bool(hazard_type or severity or time_range or request.GET.get('bbox') or near)
+    return JsonResponse(_hazard_stats(hazards, filtered))
+
+# ============================================================================
+# HEATMAP API
+# ============================================================================
+
+@require_GET
+def heatmap_api(request):
+    """Sparse heatmap grid for the dashboard (mode, hazard_type, severity, time_range, bbox)"""
+    try:
+        bbox = parse_bbox(request.GET['bbox']) if request.GET.get('bbox') else None
+        payload = heatmap_payload(
+            mode=request.GET.get('mode', 'density'),
+            hazard_type=request.GET.get('hazard_type'),
+            severity=request.GET.get('severity'),
+            hours=_time_range_hours(request.GET.get('time_range', '')),
+            bbox=bbox,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    response = JsonResponse(payload)
+    response['Cache-Control'] = f"public, max-age={get_hazard_setting('HEATMAP_REFRESH_SECONDS', 10)}"
+    return response
+
+# ============================================================================
+# MAP TILES
+# ============================================================================
+
+@require_GET
+def map_tile(request, layer, z, x, y):
+    """GeoJSON tile of one layer, served from the disk cache"""
+    if layer not in LAYERS or z > get_hazard_setting('TILE_MAX_ZOOM', 18) or x >= 2 ** z or y >= 2 ** z:
+        raise Http404("No such tile")
+
+    # Stat the opened handle so the ETag always describes the bytes we send,
+    # even if an invalidation replaces the tile in between
+    handle = open_tile(layer, z, x, y)
+    stat = os.fstat(handle.fileno())
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    if request.headers.get('If-None-Match') == etag:
+        handle.close()
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(handle, content_type='application/geo+json')
+    response['ETag'] = etag
+    response['Cache-Control'] = f"public, max-age={get_hazard_setting('TILE_BROWSER_MAX_AGE_SECONDS', 60)}"
+    return response
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
@@ -74,12 +185,42 @@ def _parse_time_range(time_range):
         # Return current time if parsing fails
         return timezone.now()
 
+def _time_range_hours(time_range):
+    """Whole hours covered by a time range string, or None for no limit"""
+    if not time_range:
+        return None
+    seconds = (timezone.now() - _parse_time_range(time_range)).total_seconds()
+    return max(1, math.ceil(seconds / 3600))
+
+def _hazard_stats(hazards, filtered):
+    """Totals behind the dashboard stat cards over every matching report, not just the embedded markers"""
+    if isinstance(hazards, list):
+        severities = Counter(hazard.severity for hazard in hazards)
+        stats = {'total': len(hazards), **{severity: severities[severity] for severity in STAT_SEVERITIES}}
+    elif filtered:
+        stats = hazards.aggregate(
+            total=Count('pk'),
+            **{severity: Count('pk', filter=Q(severity=severity)) for severity in STAT_SEVERITIES},
+        )
+    else:
+        # The unfiltered dashboard reads the incrementally maintained counters
+        counts = read_counters(['reports:total'] + [f'reports:severity:{severity}' for severity in STAT_SEVERITIES])
+        stats = {'total': counts['reports:total']}
+        stats.update({severity: counts[f'reports:severity:{severity}'] for severity in STAT_SEVERITIES})
+    return {
+        'total': stats['total'],
+        'high': stats['critical'] + stats['high'],
+        'medium': stats['moderate'],
+        'low': stats['low'],
+    }
+
 def _convert_hazards_to_json(hazards):
     """Convert hazard queryset to JSON-serializable format for frontend"""
     hazards_json = []
     
     for hazard in hazards:
         hazard_data = {
+            'id': hazard.report_id,
             'lat': hazard.latitude,
             'lng': hazard.longitude,
             'hazardType': hazard.hazard_type,